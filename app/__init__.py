@@ -5,6 +5,7 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
+from core.buffers.record_buffer import RecordBuffer
 from core.configuration.configuration import get_app_version
 from core.managers.config_manager import ConfigManager
 from core.managers.error_handler_manager import ErrorHandlerManager
@@ -17,6 +18,7 @@ load_dotenv()
 # Create the instances
 db = SQLAlchemy()
 migrate = Migrate()
+record_buffer = RecordBuffer(db)
 
 
 def create_app(config_name="development"):
@@ -29,6 +31,7 @@ def create_app(config_name="development"):
     # Initialize SQLAlchemy and Migrate with the app
     db.init_app(app)
     migrate.init_app(app, db)
+    record_buffer.init_app(app)
 
     # Register modules
     module_manager = ModuleManager(app)
@@ -1,25 +1,122 @@
+import math
+import os
 import re
+from functools import lru_cache
+
+import yaml
+
+from app.modules.componentes_check.units import to_number
+
+# Versión de las reglas de validación: súbela al cambiarlas para que no se usen los resultados guardados
+CHECKER_VERSION = 3
+
+# Reglas de validación por tipo de componente, en un archivo declarativo que se compila al importar el módulo
+RULES_FILE = os.path.join(os.path.dirname(__file__), "rules.yaml")
+
+# Campos de la cabecera que lee el parser
+HEADER_FIELDS = ("name", "version", "author")
+
+# Línea 'clave: valor' de la cabecera o de las propiedades; la clave acaba en los primeros dos puntos
+_KEY = re.compile(r"[a-zA-Z0-9_]+")
+
+# Estados del parser: leyendo la cabecera, buscando 'properties:' (tras una línea 'properties :') y
+# leyendo las propiedades
+_HEADER, _SEEKING, _PROPERTIES = range(3)
+
+
+# Compilación de las reglas. Cada comprobación recibe el valor de la propiedad, que nunca es None: si falta
+# la propiedad, solo fallan las reglas de palabras clave
+def _keywords(words):
+    return re.compile("|".join(re.escape(str(word)) for word in words), re.IGNORECASE).search
+
+
+def _pattern(expression):
+    return re.compile(expression).fullmatch
+
+
+@lru_cache(maxsize=4096)
+def _quantity(prop, value):
+    return to_number(prop, value)
+
+
+def _range(prop, minimum, maximum):
+    minimum = -math.inf if minimum is None else minimum
+    maximum = math.inf if maximum is None else maximum
+
+    def check(value):
+        number = _quantity(prop, value)
+        return number is None or minimum <= number <= maximum
+
+    return check
+
+
+def _bound(prop, limit, type_name):
+    if limit is None:
+        return None
+    number = to_number(prop, limit)
+    if number is None:
+        raise ValueError(f"Límite no válido para '{prop}' en el tipo '{type_name}': '{limit}'")
+    return number
+
+
+def compile_rules(document: dict):
+    """
+    (campos obligatorios, propiedades obligatorias, reglas por tipo) de un documento de reglas como el de
+    RULES_FILE. Las reglas de cada tipo quedan como tuplas (propiedad, si falla cuando falta,
+    comprobación, mensaje, parámetros del mensaje), con las expresiones regulares y los límites ya compilados.
+    """
+    required_fields = tuple(document.get("required_fields", ()))
+    unknown = set(required_fields) - set(HEADER_FIELDS)
+    if unknown:
+        raise ValueError(f"Campos de la cabecera desconocidos: {sorted(unknown)}")
+
+    table = {}
+    for type_name, rules in (document.get("types") or {}).items():
+        compiled = []
+        for rule in rules or ():
+            prop = rule["property"].lower()
+            if "keywords" in rule:
+                check = _keywords(rule["keywords"])
+                message = "Falta una palabra clave en {property}: '{value}'"
+                params = {}
+            elif "pattern" in rule:
+                check = _pattern(rule["pattern"])
+                message = "Valor no válido en {property}: '{value}'"
+                params = {}
+            elif "min" in rule or "max" in rule:
+                minimum, maximum = (_bound(prop, rule.get(limit), type_name) for limit in ("min", "max"))
+                check = _range(prop, minimum, maximum)
+                message = "Valor fuera de rango en {property}: '{value}' (entre {min} y {max})"
+                params = {"min": rule.get("min", "-"), "max": rule.get("max", "-")}
+            else:
+                raise ValueError(f"Regla sin comprobación para '{prop}' en el tipo '{type_name}'")
+            compiled.append((prop, "keywords" in rule, check, rule.get("message", message), params))
+        table[str(type_name).lower()] = tuple(compiled)
+
+    return required_fields, tuple(document.get("required_properties", ())), table
+
+
+def load_rules(path: str = RULES_FILE):
+    with open(path, encoding="utf-8") as file:
+        return compile_rules(yaml.safe_load(file))
+
+
+REQUIRED_FIELDS, REQUIRED_PROPERTIES, _RULES = load_rules()
+
+VALID_COMPONENT_TYPES = set(_RULES)
 
-VALID_COMPONENT_TYPES = {
-    "processor",
-    "graphics",
-    "memory",
-    "storage",
-    "power_supply",
-    "cooling",
-    "case",
-    "network",
-    "capture_card",
-    "sound_card",
-    "antenna",
-    "dvd_drive",
-    "encoder"
-}
 
 class PCCompFileChecker:
 
-    def __init__(self, text_content: str):
-        self.raw_text = text_content
+    # Reglas compiladas de RULES_FILE; una subclase puede usar otras, compiladas con compile_rules
+    required_fields, required_properties, rules = REQUIRED_FIELDS, REQUIRED_PROPERTIES, _RULES
+
+    def __init__(self, text_content):
+        """
+        text_content es el texto de un archivo .comp o cualquier iterable de sus líneas, como el propio
+        archivo abierto, que se lee una sola vez y línea a línea sin cargarlo entero en memoria.
+        """
+        self.raw_text = text_content if isinstance(text_content, str) else None
 
         # Diccionario donde guardamos los datos ya procesados
         self.parsed_data = {
@@ -31,66 +128,56 @@ class PCCompFileChecker:
 
         self.errors = []
 
-        self._parse()
+        self._parse(text_content.splitlines() if isinstance(text_content, str) else text_content)
         self._validate()
 
     # Parseo del archivo .comp
-    def _parse(self):
-        """Lee el archivo .comp y extrae sus campos y propiedades."""
+    def _parse(self, lines):
+        """Lee las líneas del archivo .comp en una sola pasada y extrae sus campos y propiedades."""
 
-        lines = self.raw_text.strip().splitlines()
-        if not lines:
-            self.errors.append("El archivo está vacío.")
-            return
+        parsed = self.parsed_data
+        properties = parsed["properties"]
+        state = _HEADER
+        empty = True
 
-        # Parseo de cabecera: name, version, author
         for line in lines:
             stripped = line.strip()
             if not stripped:
                 continue
+            empty = False
+
+            key, colon, value = stripped.partition(":")
+            key = key.rstrip()
+            is_pair = bool(colon) and _KEY.fullmatch(key) is not None
+
+            if state == _PROPERTIES:
+                # Formato esperado: key: value
+                if is_pair:
+                    properties[key.lower()] = value.strip()
+                else:
+                    self.errors.append(f"Propiedad mal formada: '{stripped}'")
+                continue
 
-            match = re.match(r"^([a-zA-Z0-9_]+)\s*:\s*(.*)$", stripped)
-            if match:
-                key = match.group(1).lower()
-                value = match.group(2).strip()
-
-                if key in ("name", "version", "author"):
-                    self.parsed_data[key] = value
-
-                if key == "properties":
-                    break  # el resto corresponde a propiedades
+            if stripped[:11].lower() == "properties:":
+                state = _PROPERTIES  # el resto corresponde a propiedades
+            elif state == _HEADER and is_pair:
+                key = key.lower()
+                if key in HEADER_FIELDS:
+                    parsed[key] = value.strip()
+                elif key == "properties":
+                    state = _SEEKING  # 'properties :' cierra la cabecera, pero no abre la sección
 
-        # Parseo del bloque de propiedades
-        try:
-            start_index = next(
-                i for i, l in enumerate(lines) if l.strip().lower().startswith("properties:")
-            )
-        except StopIteration:
+        if empty:
+            self.errors.append("El archivo está vacío.")
+        elif state != _PROPERTIES:
             self.errors.append("No se encontró la sección 'properties:'.")
-            return
-
-        property_lines = lines[start_index + 1:]
-
-        for line in property_lines:
-            stripped = line.strip()
-            if not stripped:
-                continue
-
-            # Formato esperado: key: value
-            match = re.match(r"^([a-zA-Z0-9_]+)\s*:\s*(.*)$", stripped)
-            if match:
-                key = match.group(1).lower()
-                value = match.group(2).strip()
-                self.parsed_data["properties"][key] = value
-            else:
-                self.errors.append(f"Propiedad mal formada: '{stripped}'")
 
     # Validaciones del contenido
     def _validate(self):
         """Valida que el archivo cumpla con los requisitos del formato."""
 
         # Validar campos obligatorios del archivo
-        for required_field in ("name", "version", "author"):
+        for required_field in self.required_fields:
             if not self.parsed_data[required_field]:
                 self.errors.append(f"Falta el campo obligatorio: '{required_field}'")
 
@@ -101,9 +188,7 @@ class PCCompFileChecker:
             return
 
         # Validación de campos obligatorios dentro de properties
-        required_properties = ("id", "type", "model", "description")
-
-        for prop in required_properties:
+        for prop in self.required_properties:
             if prop not in properties:
                 self.errors.append(f"Falta la propiedad obligatoria: '{prop}'")
 
@@ -114,29 +199,16 @@ class PCCompFileChecker:
         comp_type = properties["type"].lower()
 
         # Tipo válido
-        if comp_type not in VALID_COMPONENT_TYPES:
+        rules = self.rules.get(comp_type)
+        if rules is None:
             self.errors.append(f"Tipo de componente no válido: '{comp_type}'")
+            return
 
-        # Validaciones específicas por tipo
-        model_value = properties.get("model", "").lower()
-
-        if comp_type == "processor":
-            if not any(brand in model_value for brand in ("intel", "amd")):
-                self.errors.append(
-                    f"Processor inválido o marca desconocida en model: '{properties.get('model')}'"
-                )
-
-        if comp_type == "graphics":
-            if not any(brand in model_value for brand in ("nvidia", "amd", "intel")):
-                self.errors.append(
-                    f"Graphics inválido o marca desconocida en model: '{properties.get('model')}'"
-                )
-
-        if comp_type == "storage":
-            if not any(keyword in model_value for keyword in ("ssd", "hdd", "nvme")):
-                self.errors.append(
-                    f"Tipo de almacenamiento desconocido en model: '{properties.get('model')}'"
-                )
+        # Validaciones específicas por tipo, ya compiladas
+        for prop, required, check, message, params in rules:
+            value = properties.get(prop)
+            if (required if value is None else not check(value)):
+                self.errors.append(message.format(property=prop, value=value, **params))
 
     # Métodos públicos
     def is_valid(self) -> bool:
@@ -150,3 +222,20 @@ class PCCompFileChecker:
     def get_errors(self) -> list:
         """Devuelve la lista de errores encontrados."""
         return self.errors
+
+
+def check_files(paths) -> list:
+    """
+    (parsed_data, errors) de cada archivo .comp de paths, o (None, [error]) si no se pudo leer. Es la tarea
+    que se reparte entre los procesos de validación, así que no usa la app ni la base de datos.
+    """
+    results = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as file:
+                checker = PCCompFileChecker(file)
+        except (OSError, UnicodeDecodeError) as e:
+            results.append((None, [f"No se pudo leer el archivo: {e}"]))
+            continue
+        results.append((checker.get_parsed_data(), checker.get_errors()))
+    return results
@@ -0,0 +1,150 @@
+from sortedcontainers import SortedList
+
+# Propiedades que dos tipos de componente deben compartir; pueden tener varios valores separados por comas,
+# como el 'socket: LGA1700, AM5' de un disipador
+SHARED_PROPERTIES = {
+    frozenset(("processor", "cooling")): ("socket",),
+    frozenset(("processor", "memory")): ("memory_type",),
+    frozenset(("case", "power_supply")): ("form_factor",),
+}
+
+# (consumidor, propiedad, proveedor, propiedad, margen): la propiedad del proveedor debe ser al menos la del
+# consumidor por el margen. None se sustituye por el margen de la fuente de alimentación del índice.
+LIMITS = (
+    ("processor", "tdp", "cooling", "tdp", 1.0),
+    ("processor", "tdp", "power_supply", "wattage", None),
+    ("graphics", "tdp", "power_supply", "wattage", None),
+    ("graphics", "length", "case", "max_gpu_length", 1.0),
+)
+
+PROPERTIES = {"type"} | {name for names in SHARED_PROPERTIES.values() for name in names}
+PROPERTIES |= {name for limit in LIMITS for name in (limit[1], limit[3])}
+
+
+class _Component:
+    __slots__ = ("type", "keys", "numbers")
+
+    def __init__(self, component_type, keys, numbers):
+        self.type = component_type
+        self.keys = keys  # propiedad -> valores normalizados
+        self.numbers = numbers  # propiedad -> cantidad
+
+
+class CompatibilityIndex:
+    """
+    Claves de compatibilidad de los componentes publicados, precalculadas a partir de sus propiedades.
+
+    Las propiedades compartidas (socket, tipo de memoria, formato) se buscan en tablas hash por
+    (tipo, propiedad, valor) y los límites (TDP frente a disipación, consumo frente a potencia de la fuente)
+    en listas ordenadas por (tipo, propiedad), de las que se toma el rango que cumple el límite. Los
+    componentes se añaden y se quitan de uno en uno.
+    """
+
+    def __init__(self, psu_headroom: float = 1.5):
+        self.psu_headroom = psu_headroom
+        self.components = {}  # hubfile_id -> _Component
+        self.by_key = {}  # (type, propiedad, valor) -> hubfile ids
+        self.by_number = {}  # (type, propiedad) -> SortedList de (cantidad, hubfile_id)
+
+    def __len__(self):
+        return len(self.components)
+
+    def __contains__(self, hubfile_id):
+        return hubfile_id in self.components
+
+    def add(self, hubfile_id, properties: dict):
+        """Indexa un componente, {propiedad: (value_key, value_num)}; los que no tienen tipo se ignoran."""
+        self.remove(hubfile_id)
+        component_type = properties.get("type", (None, None))[0]
+        if not component_type:
+            return
+
+        keys, numbers = {}, {}
+        for name, (value_key, value_num) in properties.items():
+            if name == "type":
+                continue
+            values = {value.strip() for value in value_key.split(",") if value.strip()}
+            if values:
+                keys[name] = values
+            if value_num is not None:
+                numbers[name] = value_num
+
+        self.components[hubfile_id] = _Component(component_type, keys, numbers)
+        for name, values in keys.items():
+            for value in values:
+                self.by_key.setdefault((component_type, name, value), set()).add(hubfile_id)
+        for name, number in numbers.items():
+            self.by_number.setdefault((component_type, name), SortedList()).add((number, hubfile_id))
+
+    def remove(self, hubfile_id):
+        component = self.components.pop(hubfile_id, None)
+        if component is None:
+            return
+        for name, values in component.keys.items():
+            for value in values:
+                hubfile_ids = self.by_key[component.type, name, value]
+                hubfile_ids.discard(hubfile_id)
+                if not hubfile_ids:
+                    del self.by_key[component.type, name, value]
+        for name, number in component.numbers.items():
+            self.by_number[component.type, name].remove((number, hubfile_id))
+
+    def search(self, hubfile_id, component_type: str = None, limit: int = 50) -> list:
+        """
+        Componentes compatibles con uno dado (de un tipo o de todos), como (hubfile_id, tipo, propiedades
+        comprobadas) ordenados por hubfile_id. Un componente es compatible si cumple todas las reglas que se
+        pueden comprobar con las propiedades de ambos y al menos hay una.
+        """
+        component = self.components.get(hubfile_id)
+        if component is None:
+            return []
+
+        results = []
+        for other_type in [component_type] if component_type else self._related_types(component.type):
+            # Para cada regla comprobable: propiedad del otro componente y componentes que la cumplen
+            rules = []
+            for name in SHARED_PROPERTIES.get(frozenset((component.type, other_type)), ()):
+                if name in component.keys:
+                    matching = set()
+                    for value in component.keys[name]:
+                        matching |= self.by_key.get((other_type, name, value), set())
+                    rules.append((name, "keys", matching))
+            for consumer, consumed, provider, provided, margin in LIMITS:
+                margin = self.psu_headroom if margin is None else margin
+                if (consumer, provider) == (component.type, other_type) and consumed in component.numbers:
+                    minimum = component.numbers[consumed] * margin
+                    ranked = self.by_number.get((other_type, provided), SortedList())
+                    matching = {candidate for _, candidate in ranked.irange((minimum, -1), None)}
+                    rules.append((provided, "numbers", matching))
+                elif (provider, consumer) == (component.type, other_type) and provided in component.numbers:
+                    maximum = component.numbers[provided] / margin
+                    ranked = self.by_number.get((other_type, consumed), SortedList())
+                    matching = {candidate for _, candidate in ranked.irange(None, (maximum, float("inf")))}
+                    rules.append((consumed, "numbers", matching))
+
+            # Los candidatos se recorren por hubfile_id, así que de cada tipo bastan los primeros limit
+            candidates = set().union(*(matching for _, _, matching in rules)) - {hubfile_id}
+            found = 0
+            for candidate in sorted(candidates):
+                other = self.components[candidate]
+                checked = []
+                for name, kind, matching in rules:
+                    if name in getattr(other, kind):
+                        if candidate not in matching:
+                            break
+                        checked.append(name)
+                else:
+                    results.append((candidate, other_type, checked))
+                    found += 1
+                    if found == limit:
+                        break
+
+        results.sort()
+        return results[:limit]
+
+    @staticmethod
+    def _related_types(component_type: str) -> list:
+        related = {other for pair in SHARED_PROPERTIES if component_type in pair for other in pair - {component_type}}
+        related |= {limit[2] for limit in LIMITS if limit[0] == component_type}
+        related |= {limit[0] for limit in LIMITS if limit[2] == component_type}
+        return sorted(related)
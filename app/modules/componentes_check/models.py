@@ -1,4 +1,92 @@
+import msgspec
+import unidecode
+
 from app import db
+from app.modules.componentes_check.units import to_number
+
 
 class ComponenteCheck(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
\ No newline at end of file
+    id = db.Column(db.Integer, primary_key=True)
+
+
+class ComponentProperty(db.Model):
+    """
+    Una propiedad del bloque 'properties:' de un archivo .comp, extraída al subirlo para poder
+    buscar componentes sin abrir los archivos.
+    """
+
+    __table_args__ = (
+        db.Index("ix_component_property_key_value_key", "key", "value_key"),
+        db.Index("ix_component_property_key_value_num", "key", "value_num"),
+    )
+
+    hubfile_id = db.Column(db.Integer, db.ForeignKey("file.id", ondelete="CASCADE"), primary_key=True)
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(255), nullable=False)
+    # Valor normalizado (ver normalize) con el que se comparan los criterios de búsqueda
+    value_key = db.Column(db.String(255), nullable=False)
+    # Cantidad en hercios, vatios o bytes (ver units.to_number) para los filtros por rango; None si no es numérica
+    value_num = db.Column(db.Double)
+
+    hubfile = db.relationship(
+        "Hubfile", backref=db.backref("component_properties", cascade="all, delete-orphan", passive_deletes=True)
+    )
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        """Sin acentos, en minúsculas y con los espacios colapsados: 'LGA 1700 ' y 'lga  1700' son iguales."""
+        return " ".join(unidecode.unidecode(str(value)).lower().split())[:255]
+
+    @classmethod
+    def rows(cls, hubfile_id: int, properties: dict) -> list:
+        """Filas (como diccionarios) de las propiedades de un archivo."""
+        return [
+            {
+                "hubfile_id": hubfile_id,
+                "key": key[:64],
+                "value": str(value)[:255],
+                "value_key": cls.normalize(value),
+                "value_num": to_number(key, value),
+            }
+            for key, value in properties.items()
+            if str(value).strip()
+        ]
+
+    def __repr__(self):
+        return f"ComponentProperty<{self.hubfile_id}, {self.key}={self.value}>"
+
+
+class _CheckResult(msgspec.Struct):
+    parsed_data: dict
+    errors: list[str]
+
+
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(_CheckResult)
+
+
+class CompCheckResult(db.Model):
+    """
+    Resultado de validar un archivo .comp (parsed_data y errores en msgpack), guardado por el checksum de
+    su contenido y la versión de las reglas con que se validó, para no volver a leerlo ni a parsearlo.
+    """
+
+    # Resultados más grandes no se guardan (MEDIUMBLOB en MySQL)
+    MAX_BYTES = 2**24 - 1
+
+    checksum = db.Column(db.String(120), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True)
+    result = db.Column(db.LargeBinary(length=MAX_BYTES), nullable=False)
+
+    @staticmethod
+    def encode(parsed_data: dict, errors: list) -> bytes:
+        return _encoder.encode(_CheckResult(parsed_data, errors))
+
+    @staticmethod
+    def decode(result: bytes) -> tuple:
+        """(parsed_data, errors) de un resultado guardado."""
+        decoded = _decoder.decode(result)
+        return decoded.parsed_data, decoded.errors
+
+    def __repr__(self):
+        return f"CompCheckResult<{self.checksum}, v{self.version}>"
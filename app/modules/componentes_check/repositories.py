@@ -1,6 +1,227 @@
-from app.modules.componentes_check.models import ComponenteCheck
+import operator
+
+from sqlalchemy import and_, delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from app.modules.componentes_check.models import CompCheckResult, ComponenteCheck, ComponentProperty
+from app.modules.dataset.models import DataSet, DSMetaData
+from app.modules.featuremodel.models import FeatureModel
+from app.modules.hubfile.models import Hubfile
 from core.repositories.BaseRepository import BaseRepository
 
+COMPARISONS = {"=": operator.eq, "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
 class ComponenteCheckRepository(BaseRepository):
     def __init__(self):
-        super().__init__(ComponenteCheck)
\ No newline at end of file
+        super().__init__(ComponenteCheck)
+
+
+class CompCheckResultRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(CompCheckResult)
+
+    def result(self, checksum: str, version: int):
+        """Resultado (msgpack) guardado para el contenido con ese checksum, o None."""
+        return (
+            self.session.query(CompCheckResult.result)
+            .filter(CompCheckResult.checksum == checksum, CompCheckResult.version == version)
+            .scalar()
+        )
+
+    def results(self, checksums, version: int) -> dict:
+        """Resultados (msgpack) guardados para los contenidos con esos checksums ({checksum: resultado})."""
+        return dict(
+            self.session.query(CompCheckResult.checksum, CompCheckResult.result).filter(
+                CompCheckResult.checksum.in_(list(checksums)), CompCheckResult.version == version
+            )
+        )
+
+    def store(self, results: dict, version: int) -> None:
+        """
+        Guarda y confirma resultados ({checksum: resultado}). Los contenidos cuyo resultado ya guardó otra
+        petición se dejan como están.
+        """
+        rows = [{"checksum": checksum, "version": version, "result": result} for checksum, result in results.items()]
+        if not rows:
+            return
+
+        table = CompCheckResult.__table__
+        try:
+            with self.session.begin_nested():
+                self.session.execute(table.insert(), rows)
+        except IntegrityError:
+            for row in rows:
+                try:
+                    with self.session.begin_nested():
+                        self.session.execute(table.insert(), row)
+                except IntegrityError:
+                    pass
+        self.session.commit()
+
+    def dataset_files(self, dataset_id: int) -> list:
+        """(id, name, checksum, size, user_id) de los archivos del dataset, o [] si no existe."""
+        return (
+            self.session.query(Hubfile.id, Hubfile.name, Hubfile.checksum, Hubfile.size, DataSet.user_id)
+            .join(FeatureModel, Hubfile.feature_model_id == FeatureModel.id)
+            .join(DataSet, FeatureModel.data_set_id == DataSet.id)
+            .filter(DataSet.id == dataset_id)
+            .order_by(Hubfile.id)
+            .all()
+        )
+
+    def uncached_files(self, version: int, hubfile_ids=None) -> list:
+        """
+        (checksum, user_id, dataset_id, name) de un archivo subido por cada contenido sin resultado guardado,
+        entre todos los archivos por defecto.
+        """
+        query = (
+            self.session.query(Hubfile.checksum, DataSet.user_id, DataSet.id, Hubfile.name)
+            .join(FeatureModel, Hubfile.feature_model_id == FeatureModel.id)
+            .join(DataSet, FeatureModel.data_set_id == DataSet.id)
+            .outerjoin(
+                CompCheckResult,
+                and_(CompCheckResult.checksum == Hubfile.checksum, CompCheckResult.version == version),
+            )
+            .filter(CompCheckResult.checksum.is_(None))
+            .order_by(Hubfile.id)
+        )
+        if hubfile_ids is not None:
+            query = query.filter(Hubfile.id.in_(list(hubfile_ids)))
+        files = {}
+        for row in query:
+            files.setdefault(row.checksum, row)
+        return list(files.values())
+
+
+class ComponentPropertyRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(ComponentProperty)
+
+    def replace(self, hubfile_ids, rows: list):
+        """Sustituye las propiedades de los archivos por las filas dadas, en dos sentencias."""
+        hubfile_ids = list(hubfile_ids)
+        if hubfile_ids:
+            self.session.execute(delete(ComponentProperty).where(ComponentProperty.hubfile_id.in_(hubfile_ids)))
+        if rows:
+            self.session.execute(insert(ComponentProperty), rows)
+
+    def existing_keys(self, keys) -> set:
+        """Las propiedades de keys que tiene al menos un archivo."""
+        query = self.session.query(ComponentProperty.key).filter(ComponentProperty.key.in_(list(keys))).distinct()
+        return {key for key, in query}
+
+    def search(self, criteria: list, limit: int = 50, offset: int = 0) -> list:
+        """
+        Archivos de los datasets publicados que cumplen todos los criterios, como filas (hubfile_id, name,
+        dataset_id, title, dataset_doi). Cada criterio es (key, operador, valor): '=' compara value_key y
+        '<', '<=', '>', '>=' comparan value_num. Cada propiedad es una copia de la tabla unida por
+        hubfile_id, así que el planificador empieza por el rango más selectivo de los índices (key, value_key)
+        y (key, value_num) y comprueba el resto por clave primaria. Los criterios de una misma propiedad se
+        aplican a la misma fila.
+        """
+        conditions = {}
+        for key, comparison, value in criteria:
+            conditions.setdefault(key, []).append((comparison, value))
+
+        query = self._published_files()
+        for key, key_conditions in conditions.items():
+            prop = aliased(ComponentProperty)
+            query = query.join(
+                prop,
+                and_(
+                    prop.hubfile_id == Hubfile.id,
+                    prop.key == key,
+                    *(
+                        COMPARISONS[comparison](prop.value_key if comparison == "=" else prop.value_num, value)
+                        for comparison, value in key_conditions
+                    ),
+                ),
+            )
+        return query.order_by(Hubfile.id).limit(limit).offset(offset).all()
+
+    def published_files(self, hubfile_ids) -> list:
+        """Filas (hubfile_id, name, dataset_id, title, dataset_doi) de los archivos publicados entre los dados."""
+        return self._published_files().filter(Hubfile.id.in_(list(hubfile_ids))).order_by(Hubfile.id).all()
+
+    def _published_files(self):
+        return (
+            self.session.query(
+                Hubfile.id, Hubfile.name, DataSet.id.label("dataset_id"), DSMetaData.title, DSMetaData.dataset_doi
+            )
+            .join(FeatureModel, Hubfile.feature_model_id == FeatureModel.id)
+            .join(DataSet, FeatureModel.data_set_id == DataSet.id)
+            .join(DataSet.ds_meta_data)
+            .filter(DSMetaData.dataset_doi.isnot(None))
+        )
+
+    def properties_of(self, hubfile_ids) -> dict:
+        """Propiedades de los archivos ({hubfile_id: {key: value}})."""
+        properties = {}
+        query = self.session.query(ComponentProperty.hubfile_id, ComponentProperty.key, ComponentProperty.value)
+        for hubfile_id, key, value in query.filter(ComponentProperty.hubfile_id.in_(list(hubfile_ids))):
+            properties.setdefault(hubfile_id, {})[key] = value
+        return properties
+
+    def component_files(self, hubfile_ids=None) -> list:
+        """(hubfile_id, user_id, dataset_id, name) de los archivos subidos, todos por defecto."""
+        query = (
+            self.session.query(Hubfile.id, DataSet.user_id, DataSet.id, Hubfile.name)
+            .join(FeatureModel, Hubfile.feature_model_id == FeatureModel.id)
+            .join(DataSet, FeatureModel.data_set_id == DataSet.id)
+            .order_by(Hubfile.id)
+        )
+        if hubfile_ids is not None:
+            query = query.filter(Hubfile.id.in_(list(hubfile_ids)))
+        return query.all()
+
+    def published_properties(self, keys, hubfile_ids=None) -> dict:
+        """
+        Propiedades keys de los archivos publicados ({hubfile_id: {key: (value_key, value_num)}}), de todos
+        por defecto.
+        """
+        query = (
+            self.session.query(
+                ComponentProperty.hubfile_id,
+                ComponentProperty.key,
+                ComponentProperty.value_key,
+                ComponentProperty.value_num,
+            )
+            .join(Hubfile, ComponentProperty.hubfile_id == Hubfile.id)
+            .join(FeatureModel, Hubfile.feature_model_id == FeatureModel.id)
+            .join(DataSet, FeatureModel.data_set_id == DataSet.id)
+            .join(DataSet.ds_meta_data)
+            .filter(DSMetaData.dataset_doi.isnot(None), ComponentProperty.key.in_(list(keys)))
+        )
+        if hubfile_ids is not None:
+            query = query.filter(ComponentProperty.hubfile_id.in_(list(hubfile_ids)))
+
+        documents = {}
+        for hubfile_id, key, value_key, value_num in query:
+            documents.setdefault(hubfile_id, {})[key] = (value_key, value_num)
+        return documents
+
+    def changed_hubfile_ids(self, changes: dict) -> set:
+        """
+        Archivos cuyas propiedades o publicación dependen de las filas cambiadas
+        ({"dataset"|"ds_meta_data"|"feature_model"|"hubfile": ids}).
+        """
+        hubfile_ids = set(changes.get("hubfile", ()))
+        query = self.session.query(Hubfile.id).join(FeatureModel, Hubfile.feature_model_id == FeatureModel.id)
+        if changes.get("feature_model"):
+            hubfile_ids.update(
+                hubfile_id for (hubfile_id,) in query.filter(FeatureModel.id.in_(list(changes["feature_model"])))
+            )
+        if changes.get("dataset"):
+            hubfile_ids.update(
+                hubfile_id for (hubfile_id,) in query.filter(FeatureModel.data_set_id.in_(list(changes["dataset"])))
+            )
+        if changes.get("ds_meta_data"):
+            hubfile_ids.update(
+                hubfile_id
+                for (hubfile_id,) in query.join(DataSet, FeatureModel.data_set_id == DataSet.id).filter(
+                    DataSet.ds_meta_data_id.in_(list(changes["ds_meta_data"]))
+                )
+            )
+        return hubfile_ids
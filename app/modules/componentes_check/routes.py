@@ -1,9 +1,12 @@
+import io
 import logging
-from flask import jsonify
+from urllib.parse import unquote_plus
+from flask import current_app, jsonify, request
 from app.modules.componentes_check import componentes_check_bp
+from app.modules.componentes_check.services import CompCheckService, ComponentPropertyService
 from app.modules.hubfile.services import HubfileService
 
-from app.modules.componentes_check.check_comp import PCCompFileChecker
+from app.modules.componentes_check.check_comp import VALID_COMPONENT_TYPES, PCCompFileChecker
 
 logger = logging.getLogger(__name__)
 
@@ -20,30 +23,132 @@ def check_comp(file_id):
         if not hubfile:
             return jsonify({"errors": ["El archivo no existe."]}), 404
         
-        file_path = hubfile.get_path()
-
-        # 2. Leer contenido
+        # 2. Validar el contenido, o tomar el resultado guardado para su checksum
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                file_content = f.read()
+            parsed_data, errors = CompCheckService().check(hubfile)
         except Exception as e:
             logger.error(f"Error leyendo el archivo {file_id}: {e}")
             return jsonify({"errors": [f"No se pudo leer el archivo: {e}"]}), 500
 
-        # 3. Usar parser
-        checker = PCCompFileChecker(file_content)
-
-        if not checker.is_valid():
+        if errors:
             # Devolver errores de validación
-            logger.warning(f"El archivo {file_id} es inválido: {checker.get_errors()}")
-            return jsonify({"errors": checker.get_errors()}), 400
+            logger.warning(f"El archivo {file_id} es inválido: {errors}")
+            return jsonify({"errors": errors}), 400
 
-        # 4. Si el archivo es válido, devuelve los datos parseados
+        # 3. Si el archivo es válido, devuelve los datos parseados
         return jsonify({
             "message": "Valid .comp model",
-            "data": checker.get_parsed_data()
+            "data": parsed_data
         }), 200
 
     except Exception as e:
         logger.error(f"Excepción en check_comp para file_id {file_id}: {e}")
         return jsonify({"errors": [str(e)]}), 500
+
+
+@componentes_check_bp.route("/componentes_check/dataset/<int:dataset_id>", methods=["GET"])
+def check_dataset(dataset_id):
+    """
+    Validar los archivos de un dataset
+    Valida todos los archivos .comp del dataset en una sola petición y devuelve el resultado de cada uno.
+    """
+    files = CompCheckService().check_dataset(dataset_id)
+    if files is None:
+        return jsonify({"errors": ["El dataset no existe o no tiene archivos."]}), 404
+    return jsonify({"dataset_id": dataset_id, "valid": all(file["valid"] for file in files), "files": files})
+
+
+@componentes_check_bp.route("/componentes_check/search", methods=["GET"])
+def search_components():
+    """
+    Buscar componentes por sus propiedades
+    Cada parámetro (salvo limit, offset y el '_' que añaden algunos clientes para no usar la caché) es un
+    criterio: ?type=processor&socket=LGA1700 o rangos como ?tdp<=65&cores>=8&base_clock>=3.5GHz. Un parámetro
+    que no es una propiedad de ningún componente se rechaza. Se responde desde los índices de propiedades, sin
+    abrir archivos.
+    """
+    # Los rangos no son pares clave=valor, así que se lee la query string tal cual
+    expressions = [
+        unquote_plus(part)
+        for part in request.query_string.decode().split("&")
+        if part and unquote_plus(part.split("=", 1)[0]) not in ("limit", "offset", "_")
+    ]
+    if not expressions:
+        return jsonify({"errors": ["Indica al menos una propiedad, p. ej. ?type=processor"]}), 400
+
+    service = ComponentPropertyService()
+    try:
+        criteria = service.parse_criteria(expressions)
+    except ValueError as e:
+        return jsonify({"errors": [str(e)]}), 400
+
+    max_limit = current_app.config["COMPONENT_SEARCH_LIMIT"]
+    limit = min(max(request.args.get("limit", max_limit, type=int), 1), max_limit)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    components = service.search(criteria, limit=limit, offset=offset)
+    return jsonify({"criteria": expressions, "components": components})
+
+
+@componentes_check_bp.route("/components/compatible", methods=["GET"])
+def compatible_components():
+    """
+    Componentes compatibles
+    Componentes publicados compatibles con el archivo ?with=<hubfile_id> (socket, tipo de memoria, formato,
+    TDP y potencia de la fuente), solo de un tipo con ?type=.
+    """
+    hubfile_id = request.args.get("with", type=int)
+    if hubfile_id is None:
+        return jsonify({"errors": ["Indica el componente con ?with=<id del archivo>"]}), 400
+    component_type = request.args.get("type") or None
+    if component_type is not None and component_type not in VALID_COMPONENT_TYPES:
+        return jsonify({"errors": [f"Tipo de componente no válido: '{component_type}'"]}), 400
+
+    max_limit = current_app.config["COMPONENT_SEARCH_LIMIT"]
+    limit = min(max(request.args.get("limit", max_limit, type=int), 1), max_limit)
+    components = ComponentPropertyService().compatible(hubfile_id, component_type=component_type, limit=limit)
+    if components is None:
+        return jsonify({"errors": ["El componente no existe, no está publicado o no tiene tipo."]}), 404
+    return jsonify({"with": hubfile_id, "components": components})
+
+
+@componentes_check_bp.route("/components/similar", methods=["GET"])
+def similar_components():
+    """
+    Componentes parecidos
+    Los componentes publicados más parecidos (por sus propiedades numéricas y categóricas) a cada uno de
+    los archivos ?with=<id>,<id>,..., del mismo tipo; ?k= los limita.
+    """
+    try:
+        hubfile_ids = [int(part) for part in request.args.get("with", "").split(",") if part.strip()]
+    except ValueError:
+        return jsonify({"errors": ["?with= debe ser una lista de ids de archivo separados por comas"]}), 400
+    if not hubfile_ids:
+        return jsonify({"errors": ["Indica los componentes con ?with=<id>,<id>,..."]}), 400
+
+    components = ComponentPropertyService().similar(hubfile_ids, k=_similar_limit())
+    return jsonify({"components": {str(hubfile_id): similar for hubfile_id, similar in components.items()}})
+
+
+@componentes_check_bp.route("/components/similar", methods=["POST"])
+def similar_to_upload():
+    """
+    Componentes parecidos a un .comp
+    Los componentes publicados más parecidos al archivo .comp enviado en el campo 'file', sin subirlo.
+    """
+    file = request.files.get("file")
+    if file is None:
+        return jsonify({"errors": ["Envía un archivo .comp en el campo 'file'"]}), 400
+    try:
+        checker = PCCompFileChecker(io.TextIOWrapper(file.stream, encoding="utf-8"))
+    except UnicodeDecodeError:
+        return jsonify({"errors": ["El archivo no está en UTF-8."]}), 400
+
+    if not checker.is_valid():
+        return jsonify({"errors": checker.get_errors()}), 400
+    properties = checker.get_parsed_data()["properties"]
+    return jsonify({"components": ComponentPropertyService().similar_to(properties, k=_similar_limit())})
+
+
+def _similar_limit() -> int:
+    max_limit = current_app.config["COMPONENT_SIMILAR_LIMIT"]
+    return min(max(request.args.get("k", max_limit, type=int), 1), max_limit)
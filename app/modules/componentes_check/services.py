@@ -1,6 +1,325 @@
-from app.modules.componentes_check.repositories import ComponenteCheckRepository
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from flask import current_app
+
+from app.modules.componentes_check.check_comp import CHECKER_VERSION, PCCompFileChecker, check_files
+from app.modules.componentes_check.compatibility import PROPERTIES as COMPATIBILITY_PROPERTIES
+from app.modules.componentes_check.compatibility import CompatibilityIndex
+from app.modules.componentes_check.models import CompCheckResult, ComponentProperty
+from app.modules.componentes_check.repositories import (
+    CompCheckResultRepository,
+    ComponenteCheckRepository,
+    ComponentPropertyRepository,
+)
+from app.modules.componentes_check.similarity import PROPERTIES as SIMILARITY_PROPERTIES
+from app.modules.componentes_check.similarity import PersistedIndex
+from app.modules.componentes_check.units import to_number
+from app.modules.explore.search_index import ExploreIndex
+from core.configuration.configuration import uploaded_file_path, working_dir_path
 from core.services.BaseService import BaseService
 
+logger = logging.getLogger(__name__)
+
+_pool_state = {"pid": None, "executor": None}
+_pool_lock = threading.Lock()
+
+_CRITERION = re.compile(r"^\s*([a-zA-Z0-9_]+)\s*(<=|>=|<|>|=)\s*(.*?)\s*$")
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    """Procesos de validación de este proceso; los pools no sobreviven a un fork, así que cada worker crea el suyo."""
+    with _pool_lock:
+        if _pool_state["pid"] != os.getpid():
+            # El pool se crea durante una petición, cuando ya hay hilos (el del record buffer, los que reconstruyen
+            # los índices), y un fork podría dejar a los procesos esperando un lock que tenía otro hilo. Se
+            # arrancan desde un forkserver, que importa check_comp (y con él el paquete app) una sola vez
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["app.modules.componentes_check.check_comp"])
+            _pool_state["executor"] = ProcessPoolExecutor(workers, mp_context=context)
+            _pool_state["pid"] = os.getpid()
+        return _pool_state["executor"]
+
+
 class ComponenteCheckService(BaseService):
     def __init__(self):
-        super().__init__(ComponenteCheckRepository())
\ No newline at end of file
+        super().__init__(ComponenteCheckRepository())
+
+
+class CompCheckService(BaseService):
+    def __init__(self):
+        super().__init__(CompCheckResultRepository())
+
+    def check(self, hubfile) -> tuple:
+        """
+        (parsed_data, errors) de un archivo .comp. Si ya se validó un archivo con el mismo checksum se
+        devuelve su resultado sin abrir el archivo; si no, se valida y se guarda. OSError o
+        UnicodeDecodeError si hay que leerlo y no se puede.
+        """
+        result = self.repository.result(hubfile.checksum, CHECKER_VERSION)
+        if result is not None:
+            return CompCheckResult.decode(result)
+
+        with open(hubfile.get_path(), encoding="utf-8") as file:
+            checker = PCCompFileChecker(file)
+        self._store({hubfile.checksum: (checker.get_parsed_data(), checker.get_errors())})
+        return checker.get_parsed_data(), checker.get_errors()
+
+    def check_dataset(self, dataset_id: int):
+        """
+        Resultado de validar cada archivo del dataset ({id, name, valid, errors, cached}), o None si el
+        dataset no existe o no tiene archivos. Los contenidos sin resultado guardado se validan a la vez,
+        repartidos entre los procesos de validación cuando suman al menos COMP_CHECK_POOL_MIN_BYTES.
+        """
+        files = self.repository.dataset_files(dataset_id)
+        if not files:
+            return None
+
+        stored = self.repository.results({file.checksum for file in files}, CHECKER_VERSION)
+        results = {checksum: CompCheckResult.decode(result) for checksum, result in stored.items()}
+
+        pending = {}
+        for file in files:
+            if file.checksum not in results:
+                pending.setdefault(file.checksum, file)
+        if pending:
+            paths = [uploaded_file_path(file.user_id, dataset_id, file.name) for file in pending.values()]
+            in_pool = sum(file.size for file in pending.values()) >= current_app.config["COMP_CHECK_POOL_MIN_BYTES"]
+            checked = dict(zip(pending, self._check_files(paths, in_pool)))
+            results.update(checked)
+            self._store({checksum: result for checksum, result in checked.items() if result[0] is not None})
+
+        return [
+            {
+                "id": file.id,
+                "name": file.name,
+                "valid": not results[file.checksum][1],
+                "errors": results[file.checksum][1],
+                "cached": file.checksum in stored,
+            }
+            for file in files
+        ]
+
+    @staticmethod
+    def _check_files(paths: list, in_pool: bool) -> list:
+        workers = current_app.config["COMP_CHECK_WORKERS"]
+        if not in_pool or workers < 2 or len(paths) < 2:
+            return check_files(paths)
+        # Un trozo por proceso, para no pagar el paso de mensajes por cada archivo
+        size = -(-len(paths) // workers)
+        chunks = [paths[start : start + size] for start in range(0, len(paths), size)]
+        try:
+            return [result for chunk in _pool(workers).map(check_files, chunks) for result in chunk]
+        except BrokenProcessPool:
+            logger.exception("El pool de validación se ha roto; se valida en la petición y se creará otro")
+            with _pool_lock:
+                _pool_state["pid"] = None
+            return check_files(paths)
+
+    def warm_up(self, hubfile_ids=None, batch_size: int = 500) -> tuple:
+        """
+        Valida los archivos de uploads/ (todos por defecto) cuyo contenido no tiene resultado guardado.
+        Devuelve cuántos contenidos se validaron y cuántos archivos no se pudieron leer.
+        """
+        files = self.repository.uncached_files(CHECKER_VERSION, hubfile_ids)
+        checked = missing = 0
+        for start in range(0, len(files), batch_size):
+            results = {}
+            for checksum, user_id, dataset_id, name in files[start : start + batch_size]:
+                try:
+                    path = uploaded_file_path(user_id, dataset_id, name)
+                    with open(path, encoding="utf-8") as file:
+                        checker = PCCompFileChecker(file)
+                except (OSError, UnicodeDecodeError) as exc:
+                    logger.warning(f"No se pudo validar {name} del dataset {dataset_id}: {exc}")
+                    missing += 1
+                    continue
+                results[checksum] = checker.get_parsed_data(), checker.get_errors()
+                checked += 1
+            self._store(results)
+        return checked, missing
+
+    def _store(self, results: dict):
+        """Guarda ya, sin pasar por el buffer de registros, resultados ({checksum: (parsed_data, errors)})."""
+        encoded = {checksum: CompCheckResult.encode(*result) for checksum, result in results.items()}
+        self.repository.store(
+            {checksum: result for checksum, result in encoded.items() if len(result) <= CompCheckResult.MAX_BYTES},
+            CHECKER_VERSION,
+        )
+
+
+class ComponentPropertyService(BaseService):
+    def __init__(self):
+        super().__init__(ComponentPropertyRepository())
+
+    @staticmethod
+    def read_properties(path: str):
+        """Propiedades del archivo .comp de path, o None si no se puede leer."""
+        try:
+            with open(path, encoding="utf-8") as file:
+                return PCCompFileChecker(file).get_parsed_data()["properties"]
+        except (OSError, UnicodeDecodeError) as exc:
+            logger.warning(f"No se pudieron leer las propiedades de {path}: {exc}")
+            return None
+
+    def extract(self, hubfile, path: str):
+        """Guarda (sin confirmar) las propiedades del archivo recién subido en path."""
+        properties = self.read_properties(path) or {}
+        hubfile.component_properties = [
+            ComponentProperty(**row) for row in ComponentProperty.rows(hubfile.id, properties)
+        ]
+
+    def backfill(self, hubfile_ids=None, batch_size: int = 500) -> tuple:
+        """
+        Vuelve a extraer las propiedades de los archivos de uploads/ (todos por defecto), confirmando cada
+        lote. Devuelve cuántos archivos se indexaron y cuántos no se encontraron; las propiedades de estos
+        últimos no se tocan.
+        """
+        files = self.repository.component_files(hubfile_ids)
+        indexed = missing = 0
+        for start in range(0, len(files), batch_size):
+            replaced, rows = [], []
+            for hubfile_id, user_id, dataset_id, name in files[start : start + batch_size]:
+                properties = self.read_properties(uploaded_file_path(user_id, dataset_id, name))
+                if properties is None:
+                    missing += 1
+                    continue
+                replaced.append(hubfile_id)
+                rows.extend(ComponentProperty.rows(hubfile_id, properties))
+            self.repository.replace(replaced, rows)
+            self.repository.session.commit()
+            indexed += len(replaced)
+        return indexed, missing
+
+    def parse_criteria(self, expressions) -> list:
+        """
+        Criterios (key, operador, valor) de expresiones como 'type=processor', 'tdp<=65' o 'base_clock>=3.5GHz'.
+        Los valores de los rangos se pasan a la unidad canónica de la propiedad. ValueError si no se puede o si
+        ningún componente tiene la propiedad, para que un parámetro ajeno no se tome por un criterio.
+        """
+        criteria = []
+        for expression in expressions:
+            match = _CRITERION.match(expression)
+            if not match or not match.group(3):
+                raise ValueError(f"Criterio mal formado: '{expression}'")
+            key, comparison, value = match.group(1).lower(), match.group(2), match.group(3)
+            if comparison == "=":
+                criteria.append((key, comparison, ComponentProperty.normalize(value)))
+            else:
+                number = to_number(key, value)
+                if number is None:
+                    raise ValueError(f"Valor no numérico o con una unidad no válida para '{key}': '{value}'")
+                criteria.append((key, comparison, number))
+
+        unknown = {key for key, _, _ in criteria} - self.repository.existing_keys({key for key, _, _ in criteria})
+        if unknown:
+            raise ValueError(f"Parámetro desconocido: '{sorted(unknown)[0]}'")
+        return criteria
+
+    def search(self, criteria: list, limit: int = 50, offset: int = 0) -> list:
+        """
+        Componentes de los datasets publicados que cumplen los criterios (ver parse_criteria), con todas
+        sus propiedades.
+        """
+        return self._describe(self.repository.search(criteria, limit=limit, offset=offset))
+
+    def compatible(self, hubfile_id: int, component_type: str = None, limit: int = 50):
+        """
+        Componentes publicados compatibles con uno dado (de un tipo o de todos), con las propiedades con las
+        que se ha comprobado cada uno. None si el componente no está publicado o no tiene tipo.
+        """
+        index = self.compatibility_index()
+        index.refresh()
+        if hubfile_id not in index.index:
+            return None
+
+        matches = index.search(hubfile_id, component_type=component_type, limit=limit)
+        checked = {candidate: (other_type, names) for candidate, other_type, names in matches}
+        components = self._describe(self.repository.published_files(checked))
+        for component in components:
+            component["type"], component["checked"] = checked[component["id"]]
+        return components
+
+    @staticmethod
+    def compatibility_index() -> ExploreIndex:
+        # Se guarda con los índices de explore para que sus ganchos de sesión le pasen los cambios confirmados
+        indexes = current_app.extensions.setdefault("explore_index", {})
+        if "compatibility" not in indexes:
+            indexes.setdefault(
+                "compatibility",
+                ExploreIndex(
+                    partial(CompatibilityIndex, current_app.config["COMPONENT_PSU_HEADROOM"]),
+                    lambda hubfile_ids: ComponentPropertyRepository().published_properties(
+                        COMPATIBILITY_PROPERTIES, hubfile_ids
+                    ),
+                    lambda changes: ComponentPropertyRepository().changed_hubfile_ids(changes),
+                    current_app.config["EXPLORE_INDEX_TTL"],
+                ),
+            )
+        return indexes["compatibility"]
+
+    def similar(self, hubfile_ids, k: int = 10) -> dict:
+        """
+        Los k componentes publicados más parecidos a cada uno de los dados ({hubfile_id: componentes}), del
+        mismo tipo y del más cercano al más lejano. Los que no están publicados o no tienen tipo no aparecen.
+        """
+        matches = self.similarity_index().search(list(hubfile_ids), k=k)
+        return self._with_distances(matches)
+
+    def similar_to(self, properties: dict, k: int = 10) -> list:
+        """Los k componentes publicados más parecidos a unas propiedades leídas de un .comp sin subir."""
+        values = {row["key"]: (row["value_key"], row["value_num"]) for row in ComponentProperty.rows(None, properties)}
+        index = self.similarity_index()
+        index.refresh()
+        with index.lock:
+            matches = index.index.search_properties(values, k=k)
+        return self._with_distances({None: matches})[None]
+
+    @staticmethod
+    def similarity_index() -> PersistedIndex:
+        indexes = current_app.extensions.setdefault("explore_index", {})
+        if "similarity" not in indexes:
+            indexes.setdefault(
+                "similarity",
+                PersistedIndex(
+                    working_dir_path(current_app.config["COMPONENT_SIMILARITY_FILE"]),
+                    lambda hubfile_ids: ComponentPropertyRepository().published_properties(
+                        SIMILARITY_PROPERTIES, hubfile_ids
+                    ),
+                    lambda changes: ComponentPropertyRepository().changed_hubfile_ids(changes),
+                    current_app.config["EXPLORE_INDEX_TTL"],
+                ),
+            )
+        return indexes["similarity"]
+
+    def _with_distances(self, matches: dict) -> dict:
+        ids = {other for neighbours in matches.values() for other, _ in neighbours}
+        components = {component["id"]: component for component in self._describe(self.repository.published_files(ids))}
+        return {
+            key: [
+                dict(components[other], distance=round(distance, 4))
+                for other, distance in neighbours
+                if other in components
+            ]
+            for key, neighbours in matches.items()
+        }
+
+    def _describe(self, files) -> list:
+        properties = self.repository.properties_of([file.id for file in files]) if files else {}
+        return [
+            {
+                "id": file.id,
+                "name": file.name,
+                "dataset_id": file.dataset_id,
+                "dataset_title": file.title,
+                "url": f"http://{os.getenv('DOMAIN', 'localhost')}/doi/{file.dataset_doi}",
+                "properties": properties.get(file.id, {}),
+            }
+            for file in files
+        ]
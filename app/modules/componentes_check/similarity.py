@@ -0,0 +1,270 @@
+import logging
+import os
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+from app.modules.componentes_check.units import PROPERTY_UNITS
+from app.modules.explore.search_index import ExploreIndex
+
+logger = logging.getLogger(__name__)
+
+# Propiedades numéricas, comparadas en escala logarítmica: 3.5 GHz frente a 3.8 GHz están más cerca que
+# 6 núcleos frente a 14
+NUMERIC_PROPERTIES = tuple(PROPERTY_UNITS)
+# Propiedades categóricas, repartidas en CATEGORY_BUCKETS columnas por hash de (propiedad, valor)
+CATEGORICAL_PROPERTIES = ("socket", "memory_type", "form_factor", "manufacturer", "brand", "chipset", "interface")
+CATEGORY_BUCKETS = 32
+# Valor de una categoría en su columna: dos valores distintos suman 2 * CATEGORY_WEIGHT² a la distancia al
+# cuadrado, casi lo mismo que un número el doble de grande
+CATEGORY_WEIGHT = 0.5
+# Distancia (al cuadrado) que suma cada propiedad numérica que solo tiene uno de los dos componentes
+MISSING_PENALTY = 1.0
+
+PROPERTIES = {"type", *NUMERIC_PROPERTIES, *CATEGORICAL_PROPERTIES}
+
+_NUMERIC_COLUMNS = {name: column for column, name in enumerate(NUMERIC_PROPERTIES)}
+
+
+def encode(properties: dict):
+    """
+    Vector de un componente, {propiedad: (value_key, value_num)}: (tipo, números, presencia, categorías).
+    Un número que falta vale 0 y no está presente; los valores separados por comas de una propiedad
+    categórica se reparten su peso.
+    """
+    numbers = np.zeros(len(NUMERIC_PROPERTIES), dtype=np.float32)
+    present = np.zeros(len(NUMERIC_PROPERTIES), dtype=np.float32)
+    categories = np.zeros(CATEGORY_BUCKETS, dtype=np.float32)
+    for name, (value_key, value_num) in properties.items():
+        if name in _NUMERIC_COLUMNS and value_num is not None:
+            numbers[_NUMERIC_COLUMNS[name]] = np.log1p(max(value_num, 0.0))
+            present[_NUMERIC_COLUMNS[name]] = 1.0
+        elif name in CATEGORICAL_PROPERTIES and value_key:
+            values = [value.strip() for value in value_key.split(",") if value.strip()]
+            for value in values:
+                categories[zlib.crc32(f"{name}={value}".encode()) % CATEGORY_BUCKETS] += CATEGORY_WEIGHT / np.sqrt(
+                    len(values)
+                )
+    return properties.get("type", (None, None))[0] or None, numbers, present, categories
+
+
+_N = len(NUMERIC_PROPERTIES)
+# Bloques de columnas de la matriz de características
+_SQUARES, _NUMBERS, _PRESENT = slice(0, _N), slice(_N, 2 * _N), slice(2 * _N, 3 * _N)
+_CATEGORIES = slice(3 * _N, 3 * _N + CATEGORY_BUCKETS)
+
+
+class _Block:
+    """Filas de los componentes de un tipo: ids, características y suma de los cuadrados de sus categorías."""
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.removed = 0
+        self.rows = {}  # hubfile_id -> fila
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.features = np.zeros((capacity, _CATEGORIES.stop), dtype=np.float32)
+        self.norms = np.zeros(capacity, dtype=np.float32)
+
+    def add(self, hubfile_id, numbers, present, categories):
+        if self.size == len(self.ids):
+            self._resize(2 * len(self.ids))
+        row = self.size
+        features = self.features[row]
+        features[_SQUARES], features[_NUMBERS], features[_PRESENT] = numbers * numbers, numbers, present
+        features[_CATEGORIES], self.norms[row] = categories, categories @ categories
+        self.ids[row] = hubfile_id
+        self.rows[hubfile_id] = row
+        self.size += 1
+
+    def remove(self, hubfile_id):
+        self.ids[self.rows.pop(hubfile_id)] = -1
+        self.removed += 1
+        if self.removed * 2 > self.size:
+            self.compact()
+
+    def neighbours(self, numbers, present, categories, k, exclude=None) -> list:
+        """(hubfile_id, distancia al cuadrado) de las k filas más cercanas a cada consulta; ninguna si k < 1."""
+        if k < 1:
+            return [[] for _ in range(len(numbers))]
+
+        # Distancia al cuadrado: |x - q|² en las propiedades numéricas que tienen ambos, la penalización de
+        # las que tiene solo uno y |c - d|² entre las categorías. Cada término es un producto de la fila
+        # por la consulta, así que se calculan todos con una sola multiplicación de matrices
+        queries = np.empty((len(numbers), _CATEGORIES.stop), dtype=np.float32)
+        queries[:, _SQUARES] = present
+        queries[:, _NUMBERS] = -2 * numbers * present
+        queries[:, _PRESENT] = numbers * numbers * present + MISSING_PENALTY * (1 - 2 * present)
+        queries[:, _CATEGORIES] = -2 * categories
+        distances = queries @ self.features[: self.size].T
+        distances += self.norms[: self.size]
+        distances += (MISSING_PENALTY * present.sum(axis=1) + (categories * categories).sum(axis=1))[:, None]
+
+        distances[:, self.ids[: self.size] == -1] = np.inf
+        if exclude is not None:
+            distances[np.arange(len(exclude)), exclude] = np.inf
+
+        k = min(k, self.size)
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k] if k < self.size else None
+        results = []
+        for query, row_distances in enumerate(distances):
+            candidates = np.arange(self.size) if nearest is None else nearest[query]
+            candidates = candidates[np.argsort(row_distances[candidates], kind="stable")]
+            results.append(
+                [(int(self.ids[row]), float(row_distances[row])) for row in candidates if row_distances[row] < np.inf]
+            )
+        return results
+
+    def query(self, hubfile_ids):
+        """Números, presencia y categorías de las filas de hubfile_ids, para buscar sus vecinos."""
+        features = self.features[[self.rows[hubfile_id] for hubfile_id in hubfile_ids]]
+        return features[:, _NUMBERS], features[:, _PRESENT], features[:, _CATEGORIES]
+
+    def _resize(self, capacity: int):
+        for name, fill in (("ids", -1), ("features", 0), ("norms", 0)):
+            array = getattr(self, name)
+            resized = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+            resized[: self.size] = array[: self.size]
+            setattr(self, name, resized)
+
+    def compact(self):
+        kept = np.flatnonzero(self.ids[: self.size] != -1)
+        for name, fill in (("ids", -1), ("features", 0), ("norms", 0)):
+            array = getattr(self, name)
+            array[: len(kept)] = array[kept]
+            array[len(kept) : self.size] = fill
+        self.size, self.removed = len(kept), 0
+        self.rows = {int(hubfile_id): row for row, hubfile_id in enumerate(self.ids[: self.size])}
+
+
+class SimilarityIndex:
+    """
+    Matrices de características de los componentes publicados, una por tipo, para buscar los vecinos
+    más cercanos de un lote de componentes.
+
+    Cada fila guarda los números de un componente, sus cuadrados, su presencia y sus categorías, de modo
+    que las distancias de un lote de consultas a todas las filas de su tipo salen de un solo producto de
+    matrices. Las filas nuevas se añaden al final (la capacidad se duplica al llenarse) y las quitadas se
+    marcan y se compactan cuando son la mitad.
+    """
+
+    def __init__(self):
+        self.blocks = {}  # tipo -> _Block
+        self.types = {}  # hubfile_id -> tipo
+
+    def __len__(self):
+        return len(self.types)
+
+    def __contains__(self, hubfile_id):
+        return hubfile_id in self.types
+
+    def add(self, hubfile_id, properties: dict):
+        """Indexa un componente, {propiedad: (value_key, value_num)}; los que no tienen tipo se ignoran."""
+        self.remove(hubfile_id)
+        component_type, numbers, present, categories = encode(properties)
+        if component_type is None:
+            return
+        self.blocks.setdefault(component_type, _Block()).add(hubfile_id, numbers, present, categories)
+        self.types[hubfile_id] = component_type
+
+    def remove(self, hubfile_id):
+        component_type = self.types.pop(hubfile_id, None)
+        if component_type is not None:
+            self.blocks[component_type].remove(hubfile_id)
+
+    def search(self, hubfile_ids, k: int = 10) -> dict:
+        """
+        Los k componentes más parecidos, del mismo tipo, a cada uno de los indexados entre hubfile_ids, como
+        (hubfile_id, distancia) de menor a mayor distancia.
+        """
+        by_type = {}
+        for hubfile_id in hubfile_ids:
+            if hubfile_id in self.types:
+                by_type.setdefault(self.types[hubfile_id], []).append(hubfile_id)
+
+        results = {}
+        for component_type, queries in by_type.items():
+            block = self.blocks[component_type]
+            exclude = [block.rows[hubfile_id] for hubfile_id in queries]
+            for hubfile_id, neighbours in zip(queries, block.neighbours(*block.query(queries), k=k, exclude=exclude)):
+                results[hubfile_id] = [(other, float(np.sqrt(max(distance, 0.0)))) for other, distance in neighbours]
+        return results
+
+    def search_properties(self, properties: dict, k: int = 10) -> list:
+        """Los k componentes más parecidos a uno sin indexar, de su tipo o de todos si no lo tiene."""
+        component_type, numbers, present, categories = encode(properties)
+        if component_type is None:
+            blocks = list(self.blocks.values())
+        else:
+            blocks = [self.blocks[component_type]] if component_type in self.blocks else []
+        neighbours = [
+            neighbour
+            for block in blocks
+            for neighbour in block.neighbours(numbers[None], present[None], categories[None], k=k)[0]
+        ]
+        neighbours.sort(key=lambda neighbour: neighbour[1])
+        return [(other, float(np.sqrt(max(distance, 0.0)))) for other, distance in neighbours[:k]]
+
+    def save(self, path: str):
+        """Guarda las matrices en un .npz, sin las filas quitadas; el archivo se reemplaza de una vez."""
+        arrays = {}
+        for code, (component_type, block) in enumerate(self.blocks.items()):
+            block.compact()
+            arrays[f"ids_{code}"] = block.ids[: block.size]
+            arrays[f"features_{code}"] = block.features[: block.size]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".npz")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                np.savez(file, type_names=np.array(list(self.blocks), dtype=str), **arrays)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    @classmethod
+    def load(cls, path: str):
+        index = cls()
+        with np.load(path) as data:
+            for code, component_type in enumerate(data["type_names"]):
+                ids, features = data[f"ids_{code}"], data[f"features_{code}"]
+                block = index.blocks[str(component_type)] = _Block(capacity=max(len(ids), 1024))
+                block.size = len(ids)
+                block.ids[: block.size], block.features[: block.size] = ids, features
+                categories = features[:, _CATEGORIES]
+                block.norms[: block.size] = (categories * categories).sum(axis=1)
+                block.rows = {int(hubfile_id): row for row, hubfile_id in enumerate(ids)}
+                index.types.update(dict.fromkeys(block.rows, str(component_type)))
+        return index
+
+
+class PersistedIndex(ExploreIndex):
+    """
+    ExploreIndex de un SimilarityIndex que se guarda en path cada vez que se reconstruye. La primera vez
+    se lee de path si se guardó hace menos de ttl segundos, y caduca cuando lo habría hecho el guardado.
+    """
+
+    def __init__(self, path: str, load, resolve, ttl: float):
+        super().__init__(SimilarityIndex, load, resolve, ttl)
+        self.path = path
+
+    def rebuild(self):
+        if self.built_at is None:
+            try:
+                age = time.time() - os.path.getmtime(self.path)
+                if age < self.ttl:
+                    self.swap(SimilarityIndex.load(self.path), time.monotonic() - age)
+                    return
+            except (OSError, ValueError, KeyError):
+                pass
+        super().rebuild()
+
+    def build(self):
+        # Se guarda antes de publicarlo, cuando ningún otro hilo lo usa
+        index = super().build()
+        try:
+            index.save(self.path)
+        except OSError as exc:
+            logger.warning(f"No se pudo guardar el índice de similitud en {self.path}: {exc}")
+        return index
@@ -0,0 +1,432 @@
+import io
+import json
+import os
+
+import pytest
+from click.testing import CliRunner
+
+import app
+from app import db
+from app.modules.auth.models import User
+from app.modules.componentes_check.check_comp import CHECKER_VERSION, PCCompFileChecker, compile_rules
+from app.modules.componentes_check.compatibility import CompatibilityIndex
+from app.modules.componentes_check.models import CompCheckResult, ComponentProperty
+from app.modules.componentes_check.services import CompCheckService, ComponentPropertyService
+from app.modules.componentes_check.similarity import SimilarityIndex
+from app.modules.componentes_check.units import to_number
+from app.modules.dataset.models import DataSet, DSMetaData, PublicationType
+from app.modules.featuremodel.models import FeatureModel, FMMetaData
+from app.modules.hubfile.models import Hubfile
+from rosemary.commands.comp_check import comp_check
+
+COMPONENTS = {
+    "i514600.comp": "type: processor\n    model: Intel Core i5-14600K\n    socket: LGA1700\n    cores: 14\n"
+    "    base_clock: 3.5GHz\n    tdp: 125W",
+    "r7600.comp": "type: processor\n    model: AMD Ryzen 5 7600\n    socket: AM5\n    cores: 6\n"
+    "    base_clock: 3800 MHz\n    tdp: 65",
+    "rtx4070.comp": "type: graphics\n    model: NVIDIA GeForce RTX 4070\n    tdp: 200 W",
+}
+
+
+@pytest.fixture(scope="module")
+def test_client(test_client):
+    """
+    Extends the test_client fixture to add additional specific data for module testing.
+    """
+    with test_client.application.app_context():
+        user = User.query.filter_by(email="test@example.com").first()
+        ds_meta_data = DSMetaData(
+            title="Builds",
+            description="Parts of a few builds",
+            publication_type=PublicationType.DATA_MANAGEMENT_PLAN,
+            dataset_doi="10.1234/builds",
+        )
+        dataset = DataSet(user_id=user.id, ds_meta_data=ds_meta_data)
+        for filename in COMPONENTS:
+            fm_meta_data = FMMetaData(
+                comp_filename=filename,
+                title=filename,
+                description=f"Description for {filename}",
+                publication_type=PublicationType.SOFTWARE_DOCUMENTATION,
+            )
+            feature_model = FeatureModel(data_set=dataset, fm_meta_data=fm_meta_data)
+            db.session.add(Hubfile(name=filename, checksum=filename, size=1, feature_model=feature_model))
+        db.session.commit()
+
+    yield test_client
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    """Writes the .comp files of the test dataset to a temporary working directory."""
+    monkeypatch.setenv("WORKING_DIR", str(tmp_path))
+    dataset = DataSet.query.first()
+    folder = tmp_path / "uploads" / f"user_{dataset.user_id}" / f"dataset_{dataset.id}"
+    folder.mkdir(parents=True)
+    for filename, properties in COMPONENTS.items():
+        (folder / filename).write_text(
+            f"name: {filename}\nversion: 1.0\nauthor: Tester\n\nproperties:\n    id: c1\n    {properties}\n"
+        )
+    return folder
+
+
+def test_backfill_extracts_the_properties_of_uploaded_files(test_client, uploads):
+    (uploads / "rtx4070.comp").unlink()
+    assert ComponentPropertyService().backfill(batch_size=2) == (2, 1)
+
+    hubfile = Hubfile.query.filter_by(name="i514600.comp").one()
+    assert {prop.key: prop.value for prop in hubfile.component_properties} == {
+        "id": "c1",
+        "type": "processor",
+        "model": "Intel Core i5-14600K",
+        "socket": "LGA1700",
+        "cores": "14",
+        "base_clock": "3.5GHz",
+        "tdp": "125W",
+    }
+    assert ComponentProperty.query.filter_by(key="socket", value_key="lga1700").count() == 1
+
+
+def test_search_components_by_properties(test_client, uploads):
+    ComponentPropertyService().backfill()
+
+    response = test_client.get("/componentes_check/search?type=Processor&socket=lga1700")
+    assert response.status_code == 200
+    components = response.get_json()["components"]
+    assert [component["name"] for component in components] == ["i514600.comp"]
+    assert components[0]["properties"]["model"] == "Intel Core i5-14600K"
+    assert components[0]["dataset_title"] == "Builds"
+
+    response = test_client.get("/componentes_check/search?type=processor&limit=1&offset=1")
+    assert [component["name"] for component in response.get_json()["components"]] == ["r7600.comp"]
+    assert test_client.get("/componentes_check/search?type=processor&socket=AM4").get_json()["components"] == []
+    assert test_client.get("/componentes_check/search").status_code == 400
+
+    response = test_client.get("/componentes_check/search?type=processor&limit=1&_=1697000000000")
+    assert [component["name"] for component in response.get_json()["components"]] == ["i514600.comp"]
+    response = test_client.get("/componentes_check/search?type=processor&utm_source=mail")
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == ["Parámetro desconocido: 'utm_source'"]
+
+
+def test_extract_replaces_the_properties_of_a_file(test_client, uploads):
+    hubfile = Hubfile.query.filter_by(name="rtx4070.comp").one()
+    (uploads / "rtx4070.comp").write_text(
+        "name: gpu\nversion: 1.0\nauthor: Tester\n\nproperties:\n    type: graphics\n    model: Intel Arc B580\n"
+    )
+    ComponentPropertyService().extract(hubfile, str(uploads / "rtx4070.comp"))
+    db.session.commit()
+
+    components = ComponentPropertyService().search([("type", "=", "graphics")])
+    assert [component["properties"] for component in components] == [{"type": "graphics", "model": "Intel Arc B580"}]
+
+
+def test_to_number_converts_to_canonical_units():
+    assert to_number("base_clock", "2.5GHz") == 2.5e9
+    assert to_number("base_clock", "3,2") == 3.2e9, "Known properties default to their usual unit"
+    assert to_number("capacity", "2 TB") == 2e12 and to_number("memory", "16GiB") == 16 * 2**30
+    assert to_number("tdp", "65") == to_number("tdp", "0.065kW") == 65
+    assert to_number("tdp", "65 GB") is None, "Units of another quantity are rejected"
+    assert to_number("cores", "8") == 8 and to_number("cores", "8W") is None
+    assert to_number("model", "Intel Core i5") is None
+
+
+def test_search_components_by_ranges(test_client, uploads):
+    ComponentPropertyService().backfill()
+
+    def names(query):
+        response = test_client.get(f"/componentes_check/search?{query}")
+        assert response.status_code == 200
+        return [component["name"] for component in response.get_json()["components"]]
+
+    assert names("tdp<=65") == ["r7600.comp"]
+    assert names("type=processor&cores>=8") == ["i514600.comp"]
+    assert names("base_clock>3600MHz") == ["r7600.comp"], "Ranges compare quantities, not strings"
+    assert names("tdp>=60&tdp<100") == ["r7600.comp"], "Ranges on one property apply to the same value"
+    assert names("tdp>=60&tdp<100&socket=lga1700") == []
+    assert names("tdp%3C%3D200") == ["i514600.comp", "r7600.comp", "rtx4070.comp"], "Encoded operators work too"
+
+    assert test_client.get("/componentes_check/search?tdp<=lots").status_code == 400
+    assert test_client.get("/componentes_check/search?cores>=8W").status_code == 400
+
+
+def test_compatibility_index_matches_keys_and_limits():
+    index = CompatibilityIndex(psu_headroom=1.5)
+    index.add(1, {"type": ("processor", None), "socket": ("am5", None), "tdp": ("65", 65.0)})
+    index.add(2, {"type": ("cooling", None), "socket": ("lga1700, am5", None), "tdp": ("120", 120.0)})
+    index.add(3, {"type": ("cooling", None), "socket": ("am5", None), "tdp": ("50", 50.0)})
+    index.add(4, {"type": ("cooling", None), "socket": ("am4", None)})
+    index.add(5, {"type": ("power_supply", None), "wattage": ("650w", 650.0)})
+    index.add(6, {"type": ("power_supply", None), "wattage": ("90w", 90.0)})
+    index.add(7, {"type": ("cooling", None)})
+
+    assert index.search(1) == [(2, "cooling", ["socket", "tdp"]), (5, "power_supply", ["wattage"])]
+    assert index.search(1, component_type="power_supply") == [(5, "power_supply", ["wattage"])]
+    assert index.search(5) == [(1, "processor", ["tdp"])], "Limits are checked from both sides"
+    assert index.search(6) == [], "65 W with a 1.5 headroom needs more than 90 W"
+
+    index.remove(2)
+    assert index.search(1, component_type="cooling") == []
+    assert index.search(99) == []
+
+
+def test_compatible_components(test_client, uploads):
+    ComponentPropertyService().backfill()
+    processor = Hubfile.query.filter_by(name="r7600.comp").one()
+
+    response = test_client.get(f"/components/compatible?with={processor.id}")
+    assert response.status_code == 200
+    assert response.get_json()["components"] == []
+
+    # A new cooler is picked up by the index once its properties are committed
+    (uploads / "cooler.comp").write_text(
+        "name: cooler\nversion: 1.0\nauthor: Tester\n\nproperties:\n    type: cooling\n    socket: AM4, AM5\n"
+        "    tdp: 120 W\n"
+    )
+    dataset = DataSet.query.first()
+    fm_meta_data = FMMetaData(
+        comp_filename="cooler.comp",
+        title="cooler.comp",
+        description="Description for cooler.comp",
+        publication_type=PublicationType.SOFTWARE_DOCUMENTATION,
+    )
+    cooler = Hubfile(
+        name="cooler.comp",
+        checksum="cooler.comp",
+        size=1,
+        feature_model=FeatureModel(data_set=dataset, fm_meta_data=fm_meta_data),
+    )
+    db.session.add(cooler)
+    db.session.flush()
+    ComponentPropertyService().extract(cooler, str(uploads / "cooler.comp"))
+    db.session.commit()
+
+    response = test_client.get(f"/components/compatible?with={processor.id}&type=cooling")
+    components = response.get_json()["components"]
+    assert [(component["name"], component["type"], component["checked"]) for component in components] == [
+        ("cooler.comp", "cooling", ["socket", "tdp"])
+    ]
+    assert components[0]["dataset_title"] == "Builds"
+    intel = Hubfile.query.filter_by(name="i514600.comp").one()
+    assert test_client.get(f"/components/compatible?with={intel.id}").get_json()["components"] == []
+
+    assert test_client.get("/components/compatible").status_code == 400
+    assert test_client.get(f"/components/compatible?with={cooler.id}&type=toaster").status_code == 400
+    assert test_client.get("/components/compatible?with=999999").status_code == 404
+
+
+def test_similarity_index_finds_the_nearest_components_of_a_type(tmp_path):
+    def processor(cores, tdp, socket):
+        return {
+            "type": ("processor", None),
+            "cores": (str(cores), cores),
+            "tdp": (str(tdp), tdp),
+            "socket": (socket, None),
+        }
+
+    index = SimilarityIndex()
+    index.add(1, processor(8, 65.0, "am5"))
+    index.add(2, processor(8, 65.0, "lga1700"))
+    index.add(3, processor(16, 170.0, "am5"))
+    index.add(4, {"type": ("processor", None), "cores": ("8", 8.0)})
+    index.add(5, {"type": ("graphics", None), "tdp": ("65", 65.0)})
+
+    assert [other for other, _ in index.search([1])[1]] == [2, 4, 3], "Sockets count, missing properties more"
+    assert index.search([1, 5], k=1) == {1: [(2, pytest.approx(0.5**0.5))], 5: []}
+    assert [other for other, _ in index.search_properties(processor(12, 120.0, "am5"), k=2)] == [3, 1]
+    assert [other for other, _ in index.search_properties({"tdp": ("65", 65.0)}, k=5)][0] == 5
+    assert index.search([1], k=0) == {1: []} and index.search_properties(processor(8, 65.0, "am5"), k=-1) == []
+
+    index.remove(2)
+    index.save(str(tmp_path / "components.npz"))
+    loaded = SimilarityIndex.load(str(tmp_path / "components.npz"))
+    assert len(loaded) == 4 and 2 not in loaded
+    assert loaded.search([1, 3]) == index.search([1, 3])
+    loaded.add(6, processor(8, 65.0, "am5"))
+    assert loaded.search([1], k=1) == {1: [(6, 0.0)]}, "New components are appended to a loaded index"
+
+
+def test_similar_components(test_client, uploads):
+    ComponentPropertyService().backfill()
+    intel = Hubfile.query.filter_by(name="i514600.comp").one()
+    amd = Hubfile.query.filter_by(name="r7600.comp").one()
+
+    response = test_client.get(f"/components/similar?with={intel.id},{amd.id},999999")
+    assert response.status_code == 200
+    components = response.get_json()["components"]
+    assert set(components) == {str(intel.id), str(amd.id)}
+    assert [component["name"] for component in components[str(intel.id)]] == ["r7600.comp"]
+    assert components[str(intel.id)][0]["dataset_title"] == "Builds"
+
+    comp = (
+        "name: cpu\nversion: 1.0\nauthor: Tester\n\nproperties:\n    id: c9\n    type: processor\n"
+        "    model: AMD Ryzen 5 9600\n    description: A new processor\n    cores: 6\n    tdp: 65W\n"
+    )
+    response = test_client.post(
+        "/components/similar?k=1",
+        data={"file": (io.BytesIO(comp.encode()), "cpu.comp")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    assert [component["name"] for component in response.get_json()["components"]] == ["r7600.comp"]
+
+    assert test_client.get("/components/similar").status_code == 400
+    assert test_client.get("/components/similar?with=abc").status_code == 400
+    assert test_client.post("/components/similar").status_code == 400
+
+
+def test_checker_parses_text_and_line_streams_alike():
+    text = (
+        "name: cpu\nversion: 1.0\nauthor: Tester\n\nproperties:\n    id: c1\n    type: processor\n"
+        "    model: AMD Ryzen 5 7600\n    description: Six cores\n    TDP : 65 W\n"
+    )
+    for content in (text, io.StringIO(text), iter(text.splitlines(keepends=True))):
+        checker = PCCompFileChecker(content)
+        assert checker.is_valid(), checker.get_errors()
+        assert checker.get_parsed_data()["name"] == "cpu"
+        assert checker.get_parsed_data()["properties"]["tdp"] == "65 W"
+
+    checker = PCCompFileChecker(io.StringIO("name: cpu\nversion: 1.0\nauthor: Tester\nproperties :\n    id: c1\n"))
+    assert "No se encontró la sección 'properties:'." in checker.get_errors()
+    checker = PCCompFileChecker(io.StringIO(text.replace("TDP : 65 W", "not a property")))
+    assert checker.get_errors() == ["Propiedad mal formada: 'not a property'"]
+    assert PCCompFileChecker(io.StringIO("  \n\n")).get_errors()[0] == "El archivo está vacío."
+
+
+def test_checker_applies_the_rules_of_each_type():
+    header = "name: part\nversion: 1.0\nauthor: Tester\nproperties:\n    id: p1\n    description: A part\n"
+    errors = PCCompFileChecker(header + "    type: Processor\n    model: Apple M1\n    cores: 8\n").get_errors()
+    assert errors == ["Processor inválido o marca desconocida en model: 'Apple M1'"]
+    errors = PCCompFileChecker(header + "    type: storage\n").get_errors()
+    assert errors == ["Falta la propiedad obligatoria: 'model'", "Tipo de almacenamiento desconocido en model: 'None'"]
+
+    ram = header + "    type: memory\n    model: Vengeance\n    memory_type: {}\n    capacity: 64MB\n"
+    assert all(PCCompFileChecker(ram.format(value)).is_valid() for value in ("DDR4-3200", "GDDR6", "Unified Memory"))
+    assert PCCompFileChecker(header + "    type: toaster\n    model: X\n").get_errors() == [
+        "Tipo de componente no válido: 'toaster'"
+    ]
+
+
+def test_compiled_patterns_and_ranges():
+    class Checker(PCCompFileChecker):
+        required_fields, required_properties, rules = compile_rules(
+            {
+                "types": {
+                    "processor": [
+                        {"property": "base_clock", "min": "100MHz", "max": "10GHz"},
+                        {"property": "socket", "pattern": "(?i)(LGA|AM)\\d+"},
+                    ]
+                }
+            }
+        )
+
+    # Los rangos admiten unidades y no se comprueban en los valores que no son cantidades
+    cpu = "name: cpu\nversion: 1.0\nauthor: Tester\nproperties:\n    type: processor\n    base_clock: {}\n"
+    assert Checker(cpu.format("3800MHz")).is_valid() and Checker(cpu.format("auto")).is_valid()
+    assert Checker(cpu.format("38GHz")).get_errors() == [
+        "Valor fuera de rango en base_clock: '38GHz' (entre 100MHz y 10GHz)"
+    ]
+    assert Checker(cpu.format("4GHz\n    socket: am5")).is_valid()
+    assert Checker(cpu.format("4GHz\n    socket: BGA")).get_errors() == ["Valor no válido en socket: 'BGA'"]
+
+
+def test_compile_rules_rejects_invalid_rules():
+    with pytest.raises(ValueError):
+        compile_rules({"types": {"processor": [{"property": "tdp", "min": "3 GHz"}]}})
+    with pytest.raises(ValueError):
+        compile_rules({"types": {"processor": [{"property": "model"}]}})
+    with pytest.raises(ValueError):
+        compile_rules({"required_fields": ["license"], "types": {}})
+
+
+def test_check_results_are_cached_by_checksum(test_client, uploads):
+    CompCheckResult.query.delete()
+    db.session.commit()
+    intel = Hubfile.query.filter_by(name="i514600.comp").one()
+    amd = Hubfile.query.filter_by(name="r7600.comp").one()
+    gpu = Hubfile.query.filter_by(name="rtx4070.comp").one()
+
+    for filename in ("i514600.comp", "r7600.comp"):
+        with open(uploads / filename, "a") as file:
+            file.write("    description: A processor\n")
+    assert CompCheckService().warm_up([intel.id, amd.id]) == (2, 0)
+    assert CompCheckService().warm_up([intel.id, amd.id]) == (0, 0), "Cached contents are not validated again"
+
+    response = test_client.get(f"/componentes_check/check_comp/{gpu.id}")
+    assert response.status_code == 400
+    errors = response.get_json()["errors"]
+
+    # Repeat checks do not open the files
+    for filename in COMPONENTS:
+        (uploads / filename).unlink()
+    response = test_client.get(f"/componentes_check/check_comp/{intel.id}")
+    assert response.status_code == 200
+    assert response.get_json()["data"]["properties"]["model"] == "Intel Core i5-14600K"
+    assert test_client.get(f"/flamapy/check_comp/{amd.id}").status_code == 200
+    assert test_client.get(f"/componentes_check/check_comp/{gpu.id}").get_json()["errors"] == errors
+    assert CompCheckResult.query.count() == 3
+
+    # A result another request stored first is kept
+    repository = CompCheckService().repository
+    repository.store({intel.checksum: b"other", "new-checksum": CompCheckResult.encode({}, [])}, CHECKER_VERSION)
+    assert CompCheckResult.query.count() == 4 and repository.result(intel.checksum, CHECKER_VERSION) != b"other"
+
+
+def test_check_all_files_of_a_dataset(test_client, uploads, monkeypatch, tmp_path, caplog):
+    CompCheckResult.query.delete()
+    db.session.commit()
+    with open(uploads / "i514600.comp", "a") as file:
+        file.write("    description: A processor\n")
+    # Validated by two processes even though the files are small. They import the app package, which loads
+    # its modules from WORKING_DIR
+    monkeypatch.setitem(test_client.application.config, "COMP_CHECK_POOL_MIN_BYTES", 0)
+    monkeypatch.setitem(test_client.application.config, "COMP_CHECK_WORKERS", 2)
+    root = os.path.dirname(os.path.dirname(app.__file__))
+    for name in ("app", ".moduleignore"):
+        if os.path.exists(os.path.join(root, name)):
+            (tmp_path / name).symlink_to(os.path.join(root, name))
+    dataset = DataSet.query.first()
+
+    response = test_client.get(f"/componentes_check/dataset/{dataset.id}")
+    assert response.status_code == 200
+    files = {file["name"]: file for file in response.get_json()["files"]}
+    assert files["i514600.comp"]["valid"] and not files["i514600.comp"]["cached"]
+    assert files["r7600.comp"]["errors"] == ["Falta la propiedad obligatoria: 'description'"]
+    assert response.get_json()["valid"] is False
+
+    files = {
+        file["name"]: file for file in test_client.get(f"/componentes_check/dataset/{dataset.id}").get_json()["files"]
+    }
+    assert all(files[name]["cached"] for name in COMPONENTS)
+    assert test_client.get("/componentes_check/dataset/999999").status_code == 404
+    assert "pool" not in caplog.text
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_comp_check_streams_results_of_a_tree(tmp_path, jobs):
+    header = "name: cpu\nversion: 1.0\nauthor: Tester\n\nproperties:\n    id: c1\n    description: A part\n"
+    (tmp_path / "vendor" / "cpus").mkdir(parents=True)
+    for i in range(5):
+        (tmp_path / "vendor" / "cpus" / f"cpu{i}.comp").write_text(
+            header + "    type: processor\n    model: AMD Ryzen\n"
+        )
+    (tmp_path / "vendor" / "bad.comp").write_text(header + "    type: processor\n    model: Apple M1\n")
+    (tmp_path / "vendor" / "notes.txt").write_text("not a component")
+
+    result = CliRunner().invoke(comp_check, [str(tmp_path / "vendor"), "--jobs", jobs, "--chunk-size", "2"])
+    assert result.exit_code == 1
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert sorted(line["path"] for line in lines) == ["bad.comp"] + [f"cpus/cpu{i}.comp" for i in range(5)]
+    assert [line for line in lines if not line["valid"]] == [
+        {
+            "path": "bad.comp",
+            "valid": False,
+            "errors": ["Processor inválido o marca desconocida en model: 'Apple M1'"],
+            "type": "processor",
+        }
+    ]
+    assert "6 files: 5 valid, 1 invalid, 0 unreadable" in result.stderr
+    assert "Processor inválido o marca desconocida en model: '…'" in result.stderr
+
+    result = CliRunner().invoke(comp_check, [str(tmp_path / "vendor" / "cpus"), "--jobs", jobs])
+    assert result.exit_code == 0
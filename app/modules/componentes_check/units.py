@@ -0,0 +1,70 @@
+import re
+
+# Multiplicador de cada unidad a la unidad canónica de su magnitud: hercios, vatios, bytes o metros
+UNITS = {
+    "hz": (1, "Hz"),
+    "khz": (1e3, "Hz"),
+    "mhz": (1e6, "Hz"),
+    "ghz": (1e9, "Hz"),
+    "w": (1, "W"),
+    "kw": (1e3, "W"),
+    "b": (1, "B"),
+    "kb": (1e3, "B"),
+    "mb": (1e6, "B"),
+    "gb": (1e9, "B"),
+    "tb": (1e12, "B"),
+    "kib": (2**10, "B"),
+    "mib": (2**20, "B"),
+    "gib": (2**30, "B"),
+    "tib": (2**40, "B"),
+    "mm": (1e-3, "m"),
+    "cm": (1e-2, "m"),
+}
+
+# Unidad en la que se leen los números sin unidad de las propiedades conocidas (None: un simple recuento)
+PROPERTY_UNITS = {
+    "base_clock": "ghz",
+    "boost_clock": "ghz",
+    "clock": "ghz",
+    "core_clock": "mhz",
+    "memory_clock": "mhz",
+    "tdp": "w",
+    "power": "w",
+    "wattage": "w",
+    "capacity": "gb",
+    "memory": "gb",
+    "vram": "gb",
+    "cache": "mb",
+    "length": "mm",
+    "max_gpu_length": "mm",
+    "cores": None,
+    "threads": None,
+}
+
+_QUANTITY = re.compile(r"^\s*([-+]?\d+(?:[.,]\d+)?)\s*([a-zA-Z]*)\s*$")
+
+
+def to_number(key: str, value: str):
+    """
+    Cantidad de value en la unidad canónica de su magnitud ('2.5GHz' -> 2.5e9, '65 W' -> 65.0), o None
+    si no es un número con una unidad conocida. Los números sin unidad de las propiedades conocidas se
+    leen en su unidad habitual ('tdp: 65' son vatios) y una unidad de otra magnitud no se acepta.
+    """
+    match = _QUANTITY.match(str(value))
+    if not match:
+        return None
+    number = float(match.group(1).replace(",", "."))
+    unit = match.group(2).lower()
+
+    if key in PROPERTY_UNITS:
+        expected = PROPERTY_UNITS[key]
+        if expected is None:
+            return None if unit else number
+        unit = unit or expected
+        if unit not in UNITS or UNITS[unit][1] != UNITS[expected][1]:
+            return None
+    elif not unit:
+        return number
+    elif unit not in UNITS:
+        return None
+    return number * UNITS[unit][0]
@@ -0,0 +1,227 @@
+import fnmatch
+import logging
+import os
+import tarfile
+import time
+import uuid
+import zipfile
+from typing import Optional
+
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+ARCHIVE_FORMATS = {
+    "zip": {"extension": "zip", "mimetype": "application/zip"},
+    "tar.zst": {"extension": "tar.zst", "mimetype": "application/zstd"},
+}
+
+
+class StreamSink:
+    """
+    Write-only file object used as the target of an archive writer.
+
+    It keeps whatever the writer produced since the last drain() so a generator can hand it out
+    straight away. It has no seek(), which makes ZipFile write data descriptors instead of going
+    back to patch local headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        chunks, self._chunks = self._chunks, []
+        return b"".join(chunks)
+
+
+def iter_archive_entries(directory: str, root_name: str):
+    """Yields (path, arcname) for every file under directory, with arcnames prefixed by root_name."""
+    for subdir, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file in sorted(files):
+            full_path = os.path.join(subdir, file)
+            relative_path = os.path.relpath(full_path, directory)
+            yield full_path, os.path.join(root_name, relative_path)
+
+
+def stream_zip(entries, compression=zipfile.ZIP_DEFLATED, chunk_size=CHUNK_SIZE):
+    """
+    Generates a ZIP64 archive of entries, an iterable of (path, arcname), as a stream of bytes.
+
+    Files are read chunk by chunk and every compressed chunk is yielded as soon as it is produced,
+    so memory use and time to first byte do not depend on the size of the archive.
+    """
+    sink = StreamSink()
+    with zipfile.ZipFile(sink, mode="w", compression=compression) as zipf:
+        for path, arcname in entries:
+            zinfo = zipfile.ZipInfo.from_file(path, arcname)
+            zinfo.compress_type = compression
+            with open(path, "rb") as source, zipf.open(zinfo, mode="w", force_zip64=True) as target:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+
+    # Central directory, written when the archive is closed
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def stream_tar_zst(entries, level=3, threads=-1, chunk_size=CHUNK_SIZE):
+    """
+    Generates a tar archive of entries, an iterable of (path, arcname), compressed with zstd.
+
+    The tar stream is written by hand (header, contents, padding) so that every chunk can be
+    yielded while the file is read. threads=-1 lets zstd compress on all the available cores.
+    """
+    sink = StreamSink()
+    compressor = zstandard.ZstdCompressor(level=level, threads=threads)
+    written = 0
+
+    with compressor.stream_writer(sink, closefd=False) as writer:
+        for path, arcname in entries:
+            stat = os.stat(path)
+            tarinfo = tarfile.TarInfo(arcname)
+            tarinfo.size = stat.st_size
+            tarinfo.mtime = int(stat.st_mtime)
+            tarinfo.mode = 0o644
+            header = tarinfo.tobuf(format=tarfile.PAX_FORMAT)
+            writer.write(header)
+            written += len(header)
+
+            remaining = tarinfo.size
+            with open(path, "rb") as source:
+                while remaining > 0:
+                    chunk = source.read(min(chunk_size, remaining))
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    remaining -= len(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+
+            # Keep the archive consistent if the file shrank while it was being read
+            padding = remaining + (-tarinfo.size) % tarfile.BLOCKSIZE
+            writer.write(tarfile.NUL * padding)
+            written += tarinfo.size + (-tarinfo.size) % tarfile.BLOCKSIZE
+
+        # End of archive: two empty blocks, then padding up to a full record
+        trailer = 2 * tarfile.BLOCKSIZE
+        trailer += (-(written + trailer)) % tarfile.RECORDSIZE
+        writer.write(tarfile.NUL * trailer)
+
+    data = sink.drain()
+    if data:
+        yield data
+
+
+class ArchiveCache:
+    """
+    On-disk cache of prebuilt archives with a size-bounded LRU eviction policy.
+
+    Entries are addressed by a name derived from the content of the archive, so a change in the
+    content produces a new name and old entries are never served again. The last access time of
+    each entry is kept in its atime, leaving the mtime (Last-Modified) untouched.
+    """
+
+    TEMP_SUFFIX = ".part"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Optional[str]:
+        path = self.path_for(name)
+        try:
+            stat = os.stat(path)
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store(self, name: str, chunks, replaces: str = None):
+        """
+        Passes chunks through while writing them to the cache. The entry only becomes visible once
+        the whole archive has been written; if the stream is interrupted the partial file is removed.
+        Entries whose name matches the `replaces` pattern are dropped, as they hold a previous content.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.path_for(f"{name}.{uuid.uuid4().hex}{self.TEMP_SUFFIX}")
+        completed = False
+        try:
+            with open(temp_path, "wb") as temp_file:
+                for chunk in chunks:
+                    temp_file.write(chunk)
+                    yield chunk
+            os.replace(temp_path, self.path_for(name))
+            completed = True
+        finally:
+            if not completed and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        if replaces:
+            self.discard(replaces, keep=name)
+        self.evict()
+
+    def discard(self, pattern: str, keep: str = None):
+        for entry in self._entries():
+            if fnmatch.fnmatchcase(entry.name, pattern) and entry.name != keep:
+                self._remove(entry.path)
+
+    def evict(self):
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _entries(self):
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if entry.is_file() and not entry.name.endswith(self.TEMP_SUFFIX)]
+        except FileNotFoundError:
+            return []
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.warning(f"Could not remove cached archive {path}: {exc}")
@@ -1,6 +1,7 @@
 from datetime import datetime
 from enum import Enum
 
+import unidecode
 from flask import request
 from sqlalchemy import Enum as SQLAlchemyEnum
 
@@ -41,6 +42,31 @@ class Author(db.Model):
         return {"name": self.name, "affiliation": self.affiliation, "orcid": self.orcid}
 
 
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @staticmethod
+    def names(tags: str) -> list:
+        """
+        Distinct tag names of a comma-separated tags column: stripped, lower-cased and folded to ASCII,
+        so that names the database collation takes as equal are equal here too.
+        """
+        names = (unidecode.unidecode(name).strip().lower()[:120] for name in (tags or "").split(","))
+        return list(dict.fromkeys(name for name in names if name))
+
+    def __repr__(self):
+        return f"Tag<{self.name}>"
+
+
+# The comma-separated tags columns stay the text users edit; these rows are kept in sync with them on flush
+ds_meta_data_tag = db.Table(
+    "ds_meta_data_tag",
+    db.Column("ds_meta_data_id", db.Integer, db.ForeignKey("ds_meta_data.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("tag_id", db.Integer, db.ForeignKey("tag.id", ondelete="CASCADE"), primary_key=True, index=True),
+)
+
+
 class DSMetrics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     number_of_models = db.Column(db.String(120))
@@ -62,9 +88,13 @@ class DSMetaData(db.Model):
     ds_metrics_id = db.Column(db.Integer, db.ForeignKey("ds_metrics.id"))
     ds_metrics = db.relationship("DSMetrics", uselist=False, backref="ds_meta_data", cascade="all, delete")
     authors = db.relationship("Author", backref="ds_meta_data", lazy=True, cascade="all, delete")
+    tag_list = db.relationship("Tag", secondary=ds_meta_data_tag, lazy=True)
 
 
 class DataSet(db.Model):
+    # Explore pages are read in (created_at, id) order from the last row of the previous page
+    __table_args__ = (db.Index("ix_data_set_created_at_id", "created_at", "id"),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
 
@@ -73,6 +103,9 @@ class DataSet(db.Model):
 
     ds_meta_data = db.relationship("DSMetaData", backref=db.backref("data_set", uselist=False))
     feature_models = db.relationship("FeatureModel", backref="data_set", lazy=True, cascade="all, delete")
+    aggregate = db.relationship(
+        "DSAggregate", uselist=False, lazy="joined", backref="data_set", cascade="all, delete-orphan"
+    )
 
     def name(self):
         return self.ds_meta_data.title
@@ -91,9 +124,13 @@ class DataSet(db.Model):
         return f"https://zenodo.org/record/{self.ds_meta_data.deposition_id}" if self.ds_meta_data.dataset_doi else None
 
     def get_files_count(self):
+        if self.aggregate is not None:
+            return self.aggregate.files_count
         return sum(len(fm.files) for fm in self.feature_models)
 
     def get_file_total_size(self):
+        if self.aggregate is not None:
+            return self.aggregate.total_size_bytes
         return sum(file.size for fm in self.feature_models for file in fm.files)
 
     def get_file_total_size_for_human(self):
@@ -126,14 +163,41 @@ class DataSet(db.Model):
             "total_size_in_bytes": self.get_file_total_size(),
             "total_size_in_human_format": self.get_file_total_size_for_human(),
             "download_count": self.get_download_count(),
+            "view_count": self.get_view_count(),
         }
 
     def __repr__(self):
         return f"DataSet<{self.id}>"
 
     def get_download_count(self):
+        if self.aggregate is not None:
+            return self.aggregate.download_count
         return db.session.query(DSDownloadRecord).filter_by(dataset_id=self.id).count()
 
+    def get_view_count(self):
+        if self.aggregate is not None:
+            return self.aggregate.view_count
+        return db.session.query(DSViewRecord).filter_by(dataset_id=self.id).count()
+
+
+class DSAggregate(db.Model):
+    """Counters of a dataset kept up to date as records and files are written, so listings do not count rows."""
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    download_count = db.Column(db.Integer, nullable=False, default=0)
+    view_count = db.Column(db.Integer, nullable=False, default=0)
+    files_count = db.Column(db.Integer, nullable=False, default=0)
+    total_size_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    feature_model_count = db.Column(db.Integer, nullable=False, default=0)
+    # Log of the time-decayed downloads and views (see trending.py), NULL until the dataset has any
+    trending_score = db.Column(db.Double, nullable=True, index=True)
+
+    def __repr__(self):
+        return (
+            f"DSAggregate<dataset_id={self.dataset_id}, downloads={self.download_count}, "
+            f"views={self.view_count}, files={self.files_count}>"
+        )
+
 
 class DSDownloadRecord(db.Model):
     id = db.Column(db.Integer, primary_key=True)
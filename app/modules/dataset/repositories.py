@@ -1,11 +1,31 @@
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from flask_login import current_user
-from sqlalchemy import desc, func
-
-from app.modules.dataset.models import Author, DataSet, DOIMapping, DSDownloadRecord, DSMetaData, DSViewRecord
+from sqlalchemy import bindparam, desc, func
+
+from app.modules.dataset.models import (
+    Author,
+    DataSet,
+    DOIMapping,
+    DSAggregate,
+    DSDownloadRecord,
+    DSMetaData,
+    DSViewRecord,
+)
+from app.modules.dataset.trending import (
+    DEFAULT_HALF_LIFE_HOURS,
+    DOWNLOAD_WEIGHT,
+    TRENDING_WINDOW_HALF_LIVES,
+    VIEW_WEIGHT,
+    day_score,
+    log_add,
+    log_sum,
+)
+from app.modules.featuremodel.models import FeatureModel
+from app.modules.hubfile.models import Hubfile
+from app.modules.stats.repositories import DailyStatRepository
 from core.repositories.BaseRepository import BaseRepository
 
 logger = logging.getLogger(__name__)
@@ -23,6 +43,15 @@ class DSDownloadRecordRepository(BaseRepository):
     def total_dataset_downloads(self) -> int:
         return self.model.query.count()
 
+    def record_download(self, dataset_id: int, user_cookie: str) -> None:
+        self.create_buffered(
+            ("user_id", "dataset_id", "download_cookie"),
+            user_id=current_user.id if current_user.is_authenticated else None,
+            dataset_id=dataset_id,
+            download_date=datetime.now(timezone.utc),
+            download_cookie=user_cookie,
+        )
+
 
 class DSMetaDataRepository(BaseRepository):
     def __init__(self):
@@ -47,8 +76,9 @@ class DSViewRecordRepository(BaseRepository):
             view_cookie=user_cookie,
         ).first()
 
-    def create_new_record(self, dataset: DataSet, user_cookie: str) -> DSViewRecord:
-        return self.create(
+    def create_new_record(self, dataset: DataSet, user_cookie: str) -> None:
+        self.create_buffered(
+            ("user_id", "dataset_id", "view_cookie"),
             user_id=current_user.id if current_user.is_authenticated else None,
             dataset_id=dataset.id,
             view_date=datetime.now(timezone.utc),
@@ -56,6 +86,108 @@ class DSViewRecordRepository(BaseRepository):
         )
 
 
+class DSAggregateRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DSAggregate)
+        self.daily_stat_repository = DailyStatRepository()
+
+    def increment(self, column: str, counts: dict, scores: dict, half_life_hours: float) -> None:
+        """
+        Adds counts ({dataset_id: amount}) to a counter and log scores ({dataset_id: score}) to the trending
+        scores, building the rows of datasets that have none yet.
+        """
+        table = DSAggregate.__table__
+        existing = {
+            dataset_id: trending_score
+            for dataset_id, trending_score in self.session.query(DSAggregate.dataset_id, DSAggregate.trending_score)
+            .filter(DSAggregate.dataset_id.in_(list(counts)))
+            .with_for_update()
+        }
+        if existing:
+            self.session.execute(
+                table.update()
+                .where(table.c.dataset_id == bindparam("b_dataset_id"))
+                .values({column: table.c[column] + bindparam("b_amount"), "trending_score": bindparam("b_score")}),
+                [
+                    {
+                        "b_dataset_id": dataset_id,
+                        "b_amount": counts[dataset_id],
+                        "b_score": log_add(trending_score, scores.get(dataset_id)),
+                    }
+                    for dataset_id, trending_score in existing.items()
+                ],
+            )
+
+        missing = set(counts) - set(existing)
+        if missing:
+            self.rebuild(missing, half_life_hours)
+
+    def rebuild(self, dataset_ids=None, half_life_hours: float = DEFAULT_HALF_LIFE_HOURS) -> int:
+        """Recomputes the aggregates of the given datasets (all of them by default) from the source tables."""
+        if dataset_ids is None:
+            dataset_ids = [dataset_id for (dataset_id,) in self.session.query(DataSet.id)]
+        dataset_ids = list(dataset_ids)
+        if not dataset_ids:
+            return 0
+
+        def grouped(*columns, join=None, by):
+            query = self.session.query(by, *columns)
+            if join is not None:
+                query = query.join(join)
+            return {row[0]: row[1:] for row in query.filter(by.in_(dataset_ids)).group_by(by)}
+
+        files = grouped(
+            func.count(Hubfile.id), func.coalesce(func.sum(Hubfile.size), 0), join=Hubfile, by=FeatureModel.data_set_id
+        )
+        feature_models = grouped(func.count(FeatureModel.id), by=FeatureModel.data_set_id)
+        # Raw records may have been pruned, so the events are counted from the rollups and the raw records left
+        downloads = self.daily_stat_repository.event_counts(
+            DSDownloadRecord, "dataset", "dataset_id", "download_date", "downloads", dataset_ids
+        )
+        views = self.daily_stat_repository.event_counts(
+            DSViewRecord, "dataset", "dataset_id", "view_date", "views", dataset_ids
+        )
+        trending = self.trending_scores(dataset_ids, half_life_hours)
+
+        table = DSAggregate.__table__
+        self.session.execute(table.delete().where(table.c.dataset_id.in_(dataset_ids)))
+        self.session.execute(
+            table.insert(),
+            [
+                {
+                    "dataset_id": dataset_id,
+                    "download_count": downloads.get(dataset_id, 0),
+                    "view_count": views.get(dataset_id, 0),
+                    "files_count": files.get(dataset_id, (0, 0))[0],
+                    "total_size_bytes": int(files.get(dataset_id, (0, 0))[1]),
+                    "feature_model_count": feature_models.get(dataset_id, (0,))[0],
+                    "trending_score": trending.get(dataset_id),
+                }
+                for dataset_id in dataset_ids
+            ],
+        )
+        return len(dataset_ids)
+
+    def trending_scores(self, dataset_ids: list, half_life_hours: float) -> dict:
+        """
+        Log trending scores ({dataset_id: score}) from the daily events of the last TRENDING_WINDOW_HALF_LIVES
+        half-lives; older events weigh less than a millionth of a new one and are left out.
+        """
+        since = datetime.now(timezone.utc).date() - timedelta(hours=half_life_hours * TRENDING_WINDOW_HALF_LIVES)
+        scores = {}
+        for record_model, date_column, column, weight in (
+            (DSDownloadRecord, "download_date", "downloads", DOWNLOAD_WEIGHT),
+            (DSViewRecord, "view_date", "views", VIEW_WEIGHT),
+        ):
+            daily = self.daily_stat_repository.daily_event_counts(
+                record_model, "dataset", "dataset_id", date_column, column, dataset_ids, since
+            )
+            for dataset_id, days in daily.items():
+                day_scores = (day_score(day, weight * amount, half_life_hours) for day, amount in days.items())
+                scores[dataset_id] = log_add(scores.get(dataset_id), log_sum(day_scores))
+        return scores
+
+
 class DataSetRepository(BaseRepository):
     def __init__(self):
         super().__init__(DataSet)
@@ -98,6 +230,17 @@ class DataSetRepository(BaseRepository):
             .all()
         )
 
+    def trending_synchronized(self, limit: int = 5):
+        """Top datasets by trending score: a walk of the first rows of the trending_score index."""
+        return (
+            self.model.query.join(DSAggregate, DSAggregate.dataset_id == DataSet.id)
+            .join(DSMetaData)
+            .filter(DSAggregate.trending_score.isnot(None), DSMetaData.dataset_doi.isnot(None))
+            .order_by(DSAggregate.trending_score.desc())
+            .limit(limit)
+            .all()
+        )
+
 
 class DOIMappingRepository(BaseRepository):
     def __init__(self):
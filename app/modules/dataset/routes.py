@@ -2,26 +2,25 @@ import json
 import logging
 import os
 import shutil
-import tempfile
 import uuid
-from datetime import datetime, timezone
-from zipfile import ZipFile
 
 from flask import (
+    Response,
     abort,
+    current_app,
     jsonify,
     make_response,
     redirect,
     render_template,
     request,
-    send_from_directory,
+    send_file,
     url_for,
 )
 from flask_login import current_user, login_required
 
 from app.modules.dataset import dataset_bp
+from app.modules.dataset.archives import ARCHIVE_FORMATS
 from app.modules.dataset.forms import DataSetForm
-from app.modules.dataset.models import DSDownloadRecord
 from app.modules.dataset.services import (
     AuthorService,
     DataSetService,
@@ -31,6 +30,7 @@ from app.modules.dataset.services import (
     DSViewRecordService,
 )
 from app.modules.zenodo.services import ZenodoService
+from core.delivery.file_delivery import nginx_delivery_enabled, send_protected_file
 
 logger = logging.getLogger(__name__)
 
@@ -176,63 +176,65 @@ def delete():
 def download_dataset(dataset_id):
     dataset = dataset_service.get_or_404(dataset_id)
 
-    file_path = f"uploads/user_{dataset.user_id}/dataset_{dataset.id}/"
-
-    temp_dir = tempfile.mkdtemp()
-    zip_path = os.path.join(temp_dir, f"dataset_{dataset_id}.zip")
-
-    with ZipFile(zip_path, "w") as zipf:
-        for subdir, dirs, files in os.walk(file_path):
-            for file in files:
-                full_path = os.path.join(subdir, file)
-
-                relative_path = os.path.relpath(full_path, file_path)
-
-                zipf.write(
-                    full_path,
-                    arcname=os.path.join(os.path.basename(zip_path[:-4]), relative_path),
-                )
+    archive_format = request.args.get("format", "zip")
+    if archive_format not in ARCHIVE_FORMATS:
+        abort(400)
+    mimetype = ARCHIVE_FORMATS[archive_format]["mimetype"]
+    download_name = f"dataset_{dataset_id}.{ARCHIVE_FORMATS[archive_format]['extension']}"
+
+    digest = dataset_service.get_files_digest(dataset)
+    etag = dataset_service.get_archive_name(dataset, digest, archive_format)
+    cached_archive = dataset_service.get_cached_archive(dataset, digest, archive_format)
+
+    if nginx_delivery_enabled():
+        # nginx can only send files that exist, so the archive is built before handing it over
+        archive_path = cached_archive or dataset_service.build_archive(dataset, digest, archive_format)
+        resp = send_protected_file(
+            os.path.dirname(archive_path),
+            os.path.basename(archive_path),
+            current_app.config["X_ACCEL_ARCHIVES_LOCATION"],
+            download_name=download_name,
+            mimetype=mimetype,
+        )
+    elif cached_archive:
+        # Conditional responses honour Range/If-Range, so interrupted downloads can be resumed
+        resp = send_file(
+            cached_archive,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name,
+            conditional=True,
+            etag=etag,
+        )
+    else:
+        # The archive is generated while it is being sent and kept for the next downloads
+        resp = Response(dataset_service.cached_archive_stream(dataset, digest, archive_format), mimetype=mimetype)
+        resp.headers["Content-Disposition"] = f"attachment; filename={download_name}"
+        resp.set_etag(etag)
 
     user_cookie = request.cookies.get("download_cookie")
     if not user_cookie:
         user_cookie = str(uuid.uuid4())  # Generate a new unique identifier if it does not exist
         # Save the cookie to the user's browser
-        resp = make_response(
-            send_from_directory(
-                temp_dir,
-                f"dataset_{dataset_id}.zip",
-                as_attachment=True,
-                mimetype="application/zip",
-            )
-        )
         resp.set_cookie("download_cookie", user_cookie)
-    else:
-        resp = send_from_directory(
-            temp_dir,
-            f"dataset_{dataset_id}.zip",
-            as_attachment=True,
-            mimetype="application/zip",
-        )
 
-    # Check if the download record already exists for this cookie
-    existing_record = DSDownloadRecord.query.filter_by(
-        user_id=current_user.id if current_user.is_authenticated else None,
-        dataset_id=dataset_id,
-        download_cookie=user_cookie,
-    ).first()
-
-    
-    # Record the download in your database
-    DSDownloadRecordService().create(
-    user_id=current_user.id if current_user.is_authenticated else None,
-    dataset_id=dataset_id,
-    download_date=datetime.now(timezone.utc),
-    download_cookie=user_cookie,
-    )
+    # Duplicated downloads of the same cookie are skipped when the buffered records are written
+    DSDownloadRecordService().record_download(dataset_id, user_cookie)
 
     return resp
 
 
+@dataset_bp.route("/dataset/<int:dataset_id>/manifest.json", methods=["GET"])
+def dataset_manifest(dataset_id):
+    dataset = dataset_service.get_or_404(dataset_id)
+    manifest = dataset_service.get_manifest(dataset)
+
+    resp = jsonify(manifest)
+    resp.set_etag(manifest["etag"])
+    resp.cache_control.no_cache = True  # Clients must revalidate, a 304 is cheap
+    return resp.make_conditional(request)
+
+
 @dataset_bp.route("/doi/<path:doi>/", methods=["GET"])
 def subdomain_index(doi):
 
@@ -6,8 +6,10 @@ from dotenv import load_dotenv
 
 from app.modules.auth.models import User
 from app.modules.dataset.models import Author, DataSet, DSMetaData, DSMetrics, PublicationType
+from app.modules.dataset.services import DSAggregateService
 from app.modules.featuremodel.models import FeatureModel, FMMetaData
 from app.modules.hubfile.models import Hubfile
+from core.configuration.configuration import dataset_uploads_path, working_dir_path
 from core.seeders.BaseSeeder import BaseSeeder
 
 
@@ -101,15 +103,14 @@ class DataSetSeeder(BaseSeeder):
 
         # Create files, associate them with FeatureModels and copy files
         load_dotenv()
-        working_dir = os.getenv("WORKING_DIR", "")
-        src_folder = os.path.join(working_dir, "app", "modules", "dataset", "comp_examples")
+        src_folder = working_dir_path("app", "modules", "dataset", "comp_examples")
         for i in range(12):
             file_name = f"file{i+1}.comp"
             feature_model = seeded_feature_models[i]
             dataset = next(ds for ds in seeded_datasets if ds.id == feature_model.data_set_id)
             user_id = dataset.user_id
 
-            dest_folder = os.path.join(working_dir, "uploads", f"user_{user_id}", f"dataset_{dataset.id}")
+            dest_folder = dataset_uploads_path(user_id, dataset.id)
             os.makedirs(dest_folder, exist_ok=True)
             shutil.copy(os.path.join(src_folder, file_name), dest_folder)
 
@@ -122,3 +123,6 @@ class DataSetSeeder(BaseSeeder):
                 feature_model_id=feature_model.id,
             )
             self.seed([comp_file])
+
+        # Files were inserted directly, so the per-dataset counters are computed once at the end
+        DSAggregateService().rebuild([dataset.id for dataset in seeded_datasets])
@@ -3,26 +3,42 @@ import logging
 import os
 import shutil
 import uuid
+from datetime import datetime, timezone
 from typing import Optional
 
-from flask import request
+from flask import current_app, request, url_for
+from sqlalchemy import event, inspect
 
+from app import db, record_buffer
 from app.modules.auth.services import AuthenticationService
-from app.modules.dataset.models import DataSet, DSMetaData, DSViewRecord
+from app.modules.componentes_check.services import ComponentPropertyService
+from app.modules.dataset.archives import (
+    ARCHIVE_FORMATS,
+    ArchiveCache,
+    iter_archive_entries,
+    stream_tar_zst,
+    stream_zip,
+)
+from app.modules.dataset.models import DataSet, DSDownloadRecord, DSMetaData, DSViewRecord, Tag
 from app.modules.dataset.repositories import (
     AuthorRepository,
     DataSetRepository,
     DOIMappingRepository,
+    DSAggregateRepository,
     DSDownloadRecordRepository,
     DSMetaDataRepository,
     DSViewRecordRepository,
 )
+from app.modules.dataset.trending import DEFAULT_HALF_LIFE_HOURS, DOWNLOAD_WEIGHT, VIEW_WEIGHT, event_score, log_sum
+from app.modules.featuremodel.models import FMMetaData
 from app.modules.featuremodel.repositories import FeatureModelRepository, FMMetaDataRepository
 from app.modules.hubfile.repositories import (
     HubfileDownloadRecordRepository,
     HubfileRepository,
     HubfileViewRecordRepository,
 )
+from app.modules.stats.services import StatsService
+from core.configuration.configuration import dataset_uploads_path, working_dir_path
 from core.services.BaseService import BaseService
 
 logger = logging.getLogger(__name__)
@@ -47,14 +63,16 @@ class DataSetService(BaseService):
         self.hubfiledownloadrecord_repository = HubfileDownloadRecordRepository()
         self.hubfilerepository = HubfileRepository()
         self.dsviewrecord_repostory = DSViewRecordRepository()
+        self.dsaggregate_repository = DSAggregateRepository()
+        self.stats_service = StatsService()
         self.hubfileviewrecord_repository = HubfileViewRecordRepository()
+        self.component_property_service = ComponentPropertyService()
 
     def move_feature_models(self, dataset: DataSet):
         current_user = AuthenticationService().get_authenticated_user()
         source_dir = current_user.temp_folder()
 
-        working_dir = os.getenv("WORKING_DIR", "")
-        dest_dir = os.path.join(working_dir, "uploads", f"user_{current_user.id}", f"dataset_{dataset.id}")
+        dest_dir = dataset_uploads_path(current_user.id, dataset.id)
 
         os.makedirs(dest_dir, exist_ok=True)
 
@@ -62,6 +80,72 @@ class DataSetService(BaseService):
             comp_filename = feature_model.fm_meta_data.comp_filename
             shutil.move(os.path.join(source_dir, comp_filename), dest_dir)
 
+    def get_uploads_folder(self, dataset: DataSet) -> str:
+        return dataset_uploads_path(dataset.user_id, dataset.id)
+
+    def archive_stream(self, dataset: DataSet, archive_format: str = "zip"):
+        entries = iter_archive_entries(self.get_uploads_folder(dataset), f"dataset_{dataset.id}")
+        if archive_format == "tar.zst":
+            return stream_tar_zst(
+                entries,
+                level=current_app.config["ARCHIVE_ZSTD_LEVEL"],
+                threads=current_app.config["ARCHIVE_ZSTD_THREADS"],
+            )
+        return stream_zip(entries)
+
+    def get_files_digest(self, dataset: DataSet) -> str:
+        """Digest of the dataset files, it changes whenever a file is added, removed or modified."""
+        digest = hashlib.sha256(f"dataset_{dataset.id}".encode())
+        for name, checksum in sorted((file.name, file.checksum) for file in dataset.files()):
+            digest.update(f"\0{name}\0{checksum}".encode())
+        return digest.hexdigest()
+
+    def get_manifest(self, dataset: DataSet) -> dict:
+        """Lists the files of the dataset so that mirrors only fetch the ones whose checksum changed."""
+        return {
+            "dataset_id": dataset.id,
+            "title": dataset.ds_meta_data.title,
+            "etag": self.get_files_digest(dataset),
+            "files": [
+                {
+                    "id": file.id,
+                    "name": file.name,
+                    "size": file.size,
+                    "checksum": file.checksum,
+                    "url": url_for("hubfile.download_file", file_id=file.id, _external=True),
+                }
+                for file in sorted(dataset.files(), key=lambda file: file.name)
+            ],
+        }
+
+    def get_archive_cache(self) -> ArchiveCache:
+        directory = working_dir_path(current_app.config["ARCHIVE_CACHE_DIR"])
+        return ArchiveCache(directory, current_app.config["ARCHIVE_CACHE_MAX_BYTES"])
+
+    def get_archive_name(self, dataset: DataSet, digest: str, archive_format: str = "zip") -> str:
+        return f"dataset_{dataset.id}-{digest}.{ARCHIVE_FORMATS[archive_format]['extension']}"
+
+    def get_cached_archive(self, dataset: DataSet, digest: str, archive_format: str = "zip") -> Optional[str]:
+        return self.get_archive_cache().get(self.get_archive_name(dataset, digest, archive_format))
+
+    def build_archive(self, dataset: DataSet, digest: str, archive_format: str = "zip") -> str:
+        """Returns the path of the cached archive of the dataset, building it first if needed."""
+        cached_archive = self.get_cached_archive(dataset, digest, archive_format)
+        if cached_archive:
+            return cached_archive
+
+        for _ in self.cached_archive_stream(dataset, digest, archive_format):
+            pass
+        return self.get_archive_cache().path_for(self.get_archive_name(dataset, digest, archive_format))
+
+    def cached_archive_stream(self, dataset: DataSet, digest: str, archive_format: str = "zip"):
+        """Streams the archive of the dataset while storing it in the archive cache."""
+        return self.get_archive_cache().store(
+            self.get_archive_name(dataset, digest, archive_format),
+            self.archive_stream(dataset, archive_format),
+            replaces=f"dataset_{dataset.id}-*.{ARCHIVE_FORMATS[archive_format]['extension']}",
+        )
+
     def get_synchronized(self, current_user_id: int) -> DataSet:
         return self.repository.get_synchronized(current_user_id)
 
@@ -74,6 +158,9 @@ class DataSetService(BaseService):
     def latest_synchronized(self):
         return self.repository.latest_synchronized()
 
+    def trending_synchronized(self, limit: int = 5):
+        return self.repository.trending_synchronized(limit)
+
     def count_synchronized_datasets(self):
         return self.repository.count_synchronized_datasets()
 
@@ -87,10 +174,10 @@ class DataSetService(BaseService):
         return self.dsmetadata_repository.count()
 
     def total_dataset_downloads(self) -> int:
-        return self.dsdownloadrecord_repository.total_dataset_downloads()
+        return self.stats_service.totals("dataset")["downloads"]
 
     def total_dataset_views(self) -> int:
-        return self.dsviewrecord_repostory.total_dataset_views()
+        return self.stats_service.totals("dataset")["views"]
 
     def create_from_form(self, form, current_user) -> DataSet:
         main_author = {
@@ -106,6 +193,7 @@ class DataSetService(BaseService):
                 dsmetadata.authors.append(author)
 
             dataset = self.create(commit=False, user_id=current_user.id, ds_meta_data_id=dsmetadata.id)
+            total_size = 0
 
             for feature_model in form.feature_models:
                 comp_filename = feature_model.comp_filename.data
@@ -125,7 +213,17 @@ class DataSetService(BaseService):
                 file = self.hubfilerepository.create(
                     commit=False, name=comp_filename, checksum=checksum, size=size, feature_model_id=fm.id
                 )
+                self.component_property_service.extract(file, file_path)
                 fm.files.append(file)
+                total_size += size
+
+            self.dsaggregate_repository.create(
+                commit=False,
+                dataset_id=dataset.id,
+                files_count=len(form.feature_models),
+                total_size_bytes=total_size,
+                feature_model_count=len(form.feature_models),
+            )
             self.repository.session.commit()
         except Exception as exc:
             logger.info(f"Exception creating dataset from form...: {exc}")
@@ -146,10 +244,46 @@ class AuthorService(BaseService):
         super().__init__(AuthorRepository())
 
 
+class DSAggregateService(BaseService):
+    def __init__(self):
+        super().__init__(DSAggregateRepository())
+
+    def rebuild(self, dataset_ids=None) -> int:
+        rebuilt = self.repository.rebuild(dataset_ids, self.half_life_hours())
+        self.repository.session.commit()
+        return rebuilt
+
+    def on_download_records(self, rows):
+        self._on_records("download_count", "download_date", DOWNLOAD_WEIGHT, rows)
+
+    def on_view_records(self, rows):
+        self._on_records("view_count", "view_date", VIEW_WEIGHT, rows)
+
+    def half_life_hours(self) -> float:
+        return current_app.config.get("TRENDING_HALF_LIFE_HOURS", DEFAULT_HALF_LIFE_HOURS)
+
+    def _on_records(self, column, date_column, weight, rows):
+        half_life_hours = self.half_life_hours()
+        events = {}
+        for row in rows:
+            when = row.get(date_column) or datetime.now(timezone.utc)
+            events.setdefault(row["dataset_id"], []).append(event_score(when, weight, half_life_hours))
+
+        self.repository.increment(
+            column,
+            {dataset_id: len(scores) for dataset_id, scores in events.items()},
+            {dataset_id: log_sum(scores) for dataset_id, scores in events.items()},
+            half_life_hours,
+        )
+
+
 class DSDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(DSDownloadRecordRepository())
 
+    def record_download(self, dataset_id: int, user_cookie: str) -> None:
+        self.repository.record_download(dataset_id, user_cookie)
+
 
 class DSMetaDataService(BaseService):
     def __init__(self):
@@ -169,8 +303,8 @@ class DSViewRecordService(BaseService):
     def the_record_exists(self, dataset: DataSet, user_cookie: str):
         return self.repository.the_record_exists(dataset, user_cookie)
 
-    def create_new_record(self, dataset: DataSet, user_cookie: str) -> DSViewRecord:
-        return self.repository.create_new_record(dataset, user_cookie)
+    def create_new_record(self, dataset: DataSet, user_cookie: str) -> None:
+        self.repository.create_new_record(dataset, user_cookie)
 
     def create_cookie(self, dataset: DataSet) -> str:
 
@@ -178,10 +312,8 @@ class DSViewRecordService(BaseService):
         if not user_cookie:
             user_cookie = str(uuid.uuid4())
 
-        existing_record = self.the_record_exists(dataset=dataset, user_cookie=user_cookie)
-
-        if not existing_record:
-            self.create_new_record(dataset=dataset, user_cookie=user_cookie)
+        # The record buffer skips the view if this cookie already viewed the dataset
+        self.create_new_record(dataset=dataset, user_cookie=user_cookie)
 
         return user_cookie
 
@@ -212,3 +344,29 @@ class SizeService:
             return f"{round(size / (1024 ** 2), 2)} MB"
         else:
             return f"{round(size / (1024 ** 3), 2)} GB"
+
+
+# Buffered records are counted in the aggregates in the same transaction that inserts them
+record_buffer.subscribe(DSDownloadRecord, lambda rows: DSAggregateService().on_download_records(rows))
+record_buffer.subscribe(DSViewRecord, lambda rows: DSAggregateService().on_view_records(rows))
+
+
+def _sync_tags(session, flush_context, instances):
+    targets = [
+        instance
+        for instance in session.new | session.dirty
+        if isinstance(instance, (DSMetaData, FMMetaData))
+        and (instance in session.new or inspect(instance).attrs.tags.history.has_changes())
+    ]
+    if not targets:
+        return
+
+    names = {name for target in targets for name in Tag.names(target.tags)}
+    with session.no_autoflush:
+        tags = {tag.name: tag for tag in session.query(Tag).filter(Tag.name.in_(names))} if names else {}
+    for target in targets:
+        target.tag_list = [tags.setdefault(name, Tag(name=name)) for name in Tag.names(target.tags)]
+
+
+# The tag rows of dataset and feature model metadata follow their tags columns, whoever writes them
+event.listen(db.session, "before_flush", _sync_tags)
@@ -0,0 +1,396 @@
+import io
+import math
+import os
+import pathlib
+import tarfile
+import zipfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import zstandard
+
+from app import db, record_buffer
+from app.modules.auth.models import User
+from app.modules.dataset.archives import ArchiveCache, iter_archive_entries, stream_tar_zst, stream_zip
+from app.modules.dataset.models import (
+    DataSet,
+    DSAggregate,
+    DSDownloadRecord,
+    DSMetaData,
+    DSViewRecord,
+    PublicationType,
+)
+from app.modules.dataset.services import DataSetService, DSAggregateService
+from app.modules.dataset.trending import current_score, event_score, log_add, log_sum
+from app.modules.explore.repositories import ExploreRepository
+from app.modules.featuremodel.models import FeatureModel, FMMetaData
+from app.modules.hubfile.models import Hubfile
+
+COMP_CONTENT = """name: IntelCorei512400
+version: 1.1
+author: CPUWarehouse
+
+properties:
+    id: cpu_01
+    type: processor
+    model: Intel i5-12400
+    description: Mid-range 12th Gen CPU.
+"""
+
+
+@pytest.fixture(scope="module")
+def test_client(test_client):
+    """
+    Extends the test_client fixture to add additional specific data for module testing.
+    """
+    with test_client.application.app_context():
+        user = User.query.filter_by(email="test@example.com").first()
+
+        ds_meta_data = DSMetaData(
+            title="Streaming dataset",
+            description="Dataset used by the dataset module tests",
+            publication_type=PublicationType.DATA_MANAGEMENT_PLAN,
+            dataset_doi="10.1234/streaming",
+            tags="tag1, tag2",
+        )
+        db.session.add(ds_meta_data)
+        db.session.commit()
+
+        dataset = DataSet(user_id=user.id, ds_meta_data_id=ds_meta_data.id)
+        db.session.add(dataset)
+        db.session.commit()
+
+        for name in ("file1.comp", "file2.comp"):
+            fm_meta_data = FMMetaData(
+                comp_filename=name,
+                title=name,
+                description=f"Description for {name}",
+                publication_type=PublicationType.SOFTWARE_DOCUMENTATION,
+            )
+            db.session.add(fm_meta_data)
+            db.session.commit()
+
+            feature_model = FeatureModel(data_set_id=dataset.id, fm_meta_data_id=fm_meta_data.id)
+            db.session.add(feature_model)
+            db.session.commit()
+
+            hubfile = Hubfile(
+                name=name, checksum=f"checksum_{name}", size=len(COMP_CONTENT), feature_model_id=feature_model.id
+            )
+            db.session.add(hubfile)
+            db.session.commit()
+
+    yield test_client
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    """Writes the files of the test dataset to a temporary working directory."""
+    monkeypatch.setenv("WORKING_DIR", str(tmp_path))
+
+    dataset = DataSet.query.first()
+    folder = tmp_path / "uploads" / f"user_{dataset.user_id}" / f"dataset_{dataset.id}"
+    folder.mkdir(parents=True)
+    for hubfile in dataset.files():
+        (folder / hubfile.name).write_text(COMP_CONTENT)
+
+    return dataset
+
+
+def test_stream_zip_round_trip(tmp_path):
+    small = tmp_path / "small.comp"
+    small.write_text(COMP_CONTENT)
+    large = tmp_path / "large.bin"
+    large.write_bytes(os.urandom(300 * 1024))
+
+    chunks = list(stream_zip(iter_archive_entries(str(tmp_path), "dataset_1")))
+    assert len(chunks) > 2, "The archive should be produced in several chunks"
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zipf:
+        assert sorted(zipf.namelist()) == ["dataset_1/large.bin", "dataset_1/small.comp"]
+        assert zipf.read("dataset_1/small.comp").decode() == COMP_CONTENT
+        assert zipf.read("dataset_1/large.bin") == large.read_bytes()
+        assert zipf.testzip() is None
+
+
+def test_download_dataset_streams_zip(test_client, uploads):
+    response = test_client.get(f"/dataset/download/{uploads.id}")
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+    assert response.is_streamed
+    assert "download_cookie" in response.headers.get("Set-Cookie", "")
+
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as zipf:
+        assert sorted(zipf.namelist()) == [f"dataset_{uploads.id}/file1.comp", f"dataset_{uploads.id}/file2.comp"]
+
+
+def test_download_dataset_is_served_from_cache_with_ranges(test_client, uploads):
+    first = test_client.get(f"/dataset/download/{uploads.id}")
+    archive = first.get_data()
+    etag, _ = first.get_etag()
+    assert etag, "The streamed archive should carry the ETag of its cache entry"
+
+    response = test_client.get(f"/dataset/download/{uploads.id}")
+    assert response.status_code == 200
+    assert response.headers.get("Accept-Ranges") == "bytes", "The second download should come from the archive cache"
+    assert response.get_data() == archive
+
+    response = test_client.get(f"/dataset/download/{uploads.id}", headers={"Range": "bytes=10-"})
+    assert response.status_code == 206
+    assert response.get_data() == archive[10:]
+
+    response = test_client.get(
+        f"/dataset/download/{uploads.id}", headers={"Range": "bytes=0-9", "If-Range": f'"{etag}"'}
+    )
+    assert response.status_code == 206
+    assert response.get_data() == archive[:10]
+
+    response = test_client.get(f"/dataset/download/{uploads.id}", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.get_data() == archive
+
+
+def test_archive_cache_evicts_least_recently_used(tmp_path):
+    cache = ArchiveCache(str(tmp_path), max_bytes=250)
+
+    for name in ("a.zip", "b.zip"):
+        list(cache.store(name, [b"x" * 100]))
+        os.utime(cache.path_for(name), (1000 if name == "a.zip" else 2000, 0))
+
+    assert cache.get("a.zip"), "Reading an entry should mark it as recently used"
+    list(cache.store("c.zip", [b"x" * 100]))
+
+    assert cache.get("b.zip") is None
+    assert cache.get("a.zip") and cache.get("c.zip")
+
+
+def test_archive_cache_replaces_previous_content(tmp_path):
+    cache = ArchiveCache(str(tmp_path), max_bytes=1024)
+
+    list(cache.store("dataset_1-old.zip", [b"old"]))
+    list(cache.store("dataset_10-old.zip", [b"old"]))
+    list(cache.store("dataset_1-new.zip", [b"new"], replaces="dataset_1-*.zip"))
+
+    assert cache.get("dataset_1-old.zip") is None
+    assert cache.get("dataset_10-old.zip")
+    assert sorted(os.listdir(tmp_path)) == ["dataset_1-new.zip", "dataset_10-old.zip"]
+
+
+def test_download_dataset_is_handed_over_to_nginx(test_client, uploads, monkeypatch):
+    monkeypatch.setitem(test_client.application.config, "FILE_DELIVERY", "nginx")
+
+    response = test_client.get(f"/dataset/download/{uploads.id}")
+
+    assert response.status_code == 200
+    assert response.get_data() == b"", "The archive must be sent by nginx, not by the worker"
+    location = response.headers["X-Accel-Redirect"]
+    assert location.startswith(f"/_protected/archive_cache/dataset_{uploads.id}-")
+    assert "attachment" in response.headers["Content-Disposition"]
+
+    archive_name = location.rsplit("/", 1)[1]
+    archive_path = pathlib.Path(os.getenv("WORKING_DIR"), "archive_cache", archive_name)
+    assert archive_path.is_file(), "The archive should be built before handing it over"
+
+
+def test_stream_tar_zst_round_trip(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "file1.comp").write_text(COMP_CONTENT)
+    (source / "large.bin").write_bytes(os.urandom(200 * 1024 + 7))
+
+    compressed = b"".join(stream_tar_zst(iter_archive_entries(str(source), "dataset_1"), level=3, threads=2))
+    data = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(compressed)).read()
+
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        assert sorted(tar.getnames()) == ["dataset_1/file1.comp", "dataset_1/large.bin"]
+        assert tar.extractfile("dataset_1/file1.comp").read().decode() == COMP_CONTENT
+        assert tar.extractfile("dataset_1/large.bin").read() == (source / "large.bin").read_bytes()
+    assert len(data) % tarfile.RECORDSIZE == 0
+
+
+def test_download_dataset_as_tar_zst(test_client, uploads):
+    response = test_client.get(f"/dataset/download/{uploads.id}?format=tar.zst")
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/zstd"
+    assert f"dataset_{uploads.id}.tar.zst" in response.headers["Content-Disposition"]
+
+    data = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(response.get_data())).read()
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        assert sorted(tar.getnames()) == [f"dataset_{uploads.id}/file1.comp", f"dataset_{uploads.id}/file2.comp"]
+
+    zip_response = test_client.get(f"/dataset/download/{uploads.id}")
+    assert zip_response.get_etag() != response.get_etag()
+
+
+def test_download_dataset_unknown_format(test_client, uploads):
+    response = test_client.get(f"/dataset/download/{uploads.id}?format=rar")
+    assert response.status_code == 400
+
+
+def test_dataset_manifest(test_client):
+    dataset = DataSet.query.first()
+
+    response = test_client.get(f"/dataset/{dataset.id}/manifest.json")
+    assert response.status_code == 200
+    manifest = response.get_json()
+    etag, _ = response.get_etag()
+    assert etag == manifest["etag"]
+    assert [file["name"] for file in manifest["files"]] == ["file1.comp", "file2.comp"]
+    assert manifest["files"][0]["checksum"] == "checksum_file1.comp"
+    assert manifest["files"][0]["url"].endswith(f"/file/download/{manifest['files'][0]['id']}")
+
+    response = test_client.get(f"/dataset/{dataset.id}/manifest.json", headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 304
+
+    hubfile = dataset.files()[0]
+    hubfile.checksum = "changed"
+    db.session.commit()
+
+    response = test_client.get(f"/dataset/{dataset.id}/manifest.json", headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 200, "Changing a checksum must change the ETag of the manifest"
+
+    hubfile.checksum = "checksum_file1.comp"
+    db.session.commit()
+
+
+def test_download_records_are_deduplicated_by_cookie(test_client, uploads):
+    DSDownloadRecord.query.delete()
+    db.session.commit()
+    test_client.delete_cookie("download_cookie")
+
+    for _ in range(3):
+        test_client.get(f"/dataset/download/{uploads.id}")
+
+    assert DSDownloadRecord.query.filter_by(dataset_id=uploads.id).count() == 1
+
+    test_client.delete_cookie("download_cookie")
+    test_client.get(f"/dataset/download/{uploads.id}")
+    assert DSDownloadRecord.query.filter_by(dataset_id=uploads.id).count() == 2
+
+
+def test_buffered_view_records_are_written_in_one_batch(test_client, monkeypatch):
+    dataset = DataSet.query.first()
+    state = test_client.application.extensions["record_buffer"]
+    monkeypatch.setattr(state, "asynchronous", True)
+    monkeypatch.setattr(state, "_ensure_flusher", lambda: None)
+
+    for cookie in ("cookie-a", "cookie-b", "cookie-a"):
+        record_buffer.push(
+            DSViewRecord, ("user_id", "dataset_id", "view_cookie"), dataset_id=dataset.id, view_cookie=cookie
+        )
+    assert DSViewRecord.query.filter(DSViewRecord.view_cookie.like("cookie-%")).count() == 0
+
+    record_buffer.flush()
+    assert DSViewRecord.query.filter(DSViewRecord.view_cookie.like("cookie-%")).count() == 2
+
+    record_buffer.push(
+        DSViewRecord, ("user_id", "dataset_id", "view_cookie"), dataset_id=dataset.id, view_cookie="cookie-b"
+    )
+    record_buffer.flush()
+    assert DSViewRecord.query.filter(DSViewRecord.view_cookie.like("cookie-%")).count() == 2
+
+
+def test_buffered_records_do_not_commit_the_callers_transaction(test_client):
+    dataset = DataSet.query.first()
+    title = dataset.ds_meta_data.title
+    dataset.ds_meta_data.title = "Never committed"
+
+    record_buffer.push(
+        DSViewRecord, ("user_id", "dataset_id", "view_cookie"), dataset_id=dataset.id, view_cookie="own-session"
+    )
+    db.session.rollback()
+
+    assert db.session.get(DataSet, dataset.id).ds_meta_data.title == title
+    assert DSViewRecord.query.filter_by(view_cookie="own-session").count() == 1
+
+
+def test_aggregates_are_rebuilt_and_kept_up_to_date(test_client, uploads):
+    assert DSAggregateService().rebuild([uploads.id]) == 1
+    aggregate = db.session.get(DSAggregate, uploads.id)
+    downloads = DSDownloadRecord.query.filter_by(dataset_id=uploads.id).count()
+
+    assert aggregate.files_count == 2
+    assert aggregate.feature_model_count == 2
+    assert aggregate.total_size_bytes == 2 * len(COMP_CONTENT)
+    assert aggregate.download_count == downloads
+
+    test_client.delete_cookie("download_cookie")
+    test_client.get(f"/dataset/download/{uploads.id}")
+
+    # The counters were written by the record buffer, in a session of its own
+    db.session.expire_all()
+    aggregate = db.session.get(DSAggregate, uploads.id)
+    assert aggregate.download_count == downloads + 1
+    assert uploads.get_download_count() == downloads + 1
+    assert uploads.to_dict()["files_count"] == 2
+
+
+def test_aggregate_row_is_built_for_the_first_record(test_client):
+    dataset = DataSet.query.first()
+    DSAggregate.query.filter_by(dataset_id=dataset.id).delete()
+    db.session.commit()
+
+    record_buffer.push(
+        DSViewRecord, ("user_id", "dataset_id", "view_cookie"), dataset_id=dataset.id, view_cookie="first-view"
+    )
+
+    aggregate = db.session.get(DSAggregate, dataset.id)
+    assert aggregate.view_count == DSViewRecord.query.filter_by(dataset_id=dataset.id).count()
+    assert aggregate.files_count == 2
+
+
+def test_trending_scores_decay_by_half_life():
+    now = datetime(2026, 5, 1, 12)
+    fresh = event_score(now, 1.0, half_life_hours=24)
+    older = event_score(now - timedelta(hours=24), 2.0, half_life_hours=24)
+
+    assert math.isclose(fresh, older), "Two events one half-life old weigh as much as a new one"
+    assert math.isclose(current_score(log_add(fresh, older), 24, now=now), 2.0)
+    assert math.isclose(current_score(fresh, 24, now=now + timedelta(hours=48)), 0.25)
+    assert log_add(None, fresh) == fresh and log_sum([]) is None
+    assert current_score(None, 24) == 0.0
+
+
+def test_trending_datasets_follow_recent_events(test_client):
+    user = User.query.filter_by(email="test@example.com").first()
+    steady, rising = [], []
+    for name, datasets in (("steady", steady), ("rising", rising)):
+        ds_meta_data = DSMetaData(
+            title=f"{name.title()} dataset",
+            description=f"Dataset with {name} downloads",
+            publication_type=PublicationType.DATA_MANAGEMENT_PLAN,
+            dataset_doi=f"10.1234/{name}",
+            tags=name,
+        )
+        db.session.add(ds_meta_data)
+        db.session.commit()
+        datasets.append(DataSet(user_id=user.id, ds_meta_data_id=ds_meta_data.id))
+        db.session.add(datasets[0])
+        db.session.commit()
+    steady, rising = steady[0], rising[0]
+
+    download_key = ("user_id", "dataset_id", "download_cookie")
+    old = datetime.now(timezone.utc) - timedelta(days=20)
+    for index in range(20):
+        record_buffer.push(
+            DSDownloadRecord, download_key, dataset_id=steady.id, download_date=old, download_cookie=f"old-{index}"
+        )
+    for index in range(3):
+        record_buffer.push(DSDownloadRecord, download_key, dataset_id=rising.id, download_cookie=f"new-{index}")
+
+    trending = [dataset.id for dataset in DataSetService().trending_synchronized(limit=10)]
+    assert trending.index(rising.id) < trending.index(steady.id), "Recent downloads outweigh older ones"
+
+    scores = {row.dataset_id: row.trending_score for row in DSAggregate.query}
+    DSAggregateService().rebuild([steady.id, rising.id])
+    rebuilt = {row.dataset_id: row.trending_score for row in DSAggregate.query}
+    assert rebuilt[rising.id] > rebuilt[steady.id]
+    for dataset_id in (steady.id, rising.id):
+        # Rebuilt scores place the events of a day at noon, so they can be up to half a day off
+        assert abs(rebuilt[dataset_id] - scores[dataset_id]) <= math.log(2) * 12 / 72
+
+    explored = [scores.get(dataset.id) or -math.inf for dataset in ExploreRepository().filter(sorting="trending")]
+    assert explored == sorted(explored, reverse=True)
+    assert b"Trending" in test_client.get("/").data
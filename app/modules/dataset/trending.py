@@ -0,0 +1,52 @@
+import math
+from datetime import date, datetime, time, timezone
+from functools import reduce
+
+# Scores are stored relative to a fixed epoch instead of being decayed in place: every event adds
+# weight * 2^(hours since epoch / half-life), and dividing all scores by the same 2^(hours until now / half-life)
+# does not change their order. The sums are kept as logarithms, which grow linearly and never overflow.
+TRENDING_EPOCH = datetime(2024, 1, 1)
+
+DEFAULT_HALF_LIFE_HOURS = 72.0
+DOWNLOAD_WEIGHT = 3.0
+VIEW_WEIGHT = 1.0
+# Events older than this many half-lives weigh less than a millionth of a new one
+TRENDING_WINDOW_HALF_LIVES = 20
+
+
+def _hours_since_epoch(when: datetime) -> float:
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    return (when - TRENDING_EPOCH).total_seconds() / 3600
+
+
+def log_add(a: float, b: float) -> float:
+    """log(e^a + e^b) without leaving log space; None stands for a score of zero."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def log_sum(scores) -> float:
+    return reduce(log_add, scores, None)
+
+
+def event_score(when: datetime, weight: float, half_life_hours: float) -> float:
+    """Log score of weight events that happened at a given time."""
+    return math.log(weight) + math.log(2) * _hours_since_epoch(when) / half_life_hours
+
+
+def day_score(day: date, weight: float, half_life_hours: float) -> float:
+    """Log score of weight events of a daily rollup, placed at noon as their exact times are not known."""
+    return event_score(datetime.combine(day, time(12)), weight, half_life_hours)
+
+
+def current_score(score: float, half_life_hours: float, now: datetime = None) -> float:
+    """Decayed score at a given time (now by default): the weighted events of the last half-life, roughly."""
+    if score is None:
+        return 0.0
+    now = now or datetime.now(timezone.utc)
+    return math.exp(score - math.log(2) * _hours_since_epoch(now) / half_life_hours)
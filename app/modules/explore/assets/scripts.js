@@ -13,132 +13,239 @@ function send_query() {
     const filters = document.querySelectorAll('#filters input, #filters select, #filters [type="radio"]');
 
     filters.forEach(filter => {
-        filter.addEventListener('input', () => {
-            const csrfToken = document.getElementById('csrf_token').value;
-
-            const searchCriteria = {
-                csrf_token: csrfToken,
-                query: document.querySelector('#query').value,
-                publication_type: document.querySelector('#publication_type').value,
-                sorting: document.querySelector('[name="sorting"]:checked').value,
-            };
-
-            console.log(document.querySelector('#publication_type').value);
-
-            fetch('/explore', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(searchCriteria),
-            })
-                .then(response => response.json())
-                .then(data => {
-
-                    console.log(data);
-                    document.getElementById('results').innerHTML = '';
-
-                    // results counter
-                    const resultCount = data.length;
-                    const resultText = resultCount === 1 ? 'dataset' : 'datasets';
-                    document.getElementById('results_number').textContent = `${resultCount} ${resultText} found`;
-
-                    if (resultCount === 0) {
-                        console.log("show not found icon");
-                        document.getElementById("results_not_found").style.display = "block";
-                    } else {
-                        document.getElementById("results_not_found").style.display = "none";
-                    }
-
-
-                    data.forEach(dataset => {
-                        let card = document.createElement('div');
-                        card.className = 'col-12';
-                        card.innerHTML = `
-                            <div class="card">
-                                <div class="card-body">
-                                    <div class="d-flex align-items-center justify-content-between">
-                                        <h3><a href="${dataset.url}">${dataset.title}</a></h3>
-                                        <div>
-                                            <span class="badge bg-primary" style="cursor: pointer;" onclick="set_publication_type_as_query('${dataset.publication_type}')">${dataset.publication_type}</span>
-                                        </div>
-                                    </div>
-                                    <p class="text-secondary">${formatDate(dataset.created_at)}</p>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Description
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            <p class="card-text">${dataset.description}</p>
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Authors
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            ${dataset.authors.map(author => `
-                                                <p class="p-0 m-0">${author.name}${author.affiliation ? ` (${author.affiliation})` : ''}${author.orcid ? ` (${author.orcid})` : ''}</p>
-                                            `).join('')}
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Tags
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            ${dataset.tags.map(tag => `<span class="badge bg-primary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag}</span>`).join('')}
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row">
-
-                                        <div class="col-md-4 col-12">
-
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            <a href="${dataset.url}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
-                                                View dataset
-                                            </a>
-                                            <a href="/dataset/download/${dataset.id}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
-                                                Download (${dataset.total_size_in_human_format})
-                                            </a>
-                                            <a class="btn btn-outline-primary btn-sm"
-                                                style="border-radius: 5px;">
-                                                <i data-feather="download" class="center-button-icon"></i>
-                                                ${dataset.download_count} Downloads 
-                                            </a>
-                                        </div>
-
-
-                                    </div>
-
-                                </div>
-                            </div>
-                        `;
-
-                        document.getElementById('results').appendChild(card);
-                    });
+        // Wait for a pause in typing instead of searching on every keystroke
+        filter.addEventListener('input', debounce(() => search(), 250));
+    });
+
+    document.querySelector('#query').addEventListener('input', debounce(suggest, 150));
+    document.getElementById('load_more').addEventListener('click', () => search(next_cursor));
+}
+
+// Results sorted by date are fetched a page at a time; next_cursor asks for the page after the last one shown
+let next_cursor = null;
+
+function search(cursor = null) {
+    const csrfToken = document.getElementById('csrf_token').value;
+
+    const searchCriteria = {
+        csrf_token: csrfToken,
+        query: document.querySelector('#query').value,
+        publication_type: document.querySelector('#publication_type').value,
+        sorting: document.querySelector('[name="sorting"]:checked').value,
+        mode: document.querySelector('#fuzzy').checked ? 'fuzzy' : 'text',
+    };
+
+    const paged = ['newest', 'oldest'].includes(searchCriteria.sorting);
+    let request;
+    if (paged) {
+        searchCriteria.cursor = cursor;
+        searchCriteria.tags = selected_tags;
+        request = fetch('/explore/page', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(searchCriteria),
+        });
+    } else {
+        // Other sortings come whole from a GET that the browser and nginx can cache
+        delete searchCriteria.csrf_token;
+        const params = new URLSearchParams(searchCriteria);
+        selected_tags.forEach(tag => params.append('tags', tag));
+        request = fetch(`/explore/results?${params}`);
+        fetch(`/explore/facets?${params}`)
+            .then(response => response.json())
+            .then(render_facets);
+    }
+
+    request
+        .then(response => response.json())
+        .then(data => {
+            const datasets = paged ? data.results : data;
+            if (paged && !cursor) {
+                render_facets(data.facets);
+            }
+            next_cursor = paged ? data.next_cursor : null;
+            document.getElementById('load_more').style.display = next_cursor ? 'inline-block' : 'none';
+
+            if (!cursor) {
+                document.getElementById('results').innerHTML = '';
+            }
+
+            // results counter
+            const resultCount = paged ? data.total : data.length;
+            const resultText = resultCount === 1 ? 'dataset' : 'datasets';
+            document.getElementById('results_number').textContent = `${resultCount} ${resultText} found`;
+
+            if (resultCount === 0) {
+                console.log("show not found icon");
+                document.getElementById("results_not_found").style.display = "block";
+            } else {
+                document.getElementById("results_not_found").style.display = "none";
+            }
+
+            datasets.forEach(dataset => {
+                document.getElementById('results').appendChild(render_dataset(dataset));
+            });
+        });
+}
+
+// Tags picked in the facets; results have at least one of them
+let selected_tags = [];
+
+function render_facets(facets) {
+    const titles = {tag: 'Tags', publication_type: 'Publication types', component_type: 'Component types'};
+    const container = document.getElementById('facets');
+    container.innerHTML = '';
+
+    Object.entries(titles).forEach(([facet, title]) => {
+        if (!facets[facet].length) {
+            return;
+        }
+        const section = document.createElement('div');
+        section.className = 'mb-2';
+        section.innerHTML = `<span class="text-secondary">${title}</span><div></div>`;
+        facets[facet].forEach(({value, count}) => {
+            const badge = document.createElement('span');
+            const selected = facet === 'tag' && selected_tags.includes(value);
+            badge.className = `badge ${selected ? 'bg-primary' : 'bg-secondary'} me-1`;
+            badge.textContent = `${value} (${count})`;
+            if (facet === 'tag') {
+                badge.style.cursor = 'pointer';
+                badge.addEventListener('click', () => toggle_tag(value));
+            } else if (facet === 'publication_type') {
+                badge.style.cursor = 'pointer';
+                badge.addEventListener('click', () => {
+                    const publicationTypeSelect = document.getElementById('publication_type');
+                    publicationTypeSelect.value = value;
+                    publicationTypeSelect.dispatchEvent(new Event('input', {bubbles: true}));
                 });
+            }
+            section.lastElementChild.appendChild(badge);
         });
+        container.appendChild(section);
     });
 }
 
+function toggle_tag(tag) {
+    selected_tags = selected_tags.includes(tag) ? selected_tags.filter(selected => selected !== tag) : [...selected_tags, tag];
+    search();
+}
+
+function render_dataset(dataset) {
+        let card = document.createElement('div');
+        card.className = 'col-12';
+        card.innerHTML = `
+            <div class="card">
+                <div class="card-body">
+                    <div class="d-flex align-items-center justify-content-between">
+                        <h3><a href="${dataset.url}">${dataset.title}</a></h3>
+                        <div>
+                            <span class="badge bg-primary" style="cursor: pointer;" onclick="set_publication_type_as_query('${dataset.publication_type}')">${dataset.publication_type}</span>
+                        </div>
+                    </div>
+                    <p class="text-secondary">${formatDate(dataset.created_at)}</p>
+
+                    <div class="row mb-2">
+
+                        <div class="col-md-4 col-12">
+                            <span class=" text-secondary">
+                                Description
+                            </span>
+                        </div>
+                        <div class="col-md-8 col-12">
+                            <p class="card-text">${dataset.description}</p>
+                        </div>
+
+                    </div>
+
+                    <div class="row mb-2">
+
+                        <div class="col-md-4 col-12">
+                            <span class=" text-secondary">
+                                Authors
+                            </span>
+                        </div>
+                        <div class="col-md-8 col-12">
+                            ${dataset.authors.map(author => `
+                                <p class="p-0 m-0">${author.name}${author.affiliation ? ` (${author.affiliation})` : ''}${author.orcid ? ` (${author.orcid})` : ''}</p>
+                            `).join('')}
+                        </div>
+
+                    </div>
+
+                    <div class="row mb-2">
+
+                        <div class="col-md-4 col-12">
+                            <span class=" text-secondary">
+                                Tags
+                            </span>
+                        </div>
+                        <div class="col-md-8 col-12">
+                            ${dataset.tags.map(tag => `<span class="badge bg-primary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag}</span>`).join('')}
+                        </div>
+
+                    </div>
+
+                    <div class="row">
+
+                        <div class="col-md-4 col-12">
+
+                        </div>
+                        <div class="col-md-8 col-12">
+                            <a href="${dataset.url}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
+                                View dataset
+                            </a>
+                            <a href="/dataset/download/${dataset.id}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
+                                Download (${dataset.total_size_in_human_format})
+                            </a>
+                            <a class="btn btn-outline-primary btn-sm"
+                                style="border-radius: 5px;">
+                                <i data-feather="download" class="center-button-icon"></i>
+                                ${dataset.download_count} Downloads 
+                            </a>
+                        </div>
+
+
+                    </div>
+
+                </div>
+            </div>
+        `;
+
+    return card;
+}
+
+function debounce(callback, delay) {
+    let timer;
+    return (...args) => {
+        clearTimeout(timer);
+        timer = setTimeout(() => callback(...args), delay);
+    };
+}
+
+function suggest() {
+    const prefix = document.querySelector('#query').value;
+    const datalist = document.getElementById('query_suggestions');
+
+    if (prefix.trim() === '') {
+        datalist.innerHTML = '';
+        return;
+    }
+
+    fetch(`/explore/suggest?prefix=${encodeURIComponent(prefix)}`)
+        .then(response => response.json())
+        .then(data => {
+            datalist.innerHTML = '';
+            data.suggestions.forEach(suggestion => {
+                let option = document.createElement('option');
+                option.value = suggestion.value;
+                option.label = `${suggestion.kind} (${suggestion.count})`;
+                datalist.appendChild(option);
+            });
+        });
+}
+
 function formatDate(dateString) {
     const options = {day: 'numeric', month: 'long', year: 'numeric', hour: 'numeric', minute: 'numeric'};
     const date = new Date(dateString);
@@ -177,6 +284,9 @@ function clearFilters() {
     publicationTypeSelect.value = "any"; // replace "any" with whatever your default value is
     // publicationTypeSelect.dispatchEvent(new Event('input', {bubbles: true}));
 
+    // Forget the tags picked in the facets
+    selected_tags = [];
+
     // Reset the sorting option
     let sortingOptions = document.querySelectorAll('[name="sorting"]');
     sortingOptions.forEach(option => {
@@ -195,6 +305,13 @@ document.addEventListener('DOMContentLoaded', () => {
 
     let urlParams = new URLSearchParams(window.location.search);
     let queryParam = urlParams.get('query');
+    let sortingParam = urlParams.get('sorting');
+
+    if (sortingParam) {
+        document.querySelectorAll('[name="sorting"]').forEach(option => {
+            option.checked = option.value == sortingParam;
+        });
+    }
 
     if (queryParam && queryParam.trim() !== '') {
 
@@ -1,45 +1,134 @@
-import re
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import selectinload
 
-import unidecode
-from sqlalchemy import any_, or_
-
-from app.modules.dataset.models import Author, DataSet, DSMetaData, PublicationType
+from app.modules.componentes_check.models import ComponentProperty
+from app.modules.dataset.models import Author, DataSet, DSAggregate, DSMetaData, PublicationType, Tag
 from app.modules.featuremodel.models import FeatureModel, FMMetaData
+from app.modules.hubfile.models import Hubfile
 from core.repositories.BaseRepository import BaseRepository
 
+# Characters of the description returned with every result of a page
+DESCRIPTION_PREVIEW_LENGTH = 300
+
 
 class ExploreRepository(BaseRepository):
     def __init__(self):
         super().__init__(DataSet)
 
-    def filter(self, query="", sorting="newest", publication_type="any", tags=[], **kwargs):
-        # Normalize and remove unwanted characters
-        normalized_query = unidecode.unidecode(query).lower()
-        cleaned_query = re.sub(r'[,.":\'()\[\]^;!¡¿?]', "", normalized_query)
-
-        filters = []
-        for word in cleaned_query.split():
-            filters.append(DSMetaData.title.ilike(f"%{word}%"))
-            filters.append(DSMetaData.description.ilike(f"%{word}%"))
-            filters.append(Author.name.ilike(f"%{word}%"))
-            filters.append(Author.affiliation.ilike(f"%{word}%"))
-            filters.append(Author.orcid.ilike(f"%{word}%"))
-            filters.append(FMMetaData.comp_filename.ilike(f"%{word}%"))
-            filters.append(FMMetaData.title.ilike(f"%{word}%"))
-            filters.append(FMMetaData.description.ilike(f"%{word}%"))
-            filters.append(FMMetaData.publication_doi.ilike(f"%{word}%"))
-            filters.append(FMMetaData.tags.ilike(f"%{word}%"))
-            filters.append(DSMetaData.tags.ilike(f"%{word}%"))
+    def filter(self, dataset_ids=None, sorting="newest", publication_type="any", tags=[], **kwargs):
+        """Published datasets, optionally only the given ones (the matches of a search query)."""
+        if dataset_ids is not None and not dataset_ids:
+            return []
 
         datasets = (
             self.model.query.join(DataSet.ds_meta_data)
             .join(DSMetaData.authors)
             .join(DataSet.feature_models)
             .join(FeatureModel.fm_meta_data)
-            .filter(or_(*filters))
             .filter(DSMetaData.dataset_doi.isnot(None))  # Exclude datasets with empty dataset_doi
+            # to_dict() reads the counters from the joined aggregate; the rest is loaded in a few batched queries
+            .options(
+                selectinload(DataSet.ds_meta_data).selectinload(DSMetaData.authors),
+                selectinload(DataSet.feature_models).selectinload(FeatureModel.files),
+            )
+        )
+
+        datasets = self._criteria(datasets, dataset_ids, publication_type, tags)
+
+        # Order by created_at, or by the decayed downloads and views kept in the aggregates
+        if sorting == "oldest":
+            datasets = datasets.order_by(self.model.created_at.asc())
+        elif sorting == "trending":
+            datasets = datasets.outerjoin(DSAggregate, DSAggregate.dataset_id == DataSet.id).order_by(
+                DSAggregate.trending_score.is_(None), DSAggregate.trending_score.desc(), self.model.created_at.desc()
+            )
+        else:
+            datasets = datasets.order_by(self.model.created_at.desc())
+
+        return datasets.all()
+
+    def page(self, dataset_ids=None, sorting="newest", publication_type="any", tags=[], after=None, size=20):
+        """
+        One page of the published datasets, newest or oldest first, as the columns a result card shows.
+        Pages are delimited by the (created_at, id) of the last row of the previous one (after), so every
+        page costs the same however deep it is. Returns the rows, their authors per DSMetaData id, and
+        whether more rows follow.
+        """
+        if dataset_ids is not None and not dataset_ids:
+            return [], {}, False
+
+        descending = sorting != "oldest"
+        datasets = self._criteria(
+            self.session.query(
+                DataSet.id,
+                DataSet.created_at,
+                DSMetaData.id.label("ds_meta_data_id"),
+                DSMetaData.title,
+                func.substr(DSMetaData.description, 1, DESCRIPTION_PREVIEW_LENGTH).label("description"),
+                DSMetaData.publication_type,
+                DSMetaData.dataset_doi,
+                DSMetaData.tags,
+                DSAggregate.total_size_bytes,
+                DSAggregate.download_count,
+            )
+            .join(DataSet.ds_meta_data)
+            .outerjoin(DSAggregate, DSAggregate.dataset_id == DataSet.id)
+            .filter(DSMetaData.dataset_doi.isnot(None), *self._listed()),
+            dataset_ids,
+            publication_type,
+            tags,
         )
 
+        if after is not None:
+            created_at, dataset_id = after
+            if descending:
+                datasets = datasets.filter(
+                    or_(
+                        DataSet.created_at < created_at,
+                        and_(DataSet.created_at == created_at, DataSet.id < dataset_id),
+                    )
+                )
+            else:
+                datasets = datasets.filter(
+                    or_(
+                        DataSet.created_at > created_at,
+                        and_(DataSet.created_at == created_at, DataSet.id > dataset_id),
+                    )
+                )
+
+        order = (DataSet.created_at.desc(), DataSet.id.desc()) if descending else (DataSet.created_at, DataSet.id)
+        rows = datasets.order_by(*order).limit(size + 1).all()
+        rows, has_more = rows[:size], len(rows) > size
+
+        authors = {}
+        if rows:
+            for author in self.session.query(
+                Author.ds_meta_data_id, Author.name, Author.affiliation, Author.orcid
+            ).filter(Author.ds_meta_data_id.in_([row.ds_meta_data_id for row in rows])):
+                authors.setdefault(author.ds_meta_data_id, []).append(author)
+        return rows, authors, has_more
+
+    def count_matching(self, dataset_ids=None, publication_type="any", tags=[]) -> int:
+        """Number of published datasets matching the criteria of page()."""
+        if dataset_ids is not None and not dataset_ids:
+            return 0
+        return self._criteria(
+            self.session.query(func.count(DataSet.id))
+            .join(DataSet.ds_meta_data)
+            .filter(DSMetaData.dataset_doi.isnot(None), *self._listed()),
+            dataset_ids,
+            publication_type,
+            tags,
+        ).scalar()
+
+    def _listed(self):
+        # The datasets filter() lists: those with authors and feature models with metadata
+        return (DSMetaData.authors.any(), DataSet.feature_models.any(FeatureModel.fm_meta_data.has()))
+
+    def _criteria(self, datasets, dataset_ids, publication_type, tags):
+        if dataset_ids is not None:
+            datasets = datasets.filter(DataSet.id.in_(list(dataset_ids)))
+
         if publication_type != "any":
             matching_type = None
             for member in PublicationType:
@@ -51,12 +140,172 @@ class ExploreRepository(BaseRepository):
                 datasets = datasets.filter(DSMetaData.publication_type == matching_type.name)
 
         if tags:
-            datasets = datasets.filter(DSMetaData.tags.ilike(any_(f"%{tag}%" for tag in tags)))
+            datasets = datasets.filter(DSMetaData.tag_list.any(Tag.name.in_(Tag.names(",".join(tags)))))
 
-        # Order by created_at
-        if sorting == "oldest":
-            datasets = datasets.order_by(self.model.created_at.asc())
-        else:
-            datasets = datasets.order_by(self.model.created_at.desc())
+        return datasets
 
-        return datasets.all()
+    def search_documents(self, dataset_ids=None) -> dict:
+        """
+        Searchable text of the published datasets ({dataset_id: text}), all of them by default: titles,
+        descriptions, tags and authors of the datasets, and file names, titles, descriptions, DOIs and
+        tags of their feature models. Only the columns are loaded, in three queries.
+        """
+
+        def published(query):
+            if dataset_ids is not None:
+                query = query.filter(DataSet.id.in_(list(dataset_ids)))
+            return query.filter(DSMetaData.dataset_doi.isnot(None))
+
+        texts = {}
+        metadata_ids = {}
+        for dataset_id, ds_meta_data_id, *fields in published(
+            self.session.query(
+                DataSet.id, DSMetaData.id, DSMetaData.title, DSMetaData.description, DSMetaData.tags
+            ).join(DataSet.ds_meta_data)
+        ):
+            metadata_ids[ds_meta_data_id] = dataset_id
+            texts[dataset_id] = list(fields)
+
+        for ds_meta_data_id, *fields in published(
+            self.session.query(Author.ds_meta_data_id, Author.name, Author.affiliation, Author.orcid)
+            .join(DSMetaData, Author.ds_meta_data_id == DSMetaData.id)
+            .join(DataSet, DataSet.ds_meta_data_id == DSMetaData.id)
+        ):
+            texts[metadata_ids[ds_meta_data_id]].extend(fields)
+
+        for dataset_id, *fields in published(
+            self.session.query(
+                FeatureModel.data_set_id,
+                FMMetaData.comp_filename,
+                FMMetaData.title,
+                FMMetaData.description,
+                FMMetaData.publication_doi,
+                FMMetaData.tags,
+            )
+            .join(FeatureModel.fm_meta_data)
+            .join(DataSet, FeatureModel.data_set_id == DataSet.id)
+            .join(DataSet.ds_meta_data)
+        ):
+            texts[dataset_id].extend(fields)
+
+        return {dataset_id: " ".join(field for field in fields if field) for dataset_id, fields in texts.items()}
+
+    def fuzzy_documents(self, dataset_ids=None) -> dict:
+        """Titles and author names of the published datasets ({dataset_id: text}), all of them by default."""
+        texts = {}
+        query = (
+            self.session.query(DataSet.id, DSMetaData.title, Author.name)
+            .join(DataSet.ds_meta_data)
+            .outerjoin(Author, Author.ds_meta_data_id == DSMetaData.id)
+            .filter(DSMetaData.dataset_doi.isnot(None))
+        )
+        if dataset_ids is not None:
+            query = query.filter(DataSet.id.in_(list(dataset_ids)))
+        for dataset_id, title, author in query:
+            texts.setdefault(dataset_id, [title])
+            if author:
+                texts[dataset_id].append(author)
+        return {dataset_id: " ".join(fields) for dataset_id, fields in texts.items()}
+
+    def suggestion_documents(self, dataset_ids=None) -> dict:
+        """
+        Tags (of the datasets and their feature models) and author names of the published datasets
+        ({dataset_id: {"tag": [...], "author": [...]}}), all of them by default.
+        """
+
+        def published(query):
+            if dataset_ids is not None:
+                query = query.filter(DataSet.id.in_(list(dataset_ids)))
+            return query.filter(DSMetaData.dataset_doi.isnot(None))
+
+        documents = {}
+        for dataset_id, tags, author in published(
+            self.session.query(DataSet.id, DSMetaData.tags, Author.name)
+            .join(DataSet.ds_meta_data)
+            .outerjoin(Author, Author.ds_meta_data_id == DSMetaData.id)
+        ):
+            document = documents.setdefault(dataset_id, {"tag": (tags or "").split(","), "author": []})
+            if author:
+                document["author"].append(author)
+
+        for dataset_id, tags in published(
+            self.session.query(FeatureModel.data_set_id, FMMetaData.tags)
+            .join(FeatureModel.fm_meta_data)
+            .join(DataSet, FeatureModel.data_set_id == DataSet.id)
+            .join(DataSet.ds_meta_data)
+        ):
+            if tags and dataset_id in documents:
+                documents[dataset_id]["tag"].extend(tags.split(","))
+
+        return documents
+
+    def facet_documents(self, dataset_ids=None) -> dict:
+        """
+        Tags and publication type of the datasets filter() lists ({dataset_id: {"tag": [...],
+        "publication_type": [...]}}), all of them by default.
+        """
+        query = (
+            self.session.query(DataSet.id, DSMetaData.publication_type, Tag.name)
+            .join(DataSet.ds_meta_data)
+            .outerjoin(DSMetaData.tag_list)
+            .filter(DSMetaData.dataset_doi.isnot(None), *self._listed())
+        )
+        if dataset_ids is not None:
+            query = query.filter(DataSet.id.in_(list(dataset_ids)))
+
+        documents = {}
+        for dataset_id, publication_type, tag in query:
+            document = documents.setdefault(dataset_id, {"tag": [], "publication_type": [publication_type.value]})
+            if tag:
+                document["tag"].append(tag)
+        return documents
+
+    def component_properties(self, dataset_ids=None, keys=("model", "type")) -> list:
+        """(dataset_id, hubfile_id, key, value) of the given properties of the .comp files of the published datasets."""
+        query = (
+            self.session.query(DataSet.id, ComponentProperty.hubfile_id, ComponentProperty.key, ComponentProperty.value)
+            .join(DataSet.ds_meta_data)
+            .join(FeatureModel, FeatureModel.data_set_id == DataSet.id)
+            .join(Hubfile, Hubfile.feature_model_id == FeatureModel.id)
+            .join(ComponentProperty, ComponentProperty.hubfile_id == Hubfile.id)
+            .filter(DSMetaData.dataset_doi.isnot(None), ComponentProperty.key.in_(keys))
+        )
+        if dataset_ids is not None:
+            query = query.filter(DataSet.id.in_(list(dataset_ids)))
+        return query.all()
+
+    def changed_dataset_ids(self, changes: dict) -> set:
+        """
+        Datasets whose searchable text depends on changed rows
+        ({"dataset"|"ds_meta_data"|"feature_model"|"hubfile"|"fm_meta_data": ids}).
+        """
+        dataset_ids = set(changes.get("dataset", ()))
+        if changes.get("hubfile"):
+            dataset_ids.update(
+                dataset_id
+                for (dataset_id,) in self.session.query(FeatureModel.data_set_id)
+                .join(Hubfile, Hubfile.feature_model_id == FeatureModel.id)
+                .filter(Hubfile.id.in_(list(changes["hubfile"])))
+            )
+        if changes.get("feature_model"):
+            dataset_ids.update(
+                dataset_id
+                for (dataset_id,) in self.session.query(FeatureModel.data_set_id).filter(
+                    FeatureModel.id.in_(list(changes["feature_model"]))
+                )
+            )
+        if changes.get("ds_meta_data"):
+            dataset_ids.update(
+                dataset_id
+                for (dataset_id,) in self.session.query(DataSet.id).filter(
+                    DataSet.ds_meta_data_id.in_(list(changes["ds_meta_data"]))
+                )
+            )
+        if changes.get("fm_meta_data"):
+            dataset_ids.update(
+                dataset_id
+                for (dataset_id,) in self.session.query(FeatureModel.data_set_id).filter(
+                    FeatureModel.fm_meta_data_id.in_(list(changes["fm_meta_data"]))
+                )
+            )
+        return dataset_ids
@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Results of explore searches shared by the threads of an app, keyed on their normalized criteria.
+
+    A commit of this process that changes what explore lists clears the cache and bumps its generation;
+    a result computed before a bump is returned but not stored. Changes committed by other processes,
+    and the counters updated outside the session, are picked up once an entry is older than ttl seconds.
+    Concurrent misses of a key wait for the first of them to compute it instead of all querying at once.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (stored_at, value), least recently used first
+        self.pending = {}  # key -> Event set once the thread computing it is done
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        """The cached value of key, or the one compute() returns."""
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                    self.entries.move_to_end(key)
+                    return entry[1]
+
+                done = self.pending.get(key)
+                if done is None:
+                    done = self.pending[key] = threading.Event()
+                    generation = self.generation
+                    break
+            # Either the value is stored now, or it was invalidated (or failed) and is computed again
+            done.wait()
+
+        try:
+            value = compute()
+            with self.lock:
+                if generation == self.generation:
+                    self.entries[key] = (time.monotonic(), value)
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+            return value
+        finally:
+            with self.lock:
+                del self.pending[key]
+            done.set()
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+    def __len__(self):
+        return len(self.entries)
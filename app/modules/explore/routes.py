@@ -1,7 +1,8 @@
-from flask import jsonify, render_template, request
+from flask import current_app, jsonify, render_template, request
 
 from app.modules.explore import explore_bp
 from app.modules.explore.forms import ExploreForm
+from app.modules.explore.search_index import SuggestionIndex
 from app.modules.explore.services import ExploreService
 
 
@@ -14,5 +15,56 @@ def index():
 
     if request.method == "POST":
         criteria = request.get_json()
-        datasets = ExploreService().filter(**criteria)
-        return jsonify([dataset.to_dict() for dataset in datasets])
+        return jsonify(ExploreService().results(**criteria))
+
+
+@explore_bp.route("/explore/results", methods=["GET"])
+def results():
+    # The same search as POST /explore, in a URL that browsers and nginx can cache
+    datasets = ExploreService().results(
+        query=request.args.get("query", ""),
+        sorting=request.args.get("sorting", "newest"),
+        publication_type=request.args.get("publication_type", "any"),
+        tags=request.args.getlist("tags"),
+        mode=request.args.get("mode", "text"),
+    )
+    response = jsonify(datasets)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["EXPLORE_CACHE_MAX_AGE"]
+    return response
+
+
+@explore_bp.route("/explore/facets", methods=["GET"])
+def facets():
+    facets = ExploreService().facets(
+        query=request.args.get("query", ""),
+        publication_type=request.args.get("publication_type", "any"),
+        tags=request.args.getlist("tags"),
+        mode=request.args.get("mode", "text"),
+    )
+    response = jsonify(facets)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["EXPLORE_CACHE_MAX_AGE"]
+    return response
+
+
+@explore_bp.route("/explore/page", methods=["POST"])
+def page():
+    criteria = request.get_json() or {}
+    try:
+        return jsonify(ExploreService().page(**criteria))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+
+@explore_bp.route("/explore/suggest", methods=["GET"])
+def suggest():
+    explore_service = ExploreService()
+    kind = request.args.get("kind") or None
+    if kind is not None and kind not in SuggestionIndex.KINDS:
+        return jsonify({"message": f"kind must be one of {', '.join(SuggestionIndex.KINDS)}"}), 400
+
+    limit = min(request.args.get("limit", explore_service.suggest_limit(), type=int), explore_service.suggest_limit())
+    prefix = request.args.get("prefix", "")
+    suggestions = explore_service.suggest(prefix, kind=kind, limit=max(limit, 1)) if prefix.strip() else []
+    return jsonify({"prefix": prefix, "suggestions": suggestions})
@@ -0,0 +1,531 @@
+import math
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from operator import itemgetter
+
+import unidecode
+
+_PUNCTUATION = re.compile(r'[,.":\'()\[\]^;!¡¿?]')
+# A word still being typed is matched as a prefix of at most this many indexed terms
+MAX_PREFIX_TERMS = 50
+
+
+def normalize_text(text: str) -> str:
+    """Folds accents to ASCII, lower-cases and strips punctuation, the way explore queries always were."""
+    return _PUNCTUATION.sub("", unidecode.unidecode(text or "").lower())
+
+
+def tokenize(text: str) -> list:
+    return normalize_text(text).split()
+
+
+class InvertedIndex:
+    """
+    Term -> postings index over small text documents, ranked with Okapi BM25.
+
+    Searching only reads the postings of the query terms, so its cost depends on how many documents
+    contain them and not on the size of the index. Documents can be replaced or removed one at a time.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {doc_id: term frequency}
+        self.lengths = {}  # doc_id -> number of terms
+        self.terms = {}  # doc_id -> distinct terms, to remove a document without scanning the postings
+        self.total_length = 0
+        self._vocabulary = None  # sorted terms for prefix lookups, rebuilt after changes
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.lengths
+
+    def add(self, doc_id, text: str):
+        self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.lengths[doc_id] = sum(terms.values())
+        self.terms[doc_id] = list(terms)
+        self.total_length += self.lengths[doc_id]
+        self._vocabulary = None
+
+    def remove(self, doc_id):
+        if doc_id not in self.lengths:
+            return
+        for term in self.terms.pop(doc_id):
+            del self.postings[term][doc_id]
+            if not self.postings[term]:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id)
+        self._vocabulary = None
+
+    def search(self, query: str, prefix: bool = True) -> list:
+        """
+        Ranks the documents containing any of the query terms, best first, as (doc_id, score) pairs.
+        With prefix, the last word also matches the terms it starts, as it may not be fully typed yet.
+        """
+        words = tokenize(query)
+        if not words or not self.lengths:
+            return []
+
+        terms = set(words)
+        if prefix:
+            terms.update(self._prefixed(words[-1]))
+
+        documents = len(self.lengths)
+        average_length = self.total_length / documents or 1
+        scores = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def _prefixed(self, word: str) -> list:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        terms = []
+        position = bisect_left(self._vocabulary, word)
+        while position < len(self._vocabulary) and len(terms) < MAX_PREFIX_TERMS:
+            term = self._vocabulary[position]
+            if not term.startswith(word):
+                break
+            terms.append(term)
+            position += 1
+        return terms
+
+
+def trigrams(word: str) -> set:
+    """Three-letter slices of a word padded like pg_trgm does, so beginnings weigh more than endings."""
+    padded = f"  {word} "
+    return {padded[position : position + 3] for position in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Word -> trigram index over small text documents for typo-tolerant matching.
+
+    Every query word is compared with the indexed words sharing at least one of its trigrams, using
+    the similarity of pg_trgm (shared trigrams / distinct trigrams of both words). Documents are ranked
+    by the best similarity reached for each query word, so "ryzn 7600" still finds "Ryzen 5 7600".
+    """
+
+    def __init__(self):
+        self.words = {}  # word -> {doc_id: occurrences}
+        self.grams = {}  # word -> trigrams
+        self.postings = {}  # trigram -> words
+        self.terms = {}  # doc_id -> distinct words
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.terms
+
+    def add(self, doc_id, text: str):
+        self.remove(doc_id)
+        words = Counter(tokenize(text))
+        for word, occurrences in words.items():
+            if word not in self.words:
+                self.words[word] = {}
+                self.grams[word] = trigrams(word)
+                for gram in self.grams[word]:
+                    self.postings.setdefault(gram, set()).add(word)
+            self.words[word][doc_id] = occurrences
+        self.terms[doc_id] = list(words)
+
+    def remove(self, doc_id):
+        for word in self.terms.pop(doc_id, ()):
+            del self.words[word][doc_id]
+            if self.words[word]:
+                continue
+            del self.words[word]
+            for gram in self.grams.pop(word):
+                self.postings[gram].discard(word)
+                if not self.postings[gram]:
+                    del self.postings[gram]
+
+    def similar(self, word: str, threshold: float) -> dict:
+        """Indexed words at least threshold similar to word, with their similarity."""
+        grams = trigrams(word)
+        shared = Counter(indexed for gram in grams for indexed in self.postings.get(gram, ()))
+        similar = {}
+        for indexed, count in shared.items():
+            similarity = count / (len(grams) + len(self.grams[indexed]) - count)
+            if similarity >= threshold:
+                similar[indexed] = similarity
+        return similar
+
+    def search(self, query: str, threshold: float = 0.3) -> list:
+        """Ranks the documents with words similar to the query words, best first, as (doc_id, score) pairs."""
+        words = set(tokenize(query))
+        scores = {}
+        for word in words:
+            # Most similar words first, so the first similarity seen for a document is its best one
+            seen = set()
+            similar = sorted(self.similar(word, threshold).items(), key=itemgetter(1), reverse=True)
+            for indexed, similarity in similar:
+                weight = similarity / len(words)
+                for doc_id in self.words[indexed].keys() - seen:
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight
+                seen.update(self.words[indexed])
+
+        return sorted(scores.items(), key=itemgetter(1), reverse=True)
+
+
+class _TrieNode:
+    __slots__ = ("children", "keys", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()  # keys with a word-start suffix ending here
+        self.top = []  # most popular keys of the subtree, as (count, key)
+
+
+class PrefixTrie:
+    """
+    Prefix tree of the word-start suffixes of counted values, so "ryz" completes "AMD Ryzen 5 7600".
+
+    Every node keeps the k most popular keys below it, so a completion only walks the prefix. Counts
+    change one value at a time and the lists of the nodes on their paths are recomputed bottom-up on
+    the next completion, or for the whole tree at once after many changes (such as a first build).
+    Suffixes are indexed up to MAX_DEPTH characters, and longer prefixes are matched on those.
+    """
+
+    MAX_DEPTH = 40
+
+    def __init__(self, k: int = 10):
+        self.k = k
+        self.root = _TrieNode()
+        self.counts = {}  # normalized value -> count
+        self.values = {}  # normalized value -> value as first seen
+        self.dirty = set()
+
+    def update(self, value: str, amount: int = 1):
+        key = " ".join(tokenize(value))
+        if not key:
+            return
+        count = self.counts.get(key, 0) + amount
+        if key not in self.counts:
+            self.values[key] = value.strip()
+            for node in self._ends(key, create=True):
+                node.keys.add(key)
+        if count <= 0:
+            for node in self._ends(key):
+                node.keys.discard(key)
+            self.counts.pop(key, None)
+            self.values.pop(key, None)
+        else:
+            self.counts[key] = count
+        self.dirty.add(key)
+
+    def complete(self, prefix: str, limit: int = None) -> list:
+        """The most popular values starting with (a word starting with) prefix, as (value, count) pairs."""
+        self.refresh()
+        node = self.root
+        for char in " ".join(tokenize(prefix))[: self.MAX_DEPTH]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [(self.values[key], count) for count, key in node.top[: limit or self.k]]
+
+    def _suffixes(self, key):
+        words = key.split(" ")
+        return [" ".join(words[index:])[: self.MAX_DEPTH] for index in range(len(words))]
+
+    def _ends(self, key, create=False):
+        for suffix in self._suffixes(key):
+            node = self.root
+            for char in suffix:
+                if create:
+                    node = node.children.setdefault(char, _TrieNode())
+                else:
+                    node = node.children.get(char)
+                    if node is None:
+                        break
+            else:
+                yield node
+
+    def _ranked(self, node):
+        candidates = {key: self.counts[key] for key in node.keys}
+        for child in node.children.values():
+            candidates.update((key, count) for count, key in child.top)
+        ranked = sorted(candidates.items(), key=lambda item: (-item[1], item[0]))[: self.k]
+        return [(count, key) for key, count in ranked]
+
+    def refresh(self):
+        if not self.dirty:
+            return
+        if len(self.dirty) > len(self.counts) // 10:
+            # Post-order pass over the whole tree
+            stack = [(self.root, False)]
+            while stack:
+                node, visited = stack.pop()
+                if visited:
+                    node.top = self._ranked(node)
+                else:
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in node.children.values())
+        else:
+            # Nodes on the paths of the changed keys, deepest first
+            paths = {}
+            for key in self.dirty:
+                for suffix in self._suffixes(key):
+                    node = self.root
+                    paths[id(node)] = (0, node)
+                    for depth, char in enumerate(suffix, 1):
+                        node = node.children.get(char)
+                        if node is None:
+                            break
+                        paths[id(node)] = (depth, node)
+            for _, node in sorted(paths.values(), key=itemgetter(0), reverse=True):
+                node.top = self._ranked(node)
+        self.dirty = set()
+
+
+class SuggestionIndex:
+    """Prefix tries of the tags, author names and component models of the datasets, counted per dataset."""
+
+    KINDS = ("tag", "author", "model")
+
+    def __init__(self, k: int = 10):
+        self.tries = {kind: PrefixTrie(k) for kind in self.KINDS}
+        self.documents = {}  # doc_id -> {kind: values}
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.documents
+
+    def add(self, doc_id, values: dict):
+        """Counts the values of a document ({kind: [values]}), once each."""
+        self.remove(doc_id)
+        document = {}
+        for kind in self.KINDS:
+            distinct = {" ".join(tokenize(value)): value for value in values.get(kind, ()) if value}
+            document[kind] = [value for key, value in distinct.items() if key]
+            for value in document[kind]:
+                self.tries[kind].update(value, 1)
+        self.documents[doc_id] = document
+
+    def remove(self, doc_id):
+        for kind, values in self.documents.pop(doc_id, {}).items():
+            for value in values:
+                self.tries[kind].update(value, -1)
+
+    def refresh(self):
+        for trie in self.tries.values():
+            trie.refresh()
+
+    def search(self, prefix: str, kind: str = None, limit: int = 10) -> list:
+        """The most popular completions of prefix, of one kind or of all of them, as dicts."""
+        suggestions = [
+            {"value": value, "kind": trie_kind, "count": count}
+            for trie_kind in ([kind] if kind else self.KINDS)
+            for value, count in self.tries[trie_kind].complete(prefix, limit)
+        ]
+        return sorted(suggestions, key=lambda suggestion: -suggestion["count"])[:limit]
+
+
+def bitset(doc_ids) -> int:
+    """Integer whose bit n is set for each doc id n."""
+    doc_ids = list(doc_ids)
+    if not doc_ids:
+        return 0
+    bits = bytearray(max(doc_ids) // 8 + 1)
+    for doc_id in doc_ids:
+        bits[doc_id >> 3] |= 1 << (doc_id & 7)
+    return int.from_bytes(bits, "little")
+
+
+class FacetIndex:
+    """
+    Datasets per value of each facet (tags, publication types, component types), as bitsets.
+
+    Bit n of a bitset stands for the document with id n, so the documents matching a search are a
+    bitset too and the count of a value among them is the number of bits two integers share. The
+    bitsets of changed values are rebuilt from their documents before the next search.
+    """
+
+    FACETS = ("tag", "publication_type", "component_type")
+
+    def __init__(self):
+        self.documents = {facet: {} for facet in self.FACETS}  # facet -> value -> doc ids
+        self.bitsets = {facet: {} for facet in self.FACETS}  # facet -> value -> bitset of its doc ids
+        self.values = {}  # doc_id -> {facet: values}, to remove a document
+        self.all = 0
+        self._dirty = set()  # (facet, value) whose bitset is out of date
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.values
+
+    def add(self, doc_id, document: dict):
+        """Indexes a document, {facet: values}."""
+        self.remove(doc_id)
+        values = {facet: {value for value in document.get(facet, ()) if value} for facet in self.FACETS}
+        for facet, facet_values in values.items():
+            for value in facet_values:
+                self.documents[facet].setdefault(value, set()).add(doc_id)
+                self._dirty.add((facet, value))
+        self.values[doc_id] = values
+        self._dirty.add(None)
+
+    def remove(self, doc_id):
+        values = self.values.pop(doc_id, None)
+        if values is None:
+            return
+        for facet, facet_values in values.items():
+            for value in facet_values:
+                doc_ids = self.documents[facet][value]
+                doc_ids.discard(doc_id)
+                if not doc_ids:
+                    del self.documents[facet][value]
+                self._dirty.add((facet, value))
+        self._dirty.add(None)
+
+    def refresh(self):
+        for key in self._dirty:
+            if key is None:
+                self.all = bitset(self.values)
+                continue
+            facet, value = key
+            if value in self.documents[facet]:
+                self.bitsets[facet][value] = bitset(self.documents[facet][value])
+            else:
+                self.bitsets[facet].pop(value, None)
+        self._dirty = set()
+
+    def search(self, doc_ids=None, filters: dict = None, limit: int = 20) -> dict:
+        """
+        Counts of the most frequent values of each facet ({facet: [{"value", "count"}]}) among the documents,
+        or only those in doc_ids, that have at least one of the values of each facet in filters.
+        """
+        self.refresh()
+        selection = self.all if doc_ids is None else self.all & bitset(doc_ids)
+        for facet, values in (filters or {}).items():
+            selection &= self._matching(facet, values)
+
+        facets = {}
+        for facet in self.FACETS:
+            if selection == self.all:
+                counts = [(value, len(doc_ids)) for value, doc_ids in self.documents[facet].items()]
+            else:
+                counts = [(value, (bits & selection).bit_count()) for value, bits in self.bitsets[facet].items()]
+            counts.sort(key=lambda item: (-item[1], item[0]))
+            facets[facet] = [{"value": value, "count": count} for value, count in counts[:limit] if count]
+        return facets
+
+    def _matching(self, facet: str, values) -> int:
+        bits = 0
+        for value in values:
+            bits |= self.bitsets[facet].get(value, 0)
+        return bits
+
+
+class ExploreIndex:
+    """
+    Index (InvertedIndex, TrigramIndex, SuggestionIndex or FacetIndex) of the published datasets, or of
+    their files, shared by the threads of an app.
+
+    It is built on first use and then kept current from the changes committed by this process, which
+    are marked stale and reindexed before the next search. Changes committed by other processes are
+    picked up by a full rebuild once the index is older than ttl seconds; one thread rebuilds it while
+    the others keep searching the previous one. The database is never queried while holding the lock,
+    so searches only wait for the database on the first build.
+    """
+
+    def __init__(self, index_class, load, resolve, ttl: float):
+        self.index_class = index_class
+        self.load = load  # dataset ids, or None for all -> {dataset_id: document}
+        self.resolve = resolve  # {kind: ids} -> dataset ids
+        self.ttl = ttl
+        self.index = index_class()
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.built_at = None
+        self.generation = 0  # index swaps so far
+        self.stale = {}
+
+    def mark_stale(self, changes: dict):
+        with self.lock:
+            for kind, ids in changes.items():
+                self.stale.setdefault(kind, set()).update(ids)
+
+    def search(self, query: str, **options) -> list:
+        self.refresh()
+        with self.lock:
+            return self.index.search(query, **options)
+
+    def refresh(self):
+        # Only the first build makes searches wait
+        if self._expired() and self.build_lock.acquire(blocking=self.built_at is None):
+            try:
+                if self._expired():
+                    self.rebuild()
+            finally:
+                self.build_lock.release()
+
+        # One thread reindexes the stale documents at a time, so that older documents are never applied after
+        # newer ones; the others search the index as it is and leave the rest of the changes for the next search
+        if not self.stale or not self.refresh_lock.acquire(blocking=False):
+            return
+        try:
+            with self.lock:
+                changes, self.stale, generation = self.stale, {}, self.generation
+            if not changes:
+                return
+            dataset_ids = self.resolve(changes)
+            documents = self.load(dataset_ids) if dataset_ids else {}
+            with self.lock:
+                if self.generation != generation:
+                    # The index was swapped while these were loaded: reload them against the new one
+                    for kind, ids in changes.items():
+                        self.stale.setdefault(kind, set()).update(ids)
+                    return
+                for dataset_id in dataset_ids:
+                    if dataset_id in documents:
+                        self.index.add(dataset_id, documents[dataset_id])
+                    else:
+                        self.index.remove(dataset_id)
+        finally:
+            self.refresh_lock.release()
+
+    def rebuild(self):
+        # Changes committed while the new index is loaded stay marked and are applied again after the swap
+        with self.lock:
+            self.stale = {}
+        self.swap(self.build(), time.monotonic())
+
+    def build(self):
+        """A new index of every document, loaded without holding the lock."""
+        index = self.index_class()
+        for dataset_id, document in self.load(None).items():
+            index.add(dataset_id, document)
+        if hasattr(index, "refresh"):
+            # Indexes that prepare their lists lazily do it now, not in the first search after the swap
+            index.refresh()
+        return index
+
+    def swap(self, index, built_at: float):
+        with self.lock:
+            self.index, self.built_at = index, built_at
+            self.generation += 1
+
+    def _expired(self) -> bool:
+        return self.built_at is None or time.monotonic() - self.built_at > self.ttl
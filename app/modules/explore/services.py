@@ -1,4 +1,29 @@
+import base64
+import json
+import os
+from datetime import datetime
+from functools import partial
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+from app import db
+from app.modules.componentes_check.models import ComponentProperty
+from app.modules.dataset.models import Author, DataSet, DSMetaData, PublicationType, Tag
+from app.modules.dataset.services import SizeService
 from app.modules.explore.repositories import ExploreRepository
+from app.modules.explore.result_cache import ResultCache
+from app.modules.explore.search_index import (
+    ExploreIndex,
+    FacetIndex,
+    InvertedIndex,
+    SuggestionIndex,
+    TrigramIndex,
+    normalize_text,
+    tokenize,
+)
+from app.modules.featuremodel.models import FeatureModel, FMMetaData
+from app.modules.hubfile.models import Hubfile
 from core.services.BaseService import BaseService
 
 
@@ -6,5 +31,258 @@ class ExploreService(BaseService):
     def __init__(self):
         super().__init__(ExploreRepository())
 
-    def filter(self, query="", sorting="newest", publication_type="any", tags=[], **kwargs):
-        return self.repository.filter(query, sorting, publication_type, tags, **kwargs)
+    def filter(self, query="", sorting="newest", publication_type="any", tags=[], mode="text", **kwargs):
+        """
+        Published datasets matching the criteria. A query is answered by the search index, or by the
+        typo-tolerant trigram index with mode "fuzzy", and its matches are ordered by relevance when
+        sorting is "relevance".
+        """
+        ranking = None
+        if normalize_text(query).strip():
+            matches = self.fuzzy_search(query) if mode == "fuzzy" else self.search(query)
+            ranking = {dataset_id: position for position, (dataset_id, _) in enumerate(matches)}
+
+        datasets = self.repository.filter(ranking, sorting, publication_type, tags, **kwargs)
+        if ranking is not None and sorting == "relevance":
+            datasets.sort(key=lambda dataset: ranking[dataset.id])
+        return datasets
+
+    def results(self, query="", sorting="newest", publication_type="any", tags=[], mode="text", **kwargs) -> list:
+        """
+        The datasets filter() returns as dicts, from the result cache while nothing they show has been
+        committed. Criteria that only differ in accents, case, punctuation or spacing share an entry.
+        """
+        words = " ".join(tokenize(query))
+        key = (
+            words,
+            sorting,
+            publication_type,
+            tuple(sorted(Tag.names(",".join(tags)))),
+            mode if words else "text",
+            # to_dict() links to the host of the request
+            request.host_url if has_request_context() else None,
+        )
+        return self.result_cache().get(
+            key,
+            lambda: [
+                dataset.to_dict() for dataset in self.filter(words, sorting, publication_type, list(key[3]), key[4])
+            ],
+        )
+
+    @staticmethod
+    def result_cache() -> ResultCache:
+        if "explore_cache" not in current_app.extensions:
+            current_app.extensions.setdefault(
+                "explore_cache",
+                ResultCache(current_app.config["EXPLORE_CACHE_MAX_ENTRIES"], current_app.config["EXPLORE_CACHE_TTL"]),
+            )
+        return current_app.extensions["explore_cache"]
+
+    def page(
+        self,
+        query="",
+        sorting="newest",
+        publication_type="any",
+        tags=[],
+        mode="text",
+        cursor=None,
+        page_size=None,
+        **kwargs,
+    ) -> dict:
+        """
+        One page of the datasets filter() would return, newest or oldest first, as the fields of a result
+        card. The next_cursor of a page asks for the following one; the total counts every match.
+        Raises ValueError for a sorting that cannot be paged or an invalid cursor.
+        """
+        if sorting not in ("newest", "oldest"):
+            raise ValueError("Pages can only be sorted by 'newest' or 'oldest'")
+        max_size = current_app.config["EXPLORE_MAX_PAGE_SIZE"]
+        size = min(max(int(page_size or current_app.config["EXPLORE_PAGE_SIZE"]), 1), max_size)
+
+        dataset_ids = None
+        if normalize_text(query).strip():
+            matches = self.fuzzy_search(query) if mode == "fuzzy" else self.search(query)
+            dataset_ids = [dataset_id for dataset_id, _ in matches]
+
+        rows, authors, has_more = self.repository.page(
+            dataset_ids, sorting, publication_type, tags, after=self._decode_cursor(cursor), size=size
+        )
+        domain = os.getenv("DOMAIN", "localhost")
+        size_service = SizeService()
+        return {
+            "results": [
+                {
+                    "id": row.id,
+                    "title": row.title,
+                    "created_at": row.created_at,
+                    "description": row.description,
+                    "authors": [
+                        {"name": author.name, "affiliation": author.affiliation, "orcid": author.orcid}
+                        for author in authors.get(row.ds_meta_data_id, [])
+                    ],
+                    "publication_type": row.publication_type.name.replace("_", " ").title(),
+                    "tags": row.tags.split(",") if row.tags else [],
+                    "url": f"http://{domain}/doi/{row.dataset_doi}",
+                    "total_size_in_human_format": size_service.get_human_readable_size(row.total_size_bytes or 0),
+                    "download_count": row.download_count or 0,
+                }
+                for row in rows
+            ],
+            "next_cursor": self._encode_cursor(rows[-1]) if has_more else None,
+            "total": self.repository.count_matching(dataset_ids, publication_type, tags),
+            "facets": self._facets(dataset_ids, publication_type, tags),
+        }
+
+    def facets(self, query="", publication_type="any", tags=[], mode="text", **kwargs) -> dict:
+        """
+        Most frequent tags, publication types and component types among the datasets filter() returns,
+        with their counts ({facet: [{"value", "count"}]}). Only the search index is read.
+        """
+        dataset_ids = None
+        if normalize_text(query).strip():
+            matches = self.fuzzy_search(query) if mode == "fuzzy" else self.search(query)
+            dataset_ids = [dataset_id for dataset_id, _ in matches]
+        return self._facets(dataset_ids, publication_type, tags)
+
+    def _facets(self, dataset_ids, publication_type, tags) -> dict:
+        filters = {}
+        # Unknown publication types do not filter, as in the repository
+        if publication_type in {member.value for member in PublicationType}:
+            filters["publication_type"] = [publication_type]
+        if tags:
+            filters["tag"] = Tag.names(",".join(tags))
+        return self.search_index("facet").search(
+            dataset_ids, filters=filters, limit=current_app.config["EXPLORE_FACET_LIMIT"]
+        )
+
+    @staticmethod
+    def _encode_cursor(row) -> str:
+        position = json.dumps([row.created_at.isoformat(), row.id])
+        return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            created_at, dataset_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            return datetime.fromisoformat(created_at), int(dataset_id)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+
+    def search(self, query: str) -> list:
+        """(dataset_id, score) pairs of the published datasets matching a query, best first."""
+        return self.search_index("text").search(query)
+
+    def fuzzy_search(self, query: str, threshold: float = None) -> list:
+        """
+        (dataset_id, similarity) pairs of the published datasets whose titles, author names or component
+        models look like the query words, best first.
+        """
+        if threshold is None:
+            threshold = current_app.config["EXPLORE_FUZZY_THRESHOLD"]
+        return self.search_index("fuzzy").search(query, threshold=threshold)
+
+    def suggest(self, prefix: str, kind: str = None, limit: int = None) -> list:
+        """Most popular tags, author names and component models (or only those of kind) completing prefix."""
+        return self.search_index("suggest").search(prefix, kind=kind, limit=limit or self.suggest_limit())
+
+    def suggest_limit(self) -> int:
+        return current_app.config["EXPLORE_SUGGEST_LIMIT"]
+
+    def search_index(self, kind: str = "text") -> ExploreIndex:
+        indexes = current_app.extensions.setdefault("explore_index", {})
+        if kind not in indexes:
+            index_class, load = {
+                "text": (InvertedIndex, self._search_documents),
+                "fuzzy": (TrigramIndex, self._fuzzy_documents),
+                "suggest": (partial(SuggestionIndex, self.suggest_limit()), self._suggestion_documents),
+                "facet": (FacetIndex, self._facet_documents),
+            }[kind]
+            indexes.setdefault(
+                kind,
+                ExploreIndex(
+                    index_class,
+                    load,
+                    lambda changes: ExploreRepository().changed_dataset_ids(changes),
+                    current_app.config["EXPLORE_INDEX_TTL"],
+                ),
+            )
+        return indexes[kind]
+
+    @staticmethod
+    def _search_documents(dataset_ids):
+        return ExploreRepository().search_documents(dataset_ids)
+
+    @staticmethod
+    def _fuzzy_documents(dataset_ids):
+        texts = ExploreRepository().fuzzy_documents(dataset_ids)
+        for dataset_id, properties in _component_properties(dataset_ids):
+            if dataset_id in texts and properties.get("model"):
+                texts[dataset_id] += f" {properties['model']}"
+        return texts
+
+    @staticmethod
+    def _suggestion_documents(dataset_ids):
+        documents = ExploreRepository().suggestion_documents(dataset_ids)
+        for dataset_id, properties in _component_properties(dataset_ids):
+            if dataset_id in documents and properties.get("model"):
+                documents[dataset_id].setdefault("model", []).append(properties["model"])
+        return documents
+
+    @staticmethod
+    def _facet_documents(dataset_ids):
+        documents = ExploreRepository().facet_documents(dataset_ids)
+        for dataset_id, properties in _component_properties(dataset_ids):
+            if dataset_id in documents and properties.get("type"):
+                documents[dataset_id].setdefault("component_type", []).append(str(properties["type"]).lower())
+        return documents
+
+
+def _component_properties(dataset_ids):
+    """(dataset_id, properties) pairs of the .comp files of the published datasets, from the property store."""
+    files = {}
+    for dataset_id, hubfile_id, key, value in ExploreRepository().component_properties(dataset_ids):
+        files.setdefault(hubfile_id, (dataset_id, {}))[1][key] = value
+    return files.values()
+
+
+def _track_changes(session, flush_context):
+    changes = session.info.setdefault("explore_changes", {})
+    for instance in session.new | session.dirty | session.deleted:
+        if isinstance(instance, DataSet):
+            changes.setdefault("dataset", set()).add(instance.id)
+        elif isinstance(instance, FeatureModel):
+            changes.setdefault("dataset", set()).add(instance.data_set_id)
+        elif isinstance(instance, Hubfile):
+            changes.setdefault("feature_model", set()).add(instance.feature_model_id)
+            changes.setdefault("hubfile", set()).add(instance.id)
+        elif isinstance(instance, ComponentProperty):
+            changes.setdefault("hubfile", set()).add(instance.hubfile_id)
+        elif isinstance(instance, DSMetaData):
+            changes.setdefault("ds_meta_data", set()).add(instance.id)
+        elif isinstance(instance, FMMetaData):
+            changes.setdefault("fm_meta_data", set()).add(instance.id)
+        elif isinstance(instance, Author):
+            changes.setdefault("ds_meta_data", set()).add(instance.ds_meta_data_id)
+            changes.setdefault("fm_meta_data", set()).add(instance.fm_meta_data_id)
+
+
+def _publish_changes(session):
+    changes = session.info.pop("explore_changes", None)
+    if changes and has_app_context():
+        for index in current_app.extensions.get("explore_index", {}).values():
+            index.mark_stale({kind: ids - {None} for kind, ids in changes.items()})
+        if "explore_cache" in current_app.extensions:
+            current_app.extensions["explore_cache"].invalidate()
+
+
+def _discard_changes(session):
+    session.info.pop("explore_changes", None)
+
+
+# The search indexes and the result cache follow the commits of this process; changes are only collected while flushing,
+# when the ids of new rows are known, and handed over once the transaction is committed
+event.listen(db.session, "after_flush", _track_changes)
+event.listen(db.session, "after_commit", _publish_changes)
+event.listen(db.session, "after_rollback", _discard_changes)
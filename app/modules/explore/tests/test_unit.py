@@ -0,0 +1,374 @@
+import threading
+import time
+
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.componentes_check.services import ComponentPropertyService
+from app.modules.dataset.models import Author, DataSet, DSMetaData, PublicationType, Tag
+from app.modules.explore.result_cache import ResultCache
+from app.modules.explore.search_index import (
+    ExploreIndex,
+    FacetIndex,
+    InvertedIndex,
+    PrefixTrie,
+    TrigramIndex,
+    normalize_text,
+    trigrams,
+)
+from app.modules.explore.services import ExploreService
+from app.modules.featuremodel.models import FeatureModel, FMMetaData
+from app.modules.hubfile.models import Hubfile
+
+DATASETS = [
+    ("Gaming rigs", "Builds around AMD Ryzen processors", "gaming, amd", "Lucía Pérez", "ryzen7600.comp"),
+    ("Office computers", "Quiet builds with Intel processors", "office, intel", "John Smith", "i512400.comp"),
+    ("Intel servers", "Intel Xeon nodes and Intel NICs", "server, intel", "Ana Gómez", "xeon.comp"),
+]
+
+MODELS = {
+    "ryzen7600.comp": "AMD Ryzen 5 7600",
+    "i512400.comp": "Intel Core i5-12400",
+    "xeon.comp": "Intel Xeon Silver 4314",
+}
+
+
+@pytest.fixture(scope="module")
+def test_client(test_client):
+    """
+    Extends the test_client fixture to add additional specific data for module testing.
+    """
+    with test_client.application.app_context():
+        # The index of the app outlives the database of previous modules
+        test_client.application.extensions.pop("explore_index", None)
+        test_client.application.extensions.pop("explore_cache", None)
+        user = User.query.filter_by(email="test@example.com").first()
+
+        for title, description, tags, author, filename in DATASETS:
+            ds_meta_data = DSMetaData(
+                title=title,
+                description=description,
+                publication_type=PublicationType.DATA_MANAGEMENT_PLAN,
+                dataset_doi=f"10.1234/{filename}",
+                tags=tags,
+                authors=[Author(name=author, orcid="0000-0002-1825-0097")],
+            )
+            dataset = DataSet(user_id=user.id, ds_meta_data=ds_meta_data)
+            fm_meta_data = FMMetaData(
+                comp_filename=filename,
+                title=filename,
+                description=f"Description for {filename}",
+                publication_type=PublicationType.SOFTWARE_DOCUMENTATION,
+            )
+            feature_model = FeatureModel(data_set=dataset, fm_meta_data=fm_meta_data)
+            hubfile = Hubfile(name=filename, checksum=f"checksum_{filename}", size=1, feature_model=feature_model)
+            db.session.add_all([dataset, feature_model, hubfile])
+            db.session.commit()
+
+    yield test_client
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    """Writes the .comp files of the test datasets to a temporary working directory."""
+    monkeypatch.setenv("WORKING_DIR", str(tmp_path))
+    for dataset in DataSet.query:
+        folder = tmp_path / "uploads" / f"user_{dataset.user_id}" / f"dataset_{dataset.id}"
+        folder.mkdir(parents=True)
+        for hubfile in dataset.files():
+            model = MODELS[hubfile.name]
+            (folder / hubfile.name).write_text(
+                f"name: {hubfile.name}\nversion: 1.0\nauthor: Tester\n\nproperties:\n    id: c1\n"
+                f"    type: processor\n    model: {model}\n    description: {model}\n"
+            )
+    ComponentPropertyService().backfill()
+
+
+def search(test_client, **criteria):
+    response = test_client.post("/explore", json=criteria)
+    assert response.status_code == 200
+    return [dataset["title"] for dataset in response.get_json()]
+
+
+def test_inverted_index_ranks_with_bm25():
+    index = InvertedIndex()
+    index.add(1, "intel xeon server with intel network cards")
+    index.add(2, "amd ryzen gaming build")
+    index.add(3, "intel office build")
+
+    assert [doc_id for doc_id, _ in index.search("intel")] == [1, 3], "More occurrences rank first"
+    assert [doc_id for doc_id, _ in index.search("ryzen build")][0] == 2, "Rarer terms weigh more"
+    assert [doc_id for doc_id, _ in index.search("ryz")] == [2], "The last word matches as a prefix"
+    assert index.search("ryz", prefix=False) == []
+
+    index.remove(2)
+    assert index.search("ryzen") == [] and 2 not in index
+    index.add(3, "intel home build")
+    assert index.search("office") == [] and len(index) == 2
+
+
+def test_normalize_text_folds_accents_and_punctuation():
+    assert normalize_text('Lucía "Pérez", (ÑU)!') == "lucia perez nu"
+
+
+def test_explore_search_uses_the_index(test_client):
+    assert search(test_client, query="intel", sorting="relevance") == ["Intel servers", "Office computers"]
+    assert set(search(test_client, query="LUCIA")) == {"Gaming rigs"}, "Authors are searchable without accents"
+    assert search(test_client, query="i512400") == ["Office computers"], "File names are searchable"
+    assert search(test_client, query="0000-0002-1825-0097", sorting="oldest") == [title for title, *_ in DATASETS]
+    assert search(test_client, query="nothing matches this") == []
+    assert len(search(test_client, query="")) == len(DATASETS)
+
+
+def test_committed_changes_are_reindexed(test_client):
+    index = ExploreService().search_index()
+    index.refresh()
+    built_at = index.built_at
+
+    ds_meta_data = DSMetaData.query.filter_by(title="Gaming rigs").one()
+    ds_meta_data.title = "Streaming rigs"
+    FMMetaData.query.filter_by(comp_filename="xeon.comp").one().tags = "epyc"
+    db.session.commit()
+
+    assert search(test_client, query="streaming") == ["Streaming rigs"]
+    assert search(test_client, query="gaming") == ["Streaming rigs"], "Tags still match"
+    assert search(test_client, query="epyc") == ["Intel servers"]
+    assert index.built_at == built_at, "Changes are applied without rebuilding the index"
+
+    ds_meta_data.dataset_doi = None
+    db.session.commit()
+    assert search(test_client, query="streaming") == []
+
+    ds_meta_data.dataset_doi = "10.1234/ryzen7600.comp"
+    db.session.commit()
+    assert search(test_client, query="streaming") == ["Streaming rigs"]
+
+
+def test_explore_index_loads_documents_outside_the_lock():
+    documents = {1: "intel office", 2: "amd gaming"}
+    loads = []
+
+    def load(dataset_ids):
+        assert not index.lock._is_owned(), "Searches must not wait for the database"
+        loads.append(dataset_ids)
+        if len(loads) == 3:
+            index.swap(index.build(), index.built_at)  # another thread rebuilds it meanwhile
+        return {dataset_id: documents[dataset_id] for dataset_id in dataset_ids or documents if dataset_id in documents}
+
+    index = ExploreIndex(InvertedIndex, load, lambda changes: changes["dataset"], ttl=3600)
+    assert [doc_id for doc_id, _ in index.search("intel")] == [1]
+
+    documents[2] = "intel gaming"
+    index.mark_stale({"dataset": {2}})
+    assert [doc_id for doc_id, _ in index.search("intel")] == [1, 2]
+
+    # Documents loaded before a swap are not applied to the new index, but loaded again
+    del documents[1]
+    index.mark_stale({"dataset": {1}})
+    assert [doc_id for doc_id, _ in index.search("gaming")] == [2] and index.stale == {"dataset": {1}}
+    assert [doc_id for doc_id, _ in index.search("intel")] == [2] and not index.stale
+
+
+def test_trigram_index_tolerates_typos():
+    index = TrigramIndex()
+    index.add(1, "AMD Ryzen 5 7600")
+    index.add(2, "NVIDIA GeForce RTX 4070")
+    index.add(3, "Intel Core i5-12400")
+
+    assert trigrams("cat") == {"  c", " ca", "cat", "at "}
+    assert [doc_id for doc_id, _ in index.search("Ryzn 7600")] == [1]
+    assert [doc_id for doc_id, _ in index.search("nvdia")] == [2]
+    assert index.search("nvdia", threshold=0.9) == []
+
+    index.remove(2)
+    assert index.search("nvidia") == [] and "nvidia" not in index.words and len(index) == 2
+
+
+def test_explore_fuzzy_mode(test_client, uploads):
+    ExploreService().search_index("fuzzy").rebuild()
+
+    assert search(test_client, query="ryzn 7600", mode="fuzzy") == ["Streaming rigs"], "Component models match"
+    assert search(test_client, query="ryzn 7600") == [], "The default mode needs the exact words"
+    assert search(test_client, query="Jon Smit", mode="fuzzy") == ["Office computers"]
+    assert search(test_client, query="xeon silvr", mode="fuzzy", sorting="relevance")[0] == "Intel servers"
+
+
+def test_prefix_trie_completes_by_popularity():
+    trie = PrefixTrie(k=2)
+    for value, count in (("AMD Ryzen 5 7600", 3), ("AMD Radeon RX 7800", 5), ("Asus ROG", 1)):
+        trie.update(value, count)
+
+    assert trie.complete("a") == [("AMD Radeon RX 7800", 5), ("AMD Ryzen 5 7600", 3)]
+    assert trie.complete("ryz") == [("AMD Ryzen 5 7600", 3)], "Words other than the first complete too"
+    assert trie.complete("amd r", limit=1) == [("AMD Radeon RX 7800", 5)]
+    assert trie.complete("intel") == []
+
+    trie.update("amd radeon rx 7800", -5)
+    trie.update("asus rog", 4)
+    assert trie.complete("a") == [("Asus ROG", 5), ("AMD Ryzen 5 7600", 3)], "Counts change incrementally"
+
+
+def test_suggest_endpoint(test_client, uploads):
+    ExploreService().search_index("suggest").rebuild()
+
+    response = test_client.get("/explore/suggest?prefix=int")
+    assert response.status_code == 200
+    suggestions = response.get_json()["suggestions"]
+    assert suggestions[0] == {"value": "intel", "kind": "tag", "count": 2}
+    assert {"value": "Intel Core i5-12400", "kind": "model", "count": 1} in suggestions
+
+    response = test_client.get("/explore/suggest?prefix=per&kind=author")
+    assert response.get_json()["suggestions"] == [{"value": "Lucía Pérez", "kind": "author", "count": 1}]
+    assert test_client.get("/explore/suggest?prefix=").get_json()["suggestions"] == []
+    assert test_client.get("/explore/suggest?prefix=a&kind=unknown").status_code == 400
+
+
+def test_suggestions_follow_published_datasets(test_client, uploads):
+    explore_service = ExploreService()
+    explore_service.search_index("suggest").rebuild()
+    assert explore_service.suggest("epy") == [{"value": "epyc", "kind": "tag", "count": 1}]
+
+    ds_meta_data = DSMetaData.query.filter_by(title="Office computers").one()
+    ds_meta_data.tags = "office, epyc"
+    db.session.commit()
+    assert explore_service.suggest("epy") == [{"value": "epyc", "kind": "tag", "count": 2}]
+
+    ds_meta_data.dataset_doi = None
+    db.session.commit()
+    assert explore_service.suggest("offi") == []
+
+    ds_meta_data.dataset_doi = "10.1234/i512400.comp"
+    db.session.commit()
+
+
+def test_explore_pages_follow_the_cursor(test_client):
+    titles = []
+    cursor = None
+    while True:
+        response = test_client.post("/explore/page", json={"sorting": "oldest", "page_size": 1, "cursor": cursor})
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page["results"]) == 1 and page["total"] == len(DATASETS)
+        titles.extend(result["title"] for result in page["results"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    oldest = DataSet.query.order_by(DataSet.created_at, DataSet.id)
+    assert titles == [dataset.ds_meta_data.title for dataset in oldest], "Every dataset is listed once, in order"
+
+    result = test_client.post("/explore/page", json={"query": "intel"}).get_json()
+    assert [card["title"] for card in result["results"]] == ["Intel servers", "Office computers"]
+    assert result["total"] == 2 and result["next_cursor"] is None
+    assert result["results"][0]["authors"] == [
+        {"name": "Ana Gómez", "affiliation": None, "orcid": "0000-0002-1825-0097"}
+    ]
+    assert result["results"][0]["tags"] == ["server", " intel"]
+
+
+def test_explore_page_rejects_invalid_requests(test_client):
+    assert test_client.post("/explore/page", json={"sorting": "relevance"}).status_code == 400
+    assert test_client.post("/explore/page", json={"cursor": "not a cursor"}).status_code == 400
+
+
+def test_result_cache_computes_concurrent_misses_once():
+    cache = ResultCache(max_entries=2, ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return ["result"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("key", compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [["result"]] * 5 and len(calls) == 1
+
+    def invalidated():
+        cache.invalidate()
+        return ["stale"]
+
+    assert cache.get("other", invalidated) == ["stale"]
+    assert cache.get("other", lambda: ["fresh"]) == ["fresh"], "Results computed before an invalidation are not kept"
+
+    cache.get("third", lambda: [])
+    assert "key" not in cache.entries and len(cache) == 2, "The least recently used entry is evicted"
+
+
+def test_explore_results_are_cached_until_a_commit(test_client):
+    response = test_client.get("/explore/results?query=Intel&sorting=relevance")
+    assert response.status_code == 200
+    assert response.cache_control.public and response.cache_control.max_age > 0
+    assert [dataset["title"] for dataset in response.get_json()] == ["Intel servers", "Office computers"]
+
+    cache = ExploreService.result_cache()
+    entries = len(cache)
+    assert search(test_client, query="  intel!", sorting="relevance") == ["Intel servers", "Office computers"]
+    assert len(cache) == entries, "Equivalent criteria share an entry"
+
+    ds_meta_data = DSMetaData.query.filter_by(title="Intel servers").one()
+    ds_meta_data.title = "Intel racks"
+    db.session.commit()
+    assert len(cache) == 0
+    assert search(test_client, query="intel", sorting="relevance") == ["Intel racks", "Office computers"]
+
+    ds_meta_data.title = "Intel servers"
+    db.session.commit()
+
+
+def test_facet_index_counts_with_bitsets():
+    index = FacetIndex()
+    index.add(1, {"tag": ["intel", "server"], "publication_type": ["report"], "component_type": ["processor"]})
+    index.add(2, {"tag": ["intel"], "publication_type": ["thesis"], "component_type": ["processor", "memory"]})
+    index.add(70, {"tag": ["amd"], "publication_type": ["report"]})
+
+    facets = index.search()
+    assert facets["tag"] == [
+        {"value": "intel", "count": 2},
+        {"value": "amd", "count": 1},
+        {"value": "server", "count": 1},
+    ]
+    assert facets["component_type"] == [{"value": "processor", "count": 2}, {"value": "memory", "count": 1}]
+
+    facets = index.search(filters={"publication_type": ["report"]})
+    assert facets["tag"] == [
+        {"value": "amd", "count": 1},
+        {"value": "intel", "count": 1},
+        {"value": "server", "count": 1},
+    ]
+    assert index.search(doc_ids=[2, 70], limit=1)["tag"] == [{"value": "amd", "count": 1}]
+
+    index.remove(1)
+    index.add(70, {"tag": ["intel"]})
+    assert index.search()["tag"] == [{"value": "intel", "count": 2}] and len(index) == 2
+    assert index.search(filters={"tag": ["server"]})["publication_type"] == []
+
+
+def test_explore_facets_and_tag_filter(test_client, uploads):
+    ds_meta_data = DSMetaData.query.filter_by(title="Office computers").one()
+    ds_meta_data.tags = "Office, INTEL , office"
+    db.session.commit()
+    assert {tag.name for tag in ds_meta_data.tag_list} == {"office", "intel"}, "Tags are kept normalized"
+    assert Tag.query.filter_by(name="intel").count() == 1
+    ExploreService().search_index("facet").rebuild()
+
+    facets = test_client.get("/explore/facets").get_json()
+    assert facets["tag"][0] == {"value": "intel", "count": 2}
+    assert facets["publication_type"] == [{"value": "datamanagementplan", "count": len(DATASETS)}]
+    assert facets["component_type"] == [{"value": "processor", "count": len(DATASETS)}]
+
+    facets = test_client.get("/explore/facets?tags=Intel&query=quiet").get_json()
+    assert facets["tag"] == [{"value": "intel", "count": 1}, {"value": "office", "count": 1}]
+
+    assert search(test_client, tags=["Intel"], sorting="oldest") == ["Office computers", "Intel servers"]
+    assert search(test_client, tags=["inte"]) == [], "Tags match whole"
+    page = test_client.post("/explore/page", json={"tags": ["office"]}).get_json()
+    assert page["total"] == 1 and page["facets"]["tag"] == [
+        {"value": "intel", "count": 1},
+        {"value": "office", "count": 1},
+    ]
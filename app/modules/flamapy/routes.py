@@ -10,7 +10,7 @@ from flask import jsonify, send_file
 from uvl.UVLCustomLexer import UVLCustomLexer
 from uvl.UVLPythonParser import UVLPythonParser
 
-from app.modules.componentes_check.check_comp import PCCompFileChecker
+from app.modules.componentes_check.services import CompCheckService
 from app.modules.flamapy import flamapy_bp
 from app.modules.hubfile.services import HubfileService
 
@@ -21,15 +21,12 @@ logger = logging.getLogger(__name__)
 def check_comp(file_id):
     try:
         hubfile = HubfileService().get_by_id(file_id)
-        with open(hubfile.get_path(), "r", encoding="utf-8") as f:
-            content = f.read()
+        _, errors = CompCheckService().check(hubfile)
 
-        checker = PCCompFileChecker(content)
-
-        if checker.is_valid():
+        if not errors:
             return jsonify({"message": "Valid Comp File"}), 200
         else:
-            return jsonify({"errors": checker.get_errors()}), 400
+            return jsonify({"errors": errors}), 400
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
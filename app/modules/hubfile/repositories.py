@@ -1,3 +1,6 @@
+from datetime import datetime, timezone
+
+from flask_login import current_user
 from sqlalchemy import func
 
 from app import db
@@ -34,6 +37,15 @@ class HubfileViewRecordRepository(BaseRepository):
         max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
         return max_id if max_id is not None else 0
 
+    def record_view(self, file_id: int, user_cookie: str) -> None:
+        self.create_buffered(
+            ("user_id", "file_id", "view_cookie"),
+            user_id=current_user.id if current_user.is_authenticated else None,
+            file_id=file_id,
+            view_date=datetime.now(timezone.utc),
+            view_cookie=user_cookie,
+        )
+
 
 class HubfileDownloadRecordRepository(BaseRepository):
     def __init__(self):
@@ -42,3 +54,12 @@ class HubfileDownloadRecordRepository(BaseRepository):
     def total_hubfile_downloads(self) -> int:
         max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
         return max_id if max_id is not None else 0
+
+    def record_download(self, file_id: int, user_cookie: str) -> None:
+        self.create_buffered(
+            ("user_id", "file_id", "download_cookie"),
+            user_id=current_user.id if current_user.is_authenticated else None,
+            file_id=file_id,
+            download_date=datetime.now(timezone.utc),
+            download_cookie=user_cookie,
+        )
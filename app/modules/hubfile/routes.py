@@ -1,14 +1,12 @@
 import os
 import uuid
-from datetime import datetime, timezone
 
-from flask import current_app, jsonify, make_response, request, send_from_directory
-from flask_login import current_user
+from flask import current_app, jsonify, make_response, request
 
-from app import db
 from app.modules.hubfile import hubfile_bp
-from app.modules.hubfile.models import HubfileDownloadRecord, HubfileViewRecord
-from app.modules.hubfile.services import HubfileDownloadRecordService, HubfileService
+from app.modules.hubfile.services import HubfileDownloadRecordService, HubfileService, HubfileViewRecordService
+from core.configuration.configuration import dataset_uploads_path, uploaded_file_path
+from core.delivery.file_delivery import send_protected_file
 
 
 @hubfile_bp.route("/file/download/<int:file_id>", methods=["GET"])
@@ -16,31 +14,28 @@ def download_file(file_id):
     file = HubfileService().get_or_404(file_id)
     filename = file.name
 
-    directory_path = f"uploads/user_{file.feature_model.data_set.user_id}/dataset_{file.feature_model.data_set_id}/"
-    parent_directory_path = os.path.dirname(current_app.root_path)
-    file_path = os.path.join(parent_directory_path, directory_path)
+    file_path = dataset_uploads_path(file.feature_model.data_set.user_id, file.feature_model.data_set_id)
 
     # Get the cookie from the request or generate a new one if it does not exist
     user_cookie = request.cookies.get("file_download_cookie")
     if not user_cookie:
         user_cookie = str(uuid.uuid4())
 
-    # Check if the download record already exists for this cookie
-    existing_record = HubfileDownloadRecord.query.filter_by(
-        user_id=current_user.id if current_user.is_authenticated else None, file_id=file_id, download_cookie=user_cookie
-    ).first()
-
-    if not existing_record:
-        # Record the download in your database
-        HubfileDownloadRecordService().create(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            file_id=file_id,
-            download_date=datetime.now(timezone.utc),
-            download_cookie=user_cookie,
-        )
+    # Record the download, skipped when the buffered records are written if this cookie already has one
+    HubfileDownloadRecordService().record_download(file_id, user_cookie)
 
     # Save the cookie to the user's browser
-    resp = make_response(send_from_directory(directory=file_path, path=filename, as_attachment=True))
+    resp = make_response(
+        send_protected_file(
+            file_path,
+            filename,
+            os.path.join(
+                current_app.config["X_ACCEL_UPLOADS_LOCATION"],
+                f"user_{file.feature_model.data_set.user_id}",
+                f"dataset_{file.feature_model.data_set_id}",
+            ),
+        )
+    )
     resp.set_cookie("file_download_cookie", user_cookie)
 
     return resp
@@ -51,9 +46,7 @@ def view_file(file_id):
     file = HubfileService().get_or_404(file_id)
     filename = file.name
 
-    directory_path = f"uploads/user_{file.feature_model.data_set.user_id}/dataset_{file.feature_model.data_set_id}/"
-    parent_directory_path = os.path.dirname(current_app.root_path)
-    file_path = os.path.join(parent_directory_path, directory_path, filename)
+    file_path = uploaded_file_path(file.feature_model.data_set.user_id, file.feature_model.data_set_id, filename)
 
     try:
         if os.path.exists(file_path):
@@ -64,23 +57,8 @@ def view_file(file_id):
             if not user_cookie:
                 user_cookie = str(uuid.uuid4())
 
-            # Check if the view record already exists for this cookie
-            existing_record = HubfileViewRecord.query.filter_by(
-                user_id=current_user.id if current_user.is_authenticated else None,
-                file_id=file_id,
-                view_cookie=user_cookie,
-            ).first()
-
-            if not existing_record:
-                # Register file view
-                new_view_record = HubfileViewRecord(
-                    user_id=current_user.id if current_user.is_authenticated else None,
-                    file_id=file_id,
-                    view_date=datetime.now(),
-                    view_cookie=user_cookie,
-                )
-                db.session.add(new_view_record)
-                db.session.commit()
+            # Register file view, skipped when the buffered records are written if this cookie already has one
+            HubfileViewRecordService().record_view(file_id, user_cookie)
 
             # Prepare response
             response = jsonify({"success": True, "content": content})
@@ -1,5 +1,3 @@
-import os
-
 from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
 from app.modules.hubfile.models import Hubfile
@@ -8,6 +6,8 @@ from app.modules.hubfile.repositories import (
     HubfileRepository,
     HubfileViewRecordRepository,
 )
+from app.modules.stats.services import StatsService
+from core.configuration.configuration import uploaded_file_path
 from core.services.BaseService import BaseService
 
 
@@ -16,6 +16,7 @@ class HubfileService(BaseService):
         super().__init__(HubfileRepository())
         self.hubfile_view_record_repository = HubfileViewRecordRepository()
         self.hubfile_download_record_repository = HubfileDownloadRecordRepository()
+        self.stats_service = StatsService()
 
     def get_owner_user_by_hubfile(self, hubfile: Hubfile) -> User:
         return self.repository.get_owner_user_by_hubfile(hubfile)
@@ -27,22 +28,26 @@ class HubfileService(BaseService):
 
         hubfile_user = self.get_owner_user_by_hubfile(hubfile)
         hubfile_dataset = self.get_dataset_by_hubfile(hubfile)
-        working_dir = os.getenv("WORKING_DIR")
-
-        path = os.path.join(
-            working_dir, "uploads", f"user_{hubfile_user.id}", f"dataset_{hubfile_dataset.id}", hubfile.name
-        )
-
-        return path
+        return uploaded_file_path(hubfile_user.id, hubfile_dataset.id, hubfile.name)
 
     def total_hubfile_views(self) -> int:
-        return self.hubfile_view_record_repository.total_hubfile_views()
+        return self.stats_service.totals("file")["views"]
 
     def total_hubfile_downloads(self) -> int:
-        hubfile_download_record_repository = HubfileDownloadRecordRepository()
-        return hubfile_download_record_repository.total_hubfile_downloads()
+        return self.stats_service.totals("file")["downloads"]
 
 
 class HubfileDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(HubfileDownloadRecordRepository())
+
+    def record_download(self, file_id: int, user_cookie: str) -> None:
+        self.repository.record_download(file_id, user_cookie)
+
+
+class HubfileViewRecordService(BaseService):
+    def __init__(self):
+        super().__init__(HubfileViewRecordRepository())
+
+    def record_view(self, file_id: int, user_cookie: str) -> None:
+        self.repository.record_view(file_id, user_cookie)
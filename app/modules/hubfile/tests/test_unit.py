@@ -1,5 +1,16 @@
+import os
+
 import pytest
 
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import DataSet, DSMetaData, PublicationType
+from app.modules.featuremodel.models import FeatureModel, FMMetaData
+from app.modules.hubfile.models import Hubfile, HubfileDownloadRecord
+from core.configuration.configuration import dataset_uploads_path
+
+COMP_CONTENT = "name: Test\nversion: 1.0\nauthor: Tester\n\nproperties:\n    id: cpu_01\n    type: processor\n"
+
 
 @pytest.fixture(scope="module")
 def test_client(test_client):
@@ -7,13 +18,64 @@ def test_client(test_client):
     Extends the test_client fixture to add additional specific data for module testing.
     """
     with test_client.application.app_context():
-        # Add HERE new elements to the database that you want to exist in the test context.
-        # DO NOT FORGET to use db.session.add(<element>) and db.session.commit() to save the data.
-        pass
+        user = User.query.filter_by(email="test@example.com").first()
+
+        ds_meta_data = DSMetaData(
+            title="Hubfile dataset",
+            description="Dataset used by the hubfile module tests",
+            publication_type=PublicationType.DATA_MANAGEMENT_PLAN,
+            dataset_doi="10.1234/hubfile",
+        )
+        db.session.add(ds_meta_data)
+        db.session.commit()
+
+        dataset = DataSet(user_id=user.id, ds_meta_data_id=ds_meta_data.id)
+        db.session.add(dataset)
+        db.session.commit()
+
+        fm_meta_data = FMMetaData(
+            comp_filename="file1.comp",
+            title="file1.comp",
+            description="Description for file1.comp",
+            publication_type=PublicationType.SOFTWARE_DOCUMENTATION,
+        )
+        db.session.add(fm_meta_data)
+        db.session.commit()
+
+        feature_model = FeatureModel(data_set_id=dataset.id, fm_meta_data_id=fm_meta_data.id)
+        db.session.add(feature_model)
+        db.session.commit()
+
+        hubfile = Hubfile(
+            name="file1.comp", checksum="checksum1", size=len(COMP_CONTENT), feature_model_id=feature_model.id
+        )
+        db.session.add(hubfile)
+        db.session.commit()
 
     yield test_client
 
 
+@pytest.fixture
+def hubfile(test_client):
+    """Writes the test file where the download route expects it and removes it afterwards."""
+    hubfile = Hubfile.query.first()
+    dataset = hubfile.feature_model.data_set
+
+    folder = dataset_uploads_path(dataset.user_id, dataset.id)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, hubfile.name)
+    with open(path, "w") as f:
+        f.write(COMP_CONTENT)
+
+    yield hubfile
+
+    os.remove(path)
+    try:
+        os.removedirs(folder)
+    except OSError:
+        pass
+
+
 def test_sample_assertion(test_client):
     """
     Sample test to verify that the test framework and environment are working correctly.
@@ -22,3 +84,32 @@ def test_sample_assertion(test_client):
     """
     greeting = "Hello, World!"
     assert greeting == "Hello, World!", "The greeting does not coincide with 'Hello, World!'"
+
+
+def test_download_file_is_sent_by_flask(test_client, hubfile):
+    response = test_client.get(f"/file/download/{hubfile.id}")
+
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == COMP_CONTENT
+    assert "X-Accel-Redirect" not in response.headers
+
+
+def test_download_file_is_handed_over_to_nginx(test_client, hubfile, monkeypatch):
+    monkeypatch.setitem(test_client.application.config, "FILE_DELIVERY", "nginx")
+    dataset = hubfile.feature_model.data_set
+
+    response = test_client.get(f"/file/download/{hubfile.id}")
+
+    assert response.status_code == 200
+    assert response.get_data() == b""
+    assert response.headers["X-Accel-Redirect"] == (
+        f"/_protected/uploads/user_{dataset.user_id}/dataset_{dataset.id}/{hubfile.name}"
+    )
+    assert "file_download_cookie" in response.headers.get("Set-Cookie", "")
+
+
+def test_download_file_records_one_download_per_cookie(test_client, hubfile):
+    for _ in range(2):
+        test_client.get(f"/file/download/{hubfile.id}")
+
+    assert HubfileDownloadRecord.query.filter_by(file_id=hubfile.id).count() == 1
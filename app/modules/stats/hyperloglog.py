@@ -0,0 +1,88 @@
+import hashlib
+import math
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION  # 4096 one-byte registers: every sketch is a 4 KiB blob
+_HASH_BITS = 64
+_RANK_BITS = _HASH_BITS - PRECISION
+_ALPHA_INF = 1 / (2 * math.log(2))
+
+
+def _sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous, z = z, z + x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        y *= 0.5
+        previous, z = z, z - (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+class HyperLogLog:
+    """
+    Fixed-size sketch estimating the number of distinct values added to it (about 1.6% standard error).
+    Counts use the improved estimator of Ertl, "New cardinality estimation algorithms for HyperLogLog
+    sketches" (2017), which stays unbiased from small to large cardinalities without correction tables.
+
+    Merging two sketches gives the sketch of the union of their values, so daily sketches can be
+    combined into the unique count of any range without keeping the values themselves.
+    """
+
+    def __init__(self, registers: bytes = None):
+        if registers is not None and len(registers) != REGISTERS:
+            raise ValueError(f"A sketch has {REGISTERS} registers, got {len(registers)}")
+        self.registers = bytearray(registers) if registers is not None else bytearray(REGISTERS)
+
+    @classmethod
+    def from_values(cls, values) -> "HyperLogLog":
+        sketch = cls()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def add(self, value: str):
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        index = hashed >> _RANK_BITS
+        rank = _RANK_BITS - (hashed & ((1 << _RANK_BITS) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    @classmethod
+    def union(cls, sketches) -> "HyperLogLog":
+        """The sketch of the union of many sketches, merged in one pass over their registers."""
+        registers = [sketch.registers for sketch in sketches]
+        if len(registers) < 2:
+            return cls(registers[0] if registers else None)
+        return cls(bytes(map(max, *registers)))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        histogram = [0] * (_RANK_BITS + 2)
+        for rank in self.registers:
+            histogram[rank] += 1
+
+        z = REGISTERS * _tau(1 - histogram[_RANK_BITS + 1] / REGISTERS)
+        for rank in range(_RANK_BITS, 0, -1):
+            z = 0.5 * (z + histogram[rank])
+        z += REGISTERS * _sigma(histogram[0] / REGISTERS)
+        return round(_ALPHA_INF * REGISTERS * REGISTERS / z)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
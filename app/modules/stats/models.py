@@ -0,0 +1,26 @@
+from app import db
+
+
+class DailyStat(db.Model):
+    """Views and downloads of one dataset or file on one day (UTC), rolled up from the raw records."""
+
+    __tablename__ = "daily_stat"
+    __table_args__ = (db.UniqueConstraint("object_type", "object_id", "day", name="uq_daily_stat_object_day"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    object_type = db.Column(db.String(16), nullable=False)  # "dataset" or "file"
+    object_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    downloads = db.Column(db.Integer, nullable=False, default=0)
+    # HyperLogLog sketches of the cookies seen that day, merged to count the unique visitors of any range
+    view_visitors = db.Column(db.LargeBinary)
+    download_visitors = db.Column(db.LargeBinary)
+    # Estimates of the sketches above, stored when they change so that series do not decode a sketch per day
+    unique_views = db.Column(db.Integer, nullable=False, default=0)
+    unique_downloads = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            f"DailyStat<{self.object_type} {self.object_id} {self.day}: {self.views} views, {self.downloads} downloads>"
+        )
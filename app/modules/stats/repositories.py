@@ -0,0 +1,238 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import bindparam, func
+from sqlalchemy.exc import IntegrityError
+
+from app.modules.stats.hyperloglog import HyperLogLog
+from app.modules.stats.models import DailyStat
+from core.repositories.BaseRepository import BaseRepository
+
+
+def as_date(value) -> date:
+    # DATE() comes back as a string from SQLite and as a date from MariaDB
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+class DailyStatRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DailyStat)
+
+    def add(self, object_type: str, column: str, counts: dict) -> None:
+        """Adds counts ({(object_id, day): amount}) to the views or downloads of the rollups."""
+        self._upsert(object_type, column, counts, increment=True)
+
+    def replace(self, object_type: str, column: str, counts: dict) -> None:
+        """Overwrites the views or downloads of the rollups with counts ({(object_id, day): amount})."""
+        self._upsert(object_type, column, counts, increment=False)
+
+    def merge_sketches(self, object_type: str, column: str, estimate_column: str, sketches: dict) -> None:
+        """
+        Merges HyperLogLog sketches ({(object_id, day): sketch}) into view_visitors or download_visitors, and
+        stores the estimate of every merged sketch in estimate_column.
+        """
+        if not sketches:
+            return
+
+        stored_column = getattr(DailyStat, column)
+        stored = {
+            (object_id, as_date(day)): blob
+            for object_id, day, blob in self._query_keys(object_type, sketches, stored_column).with_for_update()
+        }
+        conflicts = self._insert(
+            object_type,
+            {
+                key: {column: sketch.to_bytes(), estimate_column: sketch.count()}
+                for key, sketch in sketches.items()
+                if key not in stored
+            },
+        )
+        if conflicts:
+            stored.update(
+                ((object_id, as_date(day)), blob)
+                for object_id, day, blob in self._query_keys(object_type, conflicts, stored_column).with_for_update()
+            )
+
+        updates = []
+        for key, sketch in sketches.items():
+            if key not in stored:
+                continue
+            merged = HyperLogLog(stored[key]).merge(sketch) if stored[key] else sketch
+            updates.append(
+                {"b_object_id": key[0], "b_day": key[1], "b_value": merged.to_bytes(), "b_estimate": merged.count()}
+            )
+        self._update(object_type, updates, {column: bindparam("b_value"), estimate_column: bindparam("b_estimate")})
+
+    def _upsert(self, object_type, column, counts, increment):
+        if not counts:
+            return
+
+        existing = {(object_id, as_date(day)) for object_id, day in self._query_keys(object_type, counts)}
+        updates = [key for key in counts if key in existing]
+        updates += self._insert(object_type, {key: {column: counts[key]} for key in counts if key not in existing})
+
+        value = bindparam("b_value")
+        self._update(
+            object_type,
+            [
+                {"b_object_id": object_id, "b_day": day, "b_value": counts[(object_id, day)]}
+                for object_id, day in updates
+            ],
+            {column: DailyStat.__table__.c[column] + value if increment else value},
+        )
+
+    def _query_keys(self, object_type, keys, *columns):
+        # Superset of the rows of keys, (object_id, day) pairs, in one query
+        return self.session.query(DailyStat.object_id, DailyStat.day, *columns).filter(
+            DailyStat.object_type == object_type,
+            DailyStat.object_id.in_(list({object_id for object_id, _ in keys})),
+            DailyStat.day.in_(list({day for _, day in keys})),
+        )
+
+    def _insert(self, object_type, values: dict) -> list:
+        """Inserts rollups ({(object_id, day): {column: value}}); returns the keys another worker inserted first."""
+        rows = [
+            {"object_type": object_type, "object_id": object_id, "day": day}
+            | {"views": 0, "downloads": 0, "unique_views": 0, "unique_downloads": 0}
+            | columns
+            for (object_id, day), columns in values.items()
+        ]
+        if not rows:
+            return []
+
+        table = DailyStat.__table__
+        try:
+            with self.session.begin_nested():
+                self.session.execute(table.insert(), rows)
+            return []
+        except IntegrityError:
+            pass
+
+        conflicts = []
+        for row in rows:
+            try:
+                with self.session.begin_nested():
+                    self.session.execute(table.insert(), row)
+            except IntegrityError:
+                conflicts.append((row["object_id"], row["day"]))
+        return conflicts
+
+    def _update(self, object_type, parameters: list, values: dict):
+        if not parameters:
+            return
+        table = DailyStat.__table__
+        self.session.execute(
+            table.update()
+            .where(
+                table.c.object_type == object_type,
+                table.c.object_id == bindparam("b_object_id"),
+                table.c.day == bindparam("b_day"),
+            )
+            .values(values),
+            parameters,
+        )
+
+    def series(self, object_type: str, object_id: int, start: date, end: date):
+        return (
+            self.model.query.filter(
+                DailyStat.object_type == object_type,
+                DailyStat.object_id == object_id,
+                DailyStat.day >= start,
+                DailyStat.day <= end,
+            )
+            .order_by(DailyStat.day)
+            .all()
+        )
+
+    def totals(self, object_type: str) -> tuple:
+        views, downloads = (
+            self.session.query(
+                func.coalesce(func.sum(DailyStat.views), 0), func.coalesce(func.sum(DailyStat.downloads), 0)
+            )
+            .filter(DailyStat.object_type == object_type)
+            .one()
+        )
+        return int(views), int(downloads)
+
+    def count_raw(self, record_model, id_column: str, date_column: str, start: date = None, end: date = None) -> dict:
+        """Counts the raw records per (object_id, day), optionally between two days (both included)."""
+        object_id = getattr(record_model, id_column)
+        created = getattr(record_model, date_column)
+        day = func.date(created)
+
+        query = self.session.query(object_id, day, func.count()).filter(object_id.isnot(None), created.isnot(None))
+        if start is not None:
+            query = query.filter(created >= datetime.combine(start, datetime.min.time()))
+        if end is not None:
+            query = query.filter(created < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        return {(row_id, as_date(row_day)): amount for row_id, row_day, amount in query.group_by(object_id, day)}
+
+    def raw_cookies(self, record_model, id_column, date_column, cookie_column, start=None, end=None) -> dict:
+        """Groups the cookies of the raw records per (object_id, day), optionally between two days."""
+        object_id = getattr(record_model, id_column)
+        created = getattr(record_model, date_column)
+        cookie = getattr(record_model, cookie_column)
+
+        query = self.session.query(object_id, created, cookie).filter(
+            object_id.isnot(None), created.isnot(None), cookie.isnot(None)
+        )
+        if start is not None:
+            query = query.filter(created >= datetime.combine(start, datetime.min.time()))
+        if end is not None:
+            query = query.filter(created < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+
+        cookies = {}
+        for row_id, row_created, row_cookie in query.yield_per(1000):
+            cookies.setdefault((row_id, as_date(row_created)), []).append(row_cookie)
+        return cookies
+
+    def delete_raw_before(self, record_model, date_column: str, before: date) -> int:
+        created = getattr(record_model, date_column)
+        return (
+            self.session.query(record_model)
+            .filter(created < datetime.combine(before, datetime.min.time()))
+            .delete(synchronize_session=False)
+        )
+
+    def event_counts(self, record_model, object_type, id_column, date_column, column, object_ids) -> dict:
+        """
+        Total events per object when raw records older than the retention period may have been pruned:
+        the rollups of the days before the first remaining raw record plus the remaining raw records.
+        """
+        daily = self.daily_event_counts(record_model, object_type, id_column, date_column, column, object_ids)
+        return {row_id: sum(days.values()) for row_id, days in daily.items()}
+
+    def daily_event_counts(
+        self, record_model, object_type, id_column, date_column, column, object_ids, since: date = None
+    ) -> dict:
+        """Events per object and day ({object_id: {day: amount}}), from the same sources as event_counts."""
+        object_id = getattr(record_model, id_column)
+        created = getattr(record_model, date_column)
+        first_raw = {
+            row_id: as_date(first) if first is not None else date.min
+            for row_id, first in self.session.query(object_id, func.min(created))
+            .filter(object_id.in_(object_ids))
+            .group_by(object_id)
+        }
+
+        day = func.date(created)
+        raw = self.session.query(object_id, day, func.count()).filter(object_id.in_(object_ids), created.isnot(None))
+        rolled_up = self.session.query(DailyStat.object_id, DailyStat.day, getattr(DailyStat, column)).filter(
+            DailyStat.object_type == object_type, DailyStat.object_id.in_(object_ids)
+        )
+        if since is not None:
+            raw = raw.filter(created >= datetime.combine(since, datetime.min.time()))
+            rolled_up = rolled_up.filter(DailyStat.day >= since)
+
+        counts = {}
+        for row_id, row_day, amount in raw.group_by(object_id, day):
+            counts.setdefault(row_id, {})[as_date(row_day)] = amount
+        for row_id, row_day, amount in rolled_up:
+            row_day = as_date(row_day)
+            if amount and (row_id not in first_raw or row_day < first_raw[row_id]):
+                days = counts.setdefault(row_id, {})
+                days[row_day] = days.get(row_day, 0) + amount
+        return counts
@@ -0,0 +1,32 @@
+from flask import jsonify, request
+
+from app.modules.dataset.services import DataSetService
+from app.modules.hubfile.services import HubfileService
+from app.modules.stats import stats_bp
+from app.modules.stats.services import StatsService
+
+stats_service = StatsService()
+
+
+@stats_bp.route("/api/v1/datasets/<int:dataset_id>/stats", methods=["GET"])
+def dataset_stats(dataset_id):
+    DataSetService().get_or_404(dataset_id)
+
+    try:
+        start, end = stats_service.parse_range(request.args.get("from"), request.args.get("to"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return jsonify({"dataset_id": dataset_id, **stats_service.series("dataset", dataset_id, start, end)})
+
+
+@stats_bp.route("/api/v1/files/<int:file_id>/stats", methods=["GET"])
+def file_stats(file_id):
+    HubfileService().get_or_404(file_id)
+
+    try:
+        start, end = stats_service.parse_range(request.args.get("from"), request.args.get("to"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return jsonify({"file_id": file_id, **stats_service.series("file", file_id, start, end)})
@@ -0,0 +1,171 @@
+from collections import Counter, namedtuple
+from datetime import date, datetime, timedelta, timezone
+
+from app import record_buffer
+from app.modules.dataset.models import DSDownloadRecord, DSViewRecord
+from app.modules.hubfile.models import HubfileDownloadRecord, HubfileViewRecord
+from app.modules.stats.hyperloglog import HyperLogLog
+from app.modules.stats.repositories import DailyStatRepository, as_date
+from core.services.BaseService import BaseService
+
+# Raw record tables rolled up into daily_stat: model, object type, object, date and cookie columns,
+# and the counter, visitors sketch and unique visitors estimate they feed
+RollupSource = namedtuple(
+    "RollupSource",
+    ["model", "object_type", "id_column", "date_column", "cookie_column", "counter", "sketch", "estimate"],
+)
+
+ROLLUP_SOURCES = [
+    RollupSource(
+        DSViewRecord, "dataset", "dataset_id", "view_date", "view_cookie", "views", "view_visitors", "unique_views"
+    ),
+    RollupSource(
+        DSDownloadRecord,
+        "dataset",
+        "dataset_id",
+        "download_date",
+        "download_cookie",
+        "downloads",
+        "download_visitors",
+        "unique_downloads",
+    ),
+    RollupSource(
+        HubfileViewRecord, "file", "file_id", "view_date", "view_cookie", "views", "view_visitors", "unique_views"
+    ),
+    RollupSource(
+        HubfileDownloadRecord,
+        "file",
+        "file_id",
+        "download_date",
+        "download_cookie",
+        "downloads",
+        "download_visitors",
+        "unique_downloads",
+    ),
+]
+
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+
+
+class StatsService(BaseService):
+    def __init__(self):
+        super().__init__(DailyStatRepository())
+
+    def on_records(self, source: RollupSource, rows):
+        counts = Counter(
+            (row[source.id_column], as_date(row[source.date_column]))
+            for row in rows
+            if row.get(source.id_column) is not None and row.get(source.date_column) is not None
+        )
+        self.repository.add(source.object_type, source.counter, counts)
+
+    def on_visitors(self, source: RollupSource, rows):
+        """Adds the cookies of every pushed record, repeated ones included, to the sketches of their day."""
+        cookies = {}
+        for row in rows:
+            if None not in (row.get(source.id_column), row.get(source.date_column), row.get(source.cookie_column)):
+                key = (row[source.id_column], as_date(row[source.date_column]))
+                cookies.setdefault(key, []).append(row[source.cookie_column])
+
+        sketches = {key: HyperLogLog.from_values(values) for key, values in cookies.items()}
+        self.repository.merge_sketches(source.object_type, source.sketch, source.estimate, sketches)
+
+    def rollup(self, start: date = None, end: date = None) -> int:
+        """
+        Recomputes the counters of the days that still have raw records, optionally between two days, and
+        merges their cookies into the sketches (merging is idempotent, so nothing is ever counted twice).
+        """
+        rolled_up = 0
+        for source in ROLLUP_SOURCES:
+            counts = self.repository.count_raw(source.model, source.id_column, source.date_column, start, end)
+            self.repository.replace(source.object_type, source.counter, counts)
+            rolled_up += len(counts)
+
+            cookies = self.repository.raw_cookies(
+                source.model, source.id_column, source.date_column, source.cookie_column, start, end
+            )
+            sketches = {key: HyperLogLog.from_values(values) for key, values in cookies.items()}
+            self.repository.merge_sketches(source.object_type, source.sketch, source.estimate, sketches)
+        self.repository.session.commit()
+        return rolled_up
+
+    def prune(self, retention_days: int) -> int:
+        """Deletes the raw records of the days older than retention_days; their counts stay in the rollups."""
+        before = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+        deleted = 0
+        for source in ROLLUP_SOURCES:
+            deleted += self.repository.delete_raw_before(source.model, source.date_column, before)
+        self.repository.session.commit()
+        return deleted
+
+    def event_counts(self, record_model, object_ids) -> dict:
+        source = next(source for source in ROLLUP_SOURCES if source.model is record_model)
+        return self.repository.event_counts(
+            source.model, source.object_type, source.id_column, source.date_column, source.counter, list(object_ids)
+        )
+
+    def totals(self, object_type: str) -> dict:
+        views, downloads = self.repository.totals(object_type)
+        return {"views": views, "downloads": downloads}
+
+    def parse_range(self, start: str = None, end: str = None) -> tuple:
+        """Parses the from/to query arguments (YYYY-MM-DD); the default range is the last 30 days."""
+        try:
+            end_day = date.fromisoformat(end) if end else datetime.now(timezone.utc).date()
+            start_day = date.fromisoformat(start) if start else end_day - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+        except ValueError:
+            raise ValueError("Dates must use the YYYY-MM-DD format")
+
+        if start_day > end_day:
+            raise ValueError("'from' must not be after 'to'")
+        if (end_day - start_day).days >= MAX_RANGE_DAYS:
+            raise ValueError(f"The range cannot be longer than {MAX_RANGE_DAYS} days")
+        return start_day, end_day
+
+    def series(self, object_type: str, object_id: int, start: date, end: date) -> dict:
+        """
+        Daily views and downloads between two days (both included), with the days without events as zeros.
+        Unique views and downloads are approximate, and the ones of the range are not the sum of the days:
+        the daily ones are the estimates stored at rollup time, and only the range totals merge the sketches.
+        """
+        stats = self.repository.series(object_type, object_id, start, end)
+        by_day = {as_date(stat.day): stat for stat in stats}
+
+        def unique(sketch):
+            return HyperLogLog.union(HyperLogLog(getattr(stat, sketch)) for stat in stats if getattr(stat, sketch))
+
+        days = []
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            stat = by_day.get(day)
+            days.append(
+                {
+                    "date": day.isoformat(),
+                    "views": stat.views if stat else 0,
+                    "downloads": stat.downloads if stat else 0,
+                    "unique_views": stat.unique_views if stat else 0,
+                    "unique_downloads": stat.unique_downloads if stat else 0,
+                }
+            )
+
+        return {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "views": sum(day["views"] for day in days),
+            "downloads": sum(day["downloads"] for day in days),
+            "unique_views": unique("view_visitors").count(),
+            "unique_downloads": unique("download_visitors").count(),
+            "days": days,
+        }
+
+
+def _subscribe(source: RollupSource):
+    record_buffer.subscribe(source.model, lambda rows: StatsService().on_records(source, rows))
+    record_buffer.subscribe(source.model, lambda rows: StatsService().on_visitors(source, rows), duplicates=True)
+
+
+# Buffered records are added to the rollups in the same transaction that inserts them. The sketches see
+# every pushed record, as a cookie already recorded on a previous day is still a visitor of today
+for rollup_source in ROLLUP_SOURCES:
+    _subscribe(rollup_source)
@@ -0,0 +1,174 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app import db, record_buffer
+from app.modules.auth.models import User
+from app.modules.dataset.models import DataSet, DSDownloadRecord, DSMetaData, DSViewRecord, PublicationType
+from app.modules.dataset.services import DSAggregateService
+from app.modules.stats.hyperloglog import REGISTERS, HyperLogLog
+from app.modules.stats.models import DailyStat
+from app.modules.stats.services import StatsService
+
+DOWNLOAD_KEY = ("user_id", "dataset_id", "download_cookie")
+
+
+@pytest.fixture(scope="module")
+def test_client(test_client):
+    """
+    Extends the test_client fixture to add additional specific data for module testing.
+    """
+    with test_client.application.app_context():
+        user = User.query.filter_by(email="test@example.com").first()
+
+        ds_meta_data = DSMetaData(
+            title="Stats dataset",
+            description="Dataset used by the stats module tests",
+            publication_type=PublicationType.DATA_MANAGEMENT_PLAN,
+            dataset_doi="10.1234/stats",
+        )
+        db.session.add(ds_meta_data)
+        db.session.commit()
+
+        dataset = DataSet(user_id=user.id, ds_meta_data_id=ds_meta_data.id)
+        db.session.add(dataset)
+        db.session.commit()
+
+    yield test_client
+
+
+def days_ago(days: int) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def test_buffered_records_are_rolled_up(test_client):
+    dataset = DataSet.query.first()
+    today = datetime.now(timezone.utc).date()
+
+    for cookie in ("a", "b", "a"):
+        record_buffer.push(
+            DSDownloadRecord, DOWNLOAD_KEY, dataset_id=dataset.id, download_date=days_ago(0), download_cookie=cookie
+        )
+
+    stat = DailyStat.query.filter_by(object_type="dataset", object_id=dataset.id, day=today).one()
+    assert stat.downloads == 2, "Only the records actually inserted are rolled up"
+    assert stat.views == 0
+
+
+def test_dataset_stats_endpoint(test_client):
+    dataset = DataSet.query.first()
+    today = datetime.now(timezone.utc).date()
+    record_buffer.push(
+        DSViewRecord,
+        ("user_id", "dataset_id", "view_cookie"),
+        dataset_id=dataset.id,
+        view_date=days_ago(2),
+        view_cookie="old-view",
+    )
+
+    start = (today - timedelta(days=3)).isoformat()
+    response = test_client.get(f"/api/v1/datasets/{dataset.id}/stats?from={start}&to={today.isoformat()}")
+
+    assert response.status_code == 200
+    stats = response.get_json()
+    assert [day["date"] for day in stats["days"]][0] == start
+    assert len(stats["days"]) == 4
+    assert stats["days"][1]["views"] == 1
+    assert stats["days"][3]["downloads"] == 2
+    assert (stats["views"], stats["downloads"]) == (1, 2)
+    assert stats["days"][1]["unique_views"] == 1
+    assert stats["unique_downloads"] == 2
+
+    response = test_client.get(f"/api/v1/datasets/{dataset.id}/stats")
+    assert len(response.get_json()["days"]) == 30
+
+
+@pytest.mark.parametrize(
+    "query", ["from=yesterday", "from=2024-02-10&to=2024-02-01", "from=2000-01-01&to=2024-01-01", "from=2023-01-01"]
+)
+def test_dataset_stats_rejects_invalid_ranges(test_client, query):
+    dataset = DataSet.query.first()
+    response = test_client.get(f"/api/v1/datasets/{dataset.id}/stats?{query}")
+    assert response.status_code == 400
+    assert response.get_json()["message"]
+
+
+def test_dataset_stats_unknown_dataset(test_client):
+    assert test_client.get("/api/v1/datasets/999/stats").status_code == 404
+
+
+def test_rollup_rebuilds_days_from_raw_records(test_client):
+    dataset = DataSet.query.first()
+    day = date.today() - timedelta(days=10)
+    for cookie in ("x", "y", "z"):
+        db.session.add(
+            DSDownloadRecord(
+                dataset_id=dataset.id, download_date=datetime.combine(day, datetime.min.time()), download_cookie=cookie
+            )
+        )
+    db.session.commit()
+
+    assert DailyStat.query.filter_by(object_id=dataset.id, day=day).first() is None
+    StatsService().rollup(start=day, end=day)
+    stat = DailyStat.query.filter_by(object_type="dataset", object_id=dataset.id, day=day).one()
+    assert (stat.downloads, stat.unique_downloads) == (3, 3)
+
+    StatsService().rollup()
+    assert DailyStat.query.filter_by(object_type="dataset", object_id=dataset.id, day=day).one().downloads == 3
+
+
+def test_prune_keeps_the_counts(test_client):
+    dataset = DataSet.query.first()
+    service = StatsService()
+    totals = service.totals("dataset")
+    DSAggregateService().rebuild([dataset.id])
+    downloads = dataset.get_download_count()
+
+    deleted = service.prune(retention_days=5)
+
+    assert deleted == 3
+    assert DSDownloadRecord.query.filter(DSDownloadRecord.download_date < days_ago(5)).count() == 0
+    assert service.totals("dataset") == totals
+
+    DSAggregateService().rebuild([dataset.id])
+    db.session.refresh(dataset)
+    assert dataset.get_download_count() == downloads, "Rebuilt aggregates must count the pruned events"
+
+
+def test_hyperloglog_estimates_and_merges():
+    first = HyperLogLog.from_values(f"cookie-{i}" for i in range(5000))
+    second = HyperLogLog.from_values(f"cookie-{i}" for i in range(2500, 7500))
+
+    assert HyperLogLog().count() == 0
+    assert HyperLogLog.from_values(["a", "b", "a"]).count() == 2
+    assert abs(first.count() - 5000) < 5000 * 0.05
+
+    blob = first.to_bytes()
+    assert len(blob) == REGISTERS
+    assert abs(HyperLogLog(blob).merge(second).count() - 7500) < 7500 * 0.05
+    assert HyperLogLog(blob).count() == first.count(), "Merging must not modify the merged sketch"
+
+    third = HyperLogLog.from_values(f"cookie-{i}" for i in range(7000, 9000))
+    assert HyperLogLog.union([first, second, third]).registers == HyperLogLog(blob).merge(second).merge(third).registers
+    assert HyperLogLog.union([first]).count() == first.count()
+    assert HyperLogLog.union([]).count() == 0
+
+
+def test_unique_views_count_returning_visitors(test_client):
+    dataset = DataSet.query.first()
+    today = datetime.now(timezone.utc).date()
+    view_key = ("user_id", "dataset_id", "view_cookie")
+
+    for cookie, days in (("visitor-1", 1), ("visitor-1", 0), ("visitor-2", 0), ("visitor-1", 0)):
+        record_buffer.push(DSViewRecord, view_key, dataset_id=dataset.id, view_date=days_ago(days), view_cookie=cookie)
+
+    yesterday = (today - timedelta(days=1)).isoformat()
+    stats = test_client.get(f"/api/v1/datasets/{dataset.id}/stats?from={yesterday}").get_json()
+
+    assert stats["views"] == 2, "Raw records still count one view per cookie"
+    assert [day["unique_views"] for day in stats["days"]] == [1, 2], "A returning visitor is a visitor of today"
+    assert stats["unique_views"] == 2
+
+    stat = DailyStat.query.filter_by(object_type="dataset", object_id=dataset.id, day=today).one()
+    db.session.refresh(stat)
+    assert stat.unique_views == 2, "The daily estimate is stored with the sketch"
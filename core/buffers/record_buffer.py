@@ -0,0 +1,178 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from flask import current_app
+from sqlalchemy import and_, insert, or_, select
+
+logger = logging.getLogger(__name__)
+
+
+class RecordBuffer:
+    """
+    Write-behind buffer for append-only event rows (views, downloads).
+
+    Requests push rows onto a bounded in-process queue and return straight away. A background
+    thread drains the queue and writes each batch with one multi-row INSERT per table, skipping the
+    rows that repeat the values of their unique_on columns, either within the batch or in the table.
+    Pending rows are written when the process exits. With RECORD_BUFFER_ASYNC disabled (testing)
+    every push is written synchronously. Either way rows are written with a session of their own, never
+    in the transaction of the request that pushed them.
+
+    Subscribers of a model are called with the rows actually inserted, inside the same transaction,
+    which lets counters derived from the records be kept up to date without scanning them. Subscribers
+    registered with duplicates=True get every pushed row instead, including the skipped ones.
+    """
+
+    def __init__(self, db, app=None):
+        self.db = db
+        self.subscribers = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        state = _BufferState(self.db, app, self.subscribers)
+        app.extensions["record_buffer"] = state
+        atexit.register(state.close)
+
+    def push(self, model, unique_on: tuple, **values):
+        self._state().push((model, tuple(unique_on), values))
+
+    def subscribe(self, model, callback, duplicates: bool = False):
+        self.subscribers.setdefault(model, []).append((callback, duplicates))
+
+    def flush(self):
+        """Writes every pending row of the current app before returning."""
+        self._state().flush()
+
+    def _state(self) -> "_BufferState":
+        return current_app.extensions["record_buffer"]
+
+
+class _BufferState:
+    def __init__(self, db, app, subscribers):
+        self.db = db
+        self.app = app
+        self.subscribers = subscribers
+        self.asynchronous = app.config["RECORD_BUFFER_ASYNC"]
+        self.max_size = app.config["RECORD_BUFFER_MAX_SIZE"]
+        self.batch_size = app.config["RECORD_BUFFER_BATCH_SIZE"]
+        self.interval = app.config["RECORD_BUFFER_FLUSH_INTERVAL"]
+
+        self.queue = queue.Queue(maxsize=self.max_size)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.dropped = 0
+
+    def push(self, item):
+        if not self.asynchronous:
+            # In an app context of its own, and so its own session, like the flusher: buffering never commits
+            # or rolls back what the caller has pending
+            with self.app.app_context():
+                self.write([item])
+            return
+
+        self._ensure_flusher()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Never make a request wait for the database: losing a few counts is the lesser evil
+            self.dropped += 1
+            logger.warning(f"Record buffer full, {self.dropped} records dropped so far")
+
+    def flush(self):
+        while True:
+            batch = self._take(timeout=None)
+            if not batch:
+                break
+            self._write_in_context(batch)
+
+    def close(self):
+        if self.thread is not None and self.pid == os.getpid():
+            self.stop_event.set()
+            self.thread.join(timeout=self.interval + 5)
+        self.flush()
+
+    def _ensure_flusher(self):
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+
+        with self.lock:
+            if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+                return
+            if self.pid != os.getpid():
+                # Threads do not survive a fork, so each worker process gets its own queue and flusher
+                self.queue = queue.Queue(maxsize=self.max_size)
+                self.pid = os.getpid()
+            self.stop_event = threading.Event()
+            self.thread = threading.Thread(target=self._run, name="record-buffer", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            batch = self._take(timeout=self.interval)
+            if batch:
+                self._write_in_context(batch)
+
+    def _take(self, timeout):
+        """Waits up to timeout seconds for a row (None does not wait), then takes up to batch_size rows."""
+        try:
+            batch = [self.queue.get(block=timeout is not None, timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_in_context(self, batch):
+        with self.app.app_context():
+            try:
+                self.write(batch)
+            except Exception:
+                self.db.session.rollback()
+                logger.exception(f"Could not write {len(batch)} buffered records")
+
+    def write(self, batch):
+        groups = {}
+        pushed = {}
+        for model, unique_on, values in batch:
+            key = tuple(values.get(column) for column in unique_on)
+            groups.setdefault((model, unique_on), {}).setdefault(key, values)
+            pushed.setdefault((model, unique_on), []).append(values)
+
+        for (model, unique_on), rows in groups.items():
+            existing = self._existing_keys(model.__table__, unique_on, rows.keys())
+            new_rows = [values for key, values in rows.items() if key not in existing]
+            if new_rows:
+                self.db.session.execute(insert(model.__table__), new_rows)
+
+            for callback, duplicates in self.subscribers.get(model, []):
+                if duplicates:
+                    callback(pushed[(model, unique_on)])
+                elif new_rows:
+                    callback(new_rows)
+
+        self.db.session.commit()
+
+    def _existing_keys(self, table, unique_on, keys) -> set:
+        # Matching every column against the values of the batch returns a superset of the
+        # existing keys in one query; the exact match is done here, where NULL == NULL
+        conditions = []
+        for position, name in enumerate(unique_on):
+            column = table.c[name]
+            values = {key[position] for key in keys}
+            condition = column.in_(list(values - {None}))
+            if None in values:
+                condition = or_(condition, column.is_(None))
+            conditions.append(condition)
+
+        columns = [table.c[name] for name in unique_on]
+        return {tuple(row) for row in self.db.session.execute(select(*columns).where(and_(*conditions)))}
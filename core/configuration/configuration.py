@@ -9,6 +9,18 @@ def uploads_folder_name():
     return os.getenv("UPLOADS_DIR", "uploads")
 
 
+def working_dir_path(*parts):
+    return os.path.join(os.getenv("WORKING_DIR", ""), *parts)
+
+
+def dataset_uploads_path(user_id, dataset_id):
+    return working_dir_path("uploads", f"user_{user_id}", f"dataset_{dataset_id}")
+
+
+def uploaded_file_path(user_id, dataset_id, filename):
+    return os.path.join(dataset_uploads_path(user_id, dataset_id), filename)
+
+
 def get_app_version():
     version_file_path = os.path.join(os.getenv("WORKING_DIR", ""), ".version")
     try:
@@ -0,0 +1,42 @@
+import mimetypes
+from urllib.parse import quote
+
+from flask import Response, current_app, send_from_directory
+
+
+def nginx_delivery_enabled() -> bool:
+    return current_app.config.get("FILE_DELIVERY") == "nginx"
+
+
+def send_protected_file(
+    directory: str,
+    filename: str,
+    internal_location: str,
+    download_name: str = None,
+    mimetype: str = None,
+    etag: str = None,
+) -> Response:
+    """
+    Sends directory/filename as an attachment once the caller has authorised the download.
+
+    With FILE_DELIVERY=nginx the response is an empty X-Accel-Redirect to internal_location/filename
+    and nginx streams the file itself with sendfile (including Range requests), so no worker is kept
+    busy for the transfer. Otherwise the file is sent by Flask through wsgi.file_wrapper.
+    """
+    download_name = download_name or filename
+
+    if nginx_delivery_enabled():
+        resp = Response(mimetype=mimetype or mimetypes.guess_type(download_name)[0] or "application/octet-stream")
+        resp.headers["X-Accel-Redirect"] = f"{internal_location.rstrip('/')}/{quote(filename)}"
+        resp.headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(download_name)}"
+        return resp
+
+    return send_from_directory(
+        directory,
+        filename,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=mimetype,
+        conditional=True,
+        etag=etag if etag else True,
+    )
@@ -33,6 +33,52 @@ class Config:
     TIMEZONE = "Europe/Madrid"
     TEMPLATES_AUTO_RELOAD = True
     UPLOAD_FOLDER = "uploads"
+    ARCHIVE_CACHE_DIR = os.getenv("ARCHIVE_CACHE_DIR", "archive_cache")
+    ARCHIVE_CACHE_MAX_BYTES = int(os.getenv("ARCHIVE_CACHE_MAX_BYTES", 2 * 1024**3))
+    ARCHIVE_ZSTD_LEVEL = int(os.getenv("ARCHIVE_ZSTD_LEVEL", 10))
+    ARCHIVE_ZSTD_THREADS = int(os.getenv("ARCHIVE_ZSTD_THREADS", -1))  # -1 uses every available core
+    # "flask" sends files from the worker, "nginx" hands them over to nginx with X-Accel-Redirect
+    FILE_DELIVERY = os.getenv("FILE_DELIVERY", "flask")
+    X_ACCEL_UPLOADS_LOCATION = os.getenv("X_ACCEL_UPLOADS_LOCATION", "/_protected/uploads/")
+    X_ACCEL_ARCHIVES_LOCATION = os.getenv("X_ACCEL_ARCHIVES_LOCATION", "/_protected/archive_cache/")
+    # View and download records are queued and written in batches by a background thread
+    RECORD_BUFFER_ASYNC = os.getenv("RECORD_BUFFER_ASYNC", "true").lower() == "true"
+    RECORD_BUFFER_MAX_SIZE = int(os.getenv("RECORD_BUFFER_MAX_SIZE", 10000))
+    RECORD_BUFFER_BATCH_SIZE = int(os.getenv("RECORD_BUFFER_BATCH_SIZE", 500))
+    RECORD_BUFFER_FLUSH_INTERVAL = float(os.getenv("RECORD_BUFFER_FLUSH_INTERVAL", 1.0))
+    # Days of raw view/download records kept by stats:prune; older events only remain in the daily rollups
+    STATS_RAW_RETENTION_DAYS = int(os.getenv("STATS_RAW_RETENTION_DAYS", 180))
+    # Time for the weight of a download or view in the trending ranking to halve; existing scores only
+    # follow a new value after `rosemary dataset:aggregates`
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 72))
+    # Seconds after which the explore search index is rebuilt, to pick up changes committed by other workers
+    EXPLORE_INDEX_TTL = float(os.getenv("EXPLORE_INDEX_TTL", 300))
+    # Minimum trigram similarity (0-1) of a word to a query word in typo-tolerant explore searches
+    EXPLORE_FUZZY_THRESHOLD = float(os.getenv("EXPLORE_FUZZY_THRESHOLD", 0.3))
+    # Completions kept per prefix and returned at most by /explore/suggest
+    EXPLORE_SUGGEST_LIMIT = int(os.getenv("EXPLORE_SUGGEST_LIMIT", 10))
+    # Results per page of /explore/page by default, and at most
+    EXPLORE_PAGE_SIZE = int(os.getenv("EXPLORE_PAGE_SIZE", 20))
+    EXPLORE_MAX_PAGE_SIZE = int(os.getenv("EXPLORE_MAX_PAGE_SIZE", 100))
+    # Explore search results kept in memory per worker, for at most EXPLORE_CACHE_TTL seconds (commits of the
+    # worker clear them sooner), and the max-age of GET /explore/results for browsers and nginx
+    EXPLORE_CACHE_MAX_ENTRIES = int(os.getenv("EXPLORE_CACHE_MAX_ENTRIES", 1000))
+    EXPLORE_CACHE_TTL = float(os.getenv("EXPLORE_CACHE_TTL", 60))
+    EXPLORE_CACHE_MAX_AGE = int(os.getenv("EXPLORE_CACHE_MAX_AGE", 30))
+    # Values returned per facet (tags, publication types, component types) with explore results
+    EXPLORE_FACET_LIMIT = int(os.getenv("EXPLORE_FACET_LIMIT", 20))
+    # Components returned at most by /componentes_check/search
+    COMPONENT_SEARCH_LIMIT = int(os.getenv("COMPONENT_SEARCH_LIMIT", 50))
+    # Times the TDP of a processor or graphics card that a power supply must deliver to be compatible with it
+    COMPONENT_PSU_HEADROOM = float(os.getenv("COMPONENT_PSU_HEADROOM", 1.5))
+    # Similar components returned at most per component by /components/similar
+    COMPONENT_SIMILAR_LIMIT = int(os.getenv("COMPONENT_SIMILAR_LIMIT", 10))
+    # File under WORKING_DIR where the feature matrix of the similar components index is saved
+    COMPONENT_SIMILARITY_FILE = os.getenv("COMPONENT_SIMILARITY_FILE", "similarity/components.npz")
+    # Processes that validate the uncached files of a dataset check, and the total size from which they are used
+    # (smaller batches are validated in the request, where it is faster than handing them over)
+    COMP_CHECK_WORKERS = int(os.getenv("COMP_CHECK_WORKERS", os.cpu_count() or 1))
+    COMP_CHECK_POOL_MIN_BYTES = int(os.getenv("COMP_CHECK_POOL_MIN_BYTES", 1024 * 1024))
 
 
 class DevelopmentConfig(Config):
@@ -49,6 +95,7 @@ class TestingConfig(Config):
         f"{os.getenv('MARIADB_TEST_DATABASE', 'default_db')}"
     )
     WTF_CSRF_ENABLED = False
+    RECORD_BUFFER_ASYNC = False
 
 
 class ProductionConfig(Config):
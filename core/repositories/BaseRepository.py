@@ -19,6 +19,10 @@ class BaseRepository(Generic[T]):
             self.session.flush()
         return instance
 
+    def create_buffered(self, unique_on: tuple, **kwargs) -> None:
+        """Queues the row in the record buffer, which skips it if a row with the same unique_on values exists."""
+        app.record_buffer.push(self.model, unique_on, **kwargs)
+
     def get_by_id(self, id: int) -> Optional[T]:
         instance: Optional[T] = self.model.query.get(id)
         return instance
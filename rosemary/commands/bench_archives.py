@@ -0,0 +1,51 @@
+import os
+import time
+
+import click
+
+from app.modules.dataset.archives import stream_tar_zst, stream_zip
+
+
+def comp_examples_entries(copies):
+    examples_dir = os.path.join(os.getenv("WORKING_DIR", ""), "app", "modules", "dataset", "comp_examples")
+    files = sorted(f for f in os.listdir(examples_dir) if f.endswith(".comp"))
+    return [(os.path.join(examples_dir, f), os.path.join(f"copy_{i}", f)) for i in range(copies) for f in files]
+
+
+def measure(stream):
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+    for chunk in stream:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    return size, time.perf_counter() - start, first_byte or 0.0
+
+
+@click.command("bench:archives", help="Benchmarks the dataset download formats on the seeded comp_examples.")
+@click.option("--copies", default=500, show_default=True, help="Times the example files are repeated in the archive.")
+@click.option("--level", default=10, show_default=True, help="zstd compression level for tar.zst.")
+@click.option("--threads", default=-1, show_default=True, help="zstd worker threads (-1 uses every core).")
+def bench_archives(copies, level, threads):
+    entries = comp_examples_entries(copies)
+    input_size = sum(os.path.getsize(path) for path, _ in entries)
+
+    formats = {
+        "zip": lambda: stream_zip(entries),
+        "tar.zst": lambda: stream_tar_zst(entries, level=level, threads=threads),
+        "tar.zst (1 thread)": lambda: stream_tar_zst(entries, level=level, threads=0),
+    }
+
+    click.echo(click.style(f"{len(entries)} files, {input_size / 1024:.1f} KB of input", fg="blue"))
+    if copies > 1:
+        click.echo(click.style("Copies are identical, which favours the solid compression of tar.zst.", fg="yellow"))
+    click.echo(f"{'format':<20}{'size (KB)':>12}{'ratio':>8}{'time (s)':>10}{'MB/s':>9}{'TTFB (ms)':>11}")
+
+    for name, stream in formats.items():
+        size, elapsed, first_byte = measure(stream())
+        throughput = input_size / (1024**2) / elapsed if elapsed else 0.0
+        click.echo(
+            f"{name:<20}{size / 1024:>12.1f}{input_size / size:>8.2f}{elapsed:>10.3f}"
+            f"{throughput:>9.1f}{first_byte * 1000:>11.1f}"
+        )
@@ -0,0 +1,113 @@
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+
+import click
+
+from app.modules.componentes_check.check_comp import PCCompFileChecker
+
+
+def write_comp(path, lines, distinct_keys):
+    """Writes a valid .comp file with about lines properties, cycling through distinct_keys keys."""
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("name: bench\nversion: 1.0\nauthor: Bench\n\nproperties:\n")
+        file.write("    id: bench\n    type: processor\n    model: Intel Core i9\n    description: Synthetic file\n")
+        for i in range(lines):
+            file.write(f"    property_{i % distinct_keys}: value {i} with some text\n")
+
+
+class LegacyChecker(PCCompFileChecker):
+    """The checker with the two-pass parser that read .comp files before the streaming one."""
+
+    def _parse(self, lines):
+        lines = self.raw_text.strip().splitlines()
+        if not lines:
+            self.errors.append("El archivo está vacío.")
+            return
+
+        for line in lines:
+            stripped = line.strip()
+            if not stripped:
+                continue
+            match = re.match(r"^([a-zA-Z0-9_]+)\s*:\s*(.*)$", stripped)
+            if match:
+                key = match.group(1).lower()
+                if key in ("name", "version", "author"):
+                    self.parsed_data[key] = match.group(2).strip()
+                if key == "properties":
+                    break
+
+        try:
+            start_index = next(i for i, line in enumerate(lines) if line.strip().lower().startswith("properties:"))
+        except StopIteration:
+            self.errors.append("No se encontró la sección 'properties:'.")
+            return
+
+        for line in lines[start_index + 1 :]:
+            stripped = line.strip()
+            if not stripped:
+                continue
+            match = re.match(r"^([a-zA-Z0-9_]+)\s*:\s*(.*)$", stripped)
+            if match:
+                self.parsed_data["properties"][match.group(1).lower()] = match.group(2).strip()
+            else:
+                self.errors.append(f"Propiedad mal formada: '{stripped}'")
+
+
+def parse_legacy(path):
+    with open(path, encoding="utf-8") as file:
+        return LegacyChecker(file.read())
+
+
+def parse_text(path):
+    with open(path, encoding="utf-8") as file:
+        return PCCompFileChecker(file.read())
+
+
+def parse_stream(path):
+    with open(path, encoding="utf-8") as file:
+        return PCCompFileChecker(file)
+
+
+def measure(parse, path, repeat):
+    """Best time of repeat runs, and the peak memory traced in one more."""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        checker = parse(path)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    assert checker.is_valid(), checker.get_errors()[:3]
+
+    tracemalloc.start()
+    parse(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+@click.command(
+    "bench:comp",
+    help="Benchmarks the .comp parser on a large synthetic file, reading it whole (text) or line by line "
+    "(stream), against the previous two-pass parser (legacy).",
+)
+@click.option("--lines", default=1_000_000, show_default=True, help="Property lines of the synthetic file.")
+@click.option("--distinct-keys", default=1000, show_default=True, help="Different property keys in the file.")
+@click.option("--repeat", default=3, show_default=True, help="Runs of each mode; the best one is reported.")
+def bench_comp(lines, distinct_keys, repeat):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.comp")
+        write_comp(path, lines, distinct_keys)
+        size = os.path.getsize(path)
+        with open(path, encoding="utf-8") as file:
+            total_lines = sum(1 for _ in file)
+
+        click.echo(click.style(f"{total_lines} lines, {size / 1024**2:.1f} MB of input", fg="blue"))
+        click.echo(f"{'mode':<10}{'time (s)':>10}{'MB/s':>9}{'lines/s':>13}{'peak (MB)':>11}")
+        for mode, parse in (("legacy", parse_legacy), ("text", parse_text), ("stream", parse_stream)):
+            elapsed, peak = measure(parse, path, repeat)
+            click.echo(
+                f"{mode:<10}{elapsed:>10.3f}{size / 1024**2 / elapsed:>9.1f}"
+                f"{total_lines / elapsed:>13,.0f}{peak / 1024**2:>11.1f}"
+            )
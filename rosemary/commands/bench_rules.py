@@ -0,0 +1,101 @@
+import random
+import time
+
+import click
+
+from app.modules.componentes_check.check_comp import VALID_COMPONENT_TYPES, PCCompFileChecker
+
+MODELS = ("Intel Core i7", "AMD Ryzen 7", "NVIDIA RTX 4070", "Samsung 990 Pro NVMe", "WD Blue HDD", "Apple M1")
+EXTRA_PROPERTIES = {
+    "cores": ("8", "16", "auto"),
+    "threads": ("16", "32"),
+    "boost_clock": ("4.6GHz", "2491MHz"),
+    "tdp": ("65W", "125W", "15W (aprox.)"),
+    "capacity": ("16GB", "2TB"),
+    "memory_type": ("DDR4", "DDR5", "Unified Memory"),
+    "wattage": ("650W", "1200W"),
+}
+
+
+class LegacyChecker(PCCompFileChecker):
+    """The checker with the if-chain that validated component types before the rules were compiled from a file."""
+
+    def _validate(self):
+        for required_field in ("name", "version", "author"):
+            if not self.parsed_data[required_field]:
+                self.errors.append(f"Falta el campo obligatorio: '{required_field}'")
+
+        properties = self.parsed_data["properties"]
+        if not properties:
+            self.errors.append("La sección 'properties' está vacía.")
+            return
+
+        for prop in ("id", "type", "model", "description"):
+            if prop not in properties:
+                self.errors.append(f"Falta la propiedad obligatoria: '{prop}'")
+        if "type" not in properties:
+            return
+
+        comp_type = properties["type"].lower()
+        if comp_type not in VALID_COMPONENT_TYPES:
+            self.errors.append(f"Tipo de componente no válido: '{comp_type}'")
+
+        model_value = properties.get("model", "").lower()
+        if comp_type == "processor":
+            if not any(brand in model_value for brand in ("intel", "amd")):
+                self.errors.append(f"Processor inválido o marca desconocida en model: '{properties.get('model')}'")
+        if comp_type == "graphics":
+            if not any(brand in model_value for brand in ("nvidia", "amd", "intel")):
+                self.errors.append(f"Graphics inválido o marca desconocida en model: '{properties.get('model')}'")
+        if comp_type == "storage":
+            if not any(keyword in model_value for keyword in ("ssd", "hdd", "nvme")):
+                self.errors.append(f"Tipo de almacenamiento desconocido en model: '{properties.get('model')}'")
+
+
+def synthetic_files(count, seed):
+    """Texts of count small .comp files of random types, models and properties."""
+    generator = random.Random(seed)
+    types = sorted(VALID_COMPONENT_TYPES)
+    texts = []
+    for i in range(count):
+        lines = ["name: bench", "version: 1.0", "author: Bench", "properties:", f"    id: comp_{i}"]
+        lines.append(f"    type: {generator.choice(types)}")
+        lines.append(f"    model: {generator.choice(MODELS)}")
+        lines.append("    description: Synthetic component")
+        for name in generator.sample(sorted(EXTRA_PROPERTIES), 4):
+            lines.append(f"    {name}: {generator.choice(EXTRA_PROPERTIES[name])}")
+        texts.append("\n".join(lines))
+    return texts
+
+
+def measure(checker_class, texts, repeat):
+    """
+    Best time of repeat runs validating again checkers of checker_class built from texts, and the errors of the
+    last one. The checkers are parsed once, before timing.
+    """
+    checkers = [checker_class(text) for text in texts]
+    elapsed = float("inf")
+    errors = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        errors = 0
+        for checker in checkers:
+            checker.errors = []
+            checker._validate()
+            errors += len(checker.errors)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed, errors
+
+
+@click.command("bench:rules", help="Benchmarks the compiled validation rules against the legacy if-chain.")
+@click.option("--files", default=100_000, show_default=True, help="Synthetic .comp files to validate.")
+@click.option("--repeat", default=5, show_default=True, help="Runs of each validator; the best one is reported.")
+@click.option("--seed", default=0, show_default=True, help="Seed of the synthetic files.")
+def bench_rules(files, repeat, seed):
+    texts = synthetic_files(files, seed)
+
+    click.echo(click.style(f"{files} files, validation only (parsing is not timed)", fg="blue"))
+    click.echo(f"{'validator':<12}{'time (s)':>10}{'files/s':>13}{'us/file':>10}{'errors':>9}")
+    for name, checker_class in (("legacy", LegacyChecker), ("compiled", PCCompFileChecker)):
+        elapsed, errors = measure(checker_class, texts, repeat)
+        click.echo(f"{name:<12}{elapsed:>10.3f}{files / elapsed:>13,.0f}{elapsed / files * 1e6:>10.2f}{errors:>9}")
@@ -0,0 +1,19 @@
+import click
+from flask.cli import with_appcontext
+
+from app.modules.componentes_check.services import CompCheckService
+
+
+@click.command(
+    "comp:cache",
+    help="Validates the uploaded .comp files whose content is not in the validation cache yet, so that "
+    "their checks do not read or parse them.",
+)
+@click.argument("hubfile_ids", nargs=-1, type=int)
+@click.option("--batch-size", default=500, show_default=True, help="Results written at a time.")
+@with_appcontext
+def comp_cache(hubfile_ids, batch_size):
+    checked, missing = CompCheckService().warm_up(hubfile_ids or None, batch_size=batch_size)
+    click.echo(click.style(f"Validation results cached for {checked} file contents.", fg="green"))
+    if missing:
+        click.echo(click.style(f"{missing} files could not be read from uploads/ and were skipped.", fg="yellow"))
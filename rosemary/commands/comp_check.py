@@ -0,0 +1,129 @@
+import fnmatch
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+import click
+
+from app.modules.componentes_check.check_comp import check_files
+
+# Quoted details that are not a property name ('Foo Bar' in an invalid model) are left out of the histogram
+_DETAIL = re.compile(r"'(?![a-z0-9_]+')[^']*'")
+
+
+def comp_files(root, pattern):
+    """Paths of the files under root (or root itself) whose names match pattern, in walk order."""
+    if os.path.isfile(root):
+        yield root
+        return
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if fnmatch.fnmatch(filename, pattern):
+                yield os.path.join(directory, filename)
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def check_chunk(root, paths) -> list:
+    """
+    (status, errors, size, JSON line) of each path. The lines are encoded here, in the worker processes, so
+    that the main process only has to write them.
+    """
+    results = []
+    for path, (parsed_data, errors) in zip(paths, check_files(paths)):
+        status = "unreadable" if parsed_data is None else "invalid" if errors else "valid"
+        line = {
+            "path": os.path.relpath(path, root) if os.path.isdir(root) else path,
+            "valid": not errors,
+            "errors": errors,
+            "type": (parsed_data or {}).get("properties", {}).get("type"),
+        }
+        size = os.path.getsize(path) if parsed_data is not None else 0
+        results.append((status, errors, size, json.dumps(line, ensure_ascii=False)))
+    return results
+
+
+def check_tree(root, paths, jobs, chunk_size):
+    """
+    Results of check_chunk for each path, as the chunks are checked. With several jobs the chunks go to a pool
+    of processes, with at most two per process in flight so that results stream out while the tree is still
+    being walked.
+    """
+    if jobs == 1:
+        for chunk in chunks(paths, chunk_size):
+            yield from check_chunk(root, chunk)
+        return
+
+    with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("fork")) as executor:
+        pending = set()
+
+        def finished():
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                yield from future.result()
+
+        for chunk in chunks(paths, chunk_size):
+            pending.add(executor.submit(check_chunk, root, chunk))
+            if len(pending) >= 2 * jobs:
+                yield from finished()
+        while pending:
+            yield from finished()
+
+
+@click.command(
+    "comp:check",
+    help="Validates the .comp files under PATH in parallel. Prints one JSON line per file on stdout and a "
+    "summary on stderr, and exits with 1 if any file is invalid or cannot be read.",
+)
+@click.argument("path", type=click.Path(exists=True))
+@click.option("--jobs", "-j", default=os.cpu_count() or 1, show_default=True, help="Processes that check files.")
+@click.option("--pattern", default="*.comp", show_default=True, help="Names of the files to check.")
+@click.option("--chunk-size", default=64, show_default=True, help="Files handed to a process at a time.")
+@click.option("--only-failures", is_flag=True, help="Only print the results of invalid or unreadable files.")
+def comp_check(path, jobs, pattern, chunk_size, only_failures):
+    jobs = max(jobs, 1)
+    start = time.perf_counter()
+    counts = Counter()
+    error_kinds = Counter()
+    errors_per_file = Counter()
+    input_size = 0
+    # Lines are written without flushing each one, which click.echo would do
+    stdout = click.get_text_stream("stdout")
+    for status, errors, size, line in check_tree(path, comp_files(path, pattern), jobs, chunk_size):
+        counts[status] += 1
+        input_size += size
+        errors_per_file[min(len(errors), 5)] += 1
+        if errors:
+            error_kinds.update(_DETAIL.sub("'…'", error) for error in errors)
+        if errors or not only_failures:
+            stdout.write(line + "\n")
+    stdout.flush()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    total = sum(counts.values())
+    stderr = click.get_text_stream("stderr")
+    summary = (
+        f"{total} files: {counts['valid']} valid, {counts['invalid']} invalid, {counts['unreadable']} unreadable. "
+        f"{elapsed:.2f} s with {jobs} jobs, {total / elapsed:,.0f} files/s, {input_size / 1024**2 / elapsed:.1f} MB/s"
+    )
+    click.echo(click.style(summary, fg="green" if total == counts["valid"] else "yellow"), file=stderr)
+    if error_kinds:
+        click.echo("Errors per file:", file=stderr)
+        for count in sorted(errors_per_file):
+            click.echo(f"  {str(count) + ('+' if count == 5 else ''):>3}  {errors_per_file[count]:>8}", file=stderr)
+        click.echo("Most common errors:", file=stderr)
+        for error, count in error_kinds.most_common(10):
+            click.echo(f"  {count:>8}  {error}", file=stderr)
+    sys.exit(0 if total == counts["valid"] else 1)
@@ -0,0 +1,17 @@
+import click
+from flask.cli import with_appcontext
+
+from app.modules.componentes_check.services import ComponentPropertyService
+
+
+@click.command(
+    "comp:properties", help="Extracts the properties of the uploaded .comp files into the component property store."
+)
+@click.argument("hubfile_ids", nargs=-1, type=int)
+@click.option("--batch-size", default=500, show_default=True, help="Files committed at a time.")
+@with_appcontext
+def comp_properties(hubfile_ids, batch_size):
+    indexed, missing = ComponentPropertyService().backfill(hubfile_ids or None, batch_size=batch_size)
+    click.echo(click.style(f"Properties extracted from {indexed} files.", fg="green"))
+    if missing:
+        click.echo(click.style(f"{missing} files could not be read from uploads/ and were skipped.", fg="yellow"))
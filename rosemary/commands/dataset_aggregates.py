@@ -0,0 +1,16 @@
+import click
+from flask.cli import with_appcontext
+
+from app.modules.dataset.services import DSAggregateService
+
+
+@click.command(
+    "dataset:aggregates",
+    help="Rebuilds the per-dataset counters and trending scores from the records and files tables. Pass "
+    "DATASET_IDS to rebuild only those datasets.",
+)
+@click.argument("dataset_ids", nargs=-1, type=int)
+@with_appcontext
+def dataset_aggregates(dataset_ids):
+    rebuilt = DSAggregateService().rebuild(dataset_ids or None)
+    click.echo(click.style(f"Aggregates rebuilt for {rebuilt} datasets.", fg="green"))
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+
+import click
+import requests
+
+STATE_FILE = ".manifest.json"
+
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_state(destination):
+    try:
+        with open(os.path.join(destination, STATE_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(destination, manifest):
+    path = os.path.join(destination, STATE_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def is_up_to_date(path, entry, previous):
+    """A local file is kept if its md5 matches the manifest, or if it was synced with the same checksum before."""
+    if not os.path.isfile(path):
+        return False
+    if previous.get(entry["name"]) == entry["checksum"]:
+        return True
+    return file_md5(path) == entry["checksum"]
+
+
+def download(session, url, path, timeout):
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        with open(f"{path}.part", "wb") as f:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                f.write(chunk)
+    os.replace(f"{path}.part", path)
+
+
+@click.command("dataset:sync", help="Mirrors a dataset of a hub, downloading only the files that changed.")
+@click.argument("base_url")
+@click.argument("dataset_id", type=int)
+@click.argument("destination", type=click.Path(file_okay=False), required=False)
+@click.option("--prune", is_flag=True, help="Removes local files that are no longer in the dataset.")
+@click.option("--timeout", default=30, show_default=True, help="Timeout of each request, in seconds.")
+def dataset_sync(base_url, dataset_id, destination, prune, timeout):
+    destination = destination or f"dataset_{dataset_id}"
+    os.makedirs(destination, exist_ok=True)
+    state = load_state(destination)
+
+    session = requests.Session()
+    headers = {"If-None-Match": f'"{state["etag"]}"'} if state.get("etag") else {}
+    manifest_url = f"{base_url.rstrip('/')}/dataset/{dataset_id}/manifest.json"
+
+    try:
+        response = session.get(manifest_url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            click.echo(click.style(f"Dataset {dataset_id} is already up to date.", fg="green"))
+            return
+        response.raise_for_status()
+        manifest = response.json()
+    except (requests.RequestException, ValueError) as e:
+        raise click.ClickException(f"Could not fetch {manifest_url}: {e}")
+
+    previous = {entry["name"]: entry["checksum"] for entry in state.get("files", [])}
+    downloaded = skipped = 0
+
+    for entry in manifest["files"]:
+        # Never trust a remote name to build a local path
+        name = os.path.basename(entry["name"])
+        path = os.path.join(destination, name)
+
+        if is_up_to_date(path, entry, previous):
+            skipped += 1
+            continue
+
+        click.echo(f"Downloading {name} ({entry['size']} bytes)")
+        try:
+            download(session, entry["url"], path, timeout)
+        except requests.RequestException as e:
+            raise click.ClickException(f"Could not download {name}: {e}")
+        downloaded += 1
+
+    removed = 0
+    if prune:
+        current = {os.path.basename(entry["name"]) for entry in manifest["files"]}
+        for name in set(previous) - current:
+            path = os.path.join(destination, os.path.basename(name))
+            if os.path.isfile(path):
+                os.remove(path)
+                removed += 1
+
+    save_state(destination, manifest)
+    click.echo(
+        click.style(
+            f"Dataset {dataset_id} synced into {destination}: "
+            f"{downloaded} downloaded, {skipped} unchanged, {removed} removed.",
+            fg="green",
+        )
+    )
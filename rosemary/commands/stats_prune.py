@@ -0,0 +1,24 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.modules.stats.services import StatsService
+
+
+@click.command("stats:prune", help="Deletes the raw view and download records older than the retention period.")
+@click.option("--days", type=int, help="Days of raw records to keep (defaults to STATS_RAW_RETENTION_DAYS).")
+@click.option("-y", "--yes", is_flag=True, help="Confirm the operation without prompting.")
+@with_appcontext
+def stats_prune(days, yes):
+    days = current_app.config["STATS_RAW_RETENTION_DAYS"] if days is None else days
+    if days < 1:
+        raise click.BadParameter("At least one day of raw records must be kept.", param_hint="--days")
+
+    if not yes:
+        click.confirm(f"Raw records older than {days} days will be deleted. Continue?", abort=True)
+
+    # Make sure the rollups hold every event before the raw rows go away
+    service = StatsService()
+    service.rollup()
+    deleted = service.prune(days)
+    click.echo(click.style(f"{deleted} raw records deleted.", fg="green"))
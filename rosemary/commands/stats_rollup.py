@@ -0,0 +1,13 @@
+import click
+from flask.cli import with_appcontext
+
+from app.modules.stats.services import StatsService
+
+
+@click.command("stats:rollup", help="Recomputes the daily view and download rollups from the raw records.")
+@click.option("--from", "start", type=click.DateTime(formats=["%Y-%m-%d"]), help="First day to recompute.")
+@click.option("--to", "end", type=click.DateTime(formats=["%Y-%m-%d"]), help="Last day to recompute.")
+@with_appcontext
+def stats_rollup(start, end):
+    rolled_up = StatsService().rollup(start.date() if start else None, end.date() if end else None)
+    click.echo(click.style(f"{rolled_up} daily rollups recomputed.", fg="green"))